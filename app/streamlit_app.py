@@ -15,18 +15,22 @@ if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
 from src.core.pipeline import run_pipeline
-from src.llm.client import LLMClient, LLMClientError
+from src.llm.client import LLMClientError
+from src.llm.registry import get_client, get_router
+from src.utils import metrics
 from src.utils.config import get_config
 from app.sample_notes import SAMPLE_NOTES
 from src.utils.logging import get_logger
 from src.export.fhir_bundle import build_fhir_bundle
-from src.privacy.patterns import PHONE_RE, EMAIL_RE, AADHAAR_RE, MRN_RE, NAME_RE
+from src.privacy.scanner import apply_spans, scan_pii
 from src.validate.normalizers import normalize_structured
 from src.validate.validators import run_validations
 
 load_dotenv()
 logger = get_logger()
 cfg = get_config()
+if not metrics.enabled():
+    metrics.configure_sinks(cfg.metrics_sinks)
 
 st.set_page_config(page_title="DocSathi", layout="wide", page_icon="🩺")
 
@@ -570,13 +574,7 @@ def highlight_note(text: str, summary) -> str:
 def highlight_pii(text: str) -> str:
     if not text:
         return ""
-    out = text
-    for regex in (PHONE_RE, EMAIL_RE, AADHAAR_RE, MRN_RE, NAME_RE):
-        try:
-            out = regex.sub(lambda m: f'<span class="hl-pii">{m.group(0)}</span>', out)
-        except re.error:
-            continue
-    return out
+    return apply_spans(text, scan_pii(text), template='<span class="hl-pii">{text}</span>')
 
 
 def compute_completeness(summary) -> tuple[int, list[str], list[str]]:
@@ -716,19 +714,45 @@ st.markdown(
 )
 
 
-def trigger_pipeline(note_text: str, sample_choice: str):
+def app_client():
+    if cfg.small_model:
+        # Simple notes go to the small model; hard ones and rejected answers go to the configured one.
+        return get_router(
+            cfg.small_model,
+            model=cfg.model,
+            provider=cfg.provider,
+            base_url=cfg.base_url,
+            ollama_model=cfg.ollama_model,
+            ollama_base_url=cfg.ollama_base_url,
+            threshold=cfg.router_threshold,
+        )
+    return get_client(
+        model=cfg.model,
+        provider=cfg.provider,
+        base_url=cfg.base_url,
+        ollama_model=cfg.ollama_model,
+        ollama_base_url=cfg.ollama_base_url,
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def warm_llm():
+    """Load the Ollama model once per server process so the first note does not pay for it."""
+    if cfg.provider != "ollama" or not cfg.ollama_model:
+        return None
+    return app_client().warmup()
+
+
+def trigger_pipeline(note_text: str, sample_choice: str, preview_slot=None):
     if not note_text.strip():
         st.session_state.last_result = None
         st.session_state.last_error = "Please paste a note or load a sample."
         return
     try:
         llm_client = None
-        if cfg.provider == "ollama":
-            llm_client = LLMClient(
-                provider="ollama",
-                ollama_model=cfg.ollama_model,
-                ollama_base_url=cfg.ollama_base_url,
-            )
+        if cfg.provider == "ollama" or cfg.has_api_key:
+            # Same client as the questions tab, so LLM_REUSE_CONTEXT can continue this conversation.
+            llm_client = app_client()
         if cfg.provider == "openai" and not cfg.has_api_key:
             if sample_choice != SAMPLE_PLACEHOLDER:
                 class DummyLLM:
@@ -758,12 +782,34 @@ def trigger_pipeline(note_text: str, sample_choice: str):
                 return
 
         st.session_state.last_error = None
+        options = {
+            "model": cfg.model,
+            "base_url": cfg.base_url,
+            "with_questions": cfg.combined_questions,
+            "chunk_chars": cfg.chunk_chars,
+            "sectioned": cfg.sectioned,
+        }
+        if preview_slot is not None:
+            # Stream the extraction and show fields (vitals first) as they complete.
+            partial = {}
+
+            def show_partial(field, value):
+                if value in (None, [], ""):
+                    return
+                partial[field] = value
+                preview_slot.json(partial)
+
+            options["on_partial"] = show_partial
         result = run_pipeline(
             note_text,
-            options={"model": cfg.model, "base_url": cfg.base_url},
+            options=options,
             llm_client=llm_client,
         )
         st.session_state.last_result = result
+        if "questions" in result:
+            # Combined mode: questions came back with the extraction, no second call needed.
+            st.session_state.followup_questions = result["questions"]
+            st.session_state.followup_error = None
         st.session_state.last_run_note = note_text
         st.session_state.last_run_time = time.time()
     except Exception as e:
@@ -788,13 +834,7 @@ def clear_note():
 
 def generate_followups(note_text: str, summary, flags):
     try:
-        llm = LLMClient(
-            model=cfg.model,
-            provider=cfg.provider,
-            base_url=cfg.base_url,
-            ollama_model=cfg.ollama_model,
-            ollama_base_url=cfg.ollama_base_url,
-        )
+        llm = app_client()
         structured_payload = summary.model_dump() if hasattr(summary, "model_dump") else summary.dict()
         data = llm.generate_followup_questions(
             note_text=note_text,
@@ -887,7 +927,9 @@ if run_button:
             '<div class="inline-spinner"><span class="spinner-dot"></span>Structuring...</div>',
             unsafe_allow_html=True,
         )
-    trigger_pipeline(note_text, sample)
+    preview_slot = st.empty()
+    trigger_pipeline(note_text, sample, preview_slot=preview_slot)
+    preview_slot.empty()
     if "run_spinner_slot" in locals():
         run_spinner_slot.empty()
 
@@ -913,6 +955,7 @@ if st.session_state.last_result:
     bundle = result["bundle"]
     flags = result["flags"]
     masked = result.get("masked_note")
+    llm_note = result.get("llm_note")
     raw = result.get("raw_llm_json")
     base_flags = [f for f in (flags or []) if f.startswith("PII detected")]
 
@@ -1050,6 +1093,7 @@ if st.session_state.last_result:
                         "bundle": bundle,
                         "flags": flags,
                         "masked_note": masked,
+                        "llm_note": llm_note,
                         "raw_llm_json": raw,
                     }
                     st.success("Edits applied.")
@@ -1170,7 +1214,8 @@ if st.session_state.last_result:
             if cfg.provider == "ollama" and not cfg.ollama_model:
                 can_run = False
             if st.button("Generate questions", disabled=not can_run):
-                generate_followups(note_text, summary, flags)
+                # Exactly the text extraction saw, so its conversation is found (and PII stays out of the prompt).
+                generate_followups(llm_note or masked or note_text, summary, flags)
         with info_cols[1]:
             st.markdown(
                 "<div class='muted'>Auto‑suggested questions to complete missing fields.</div>",
@@ -1213,3 +1258,6 @@ if st.session_state.last_result:
         st.subheader("Raw LLM JSON (debug)")
         with st.expander("Raw JSON response"):
             st.json(raw)
+
+# Runs after the page has rendered; a no-op on every rerun after the first.
+warm_llm()
@@ -0,0 +1,90 @@
+import argparse
+import itertools
+import json
+import os
+import uuid
+from typing import Any, Dict, List
+
+from src.data.load_dataset import iter_jsonl
+from src.llm.client import LLMClient
+from src.llm.prompts import SYSTEM_PROMPT
+from src.privacy.scanner import mask_pii_spans
+from src.utils import metrics
+from src.utils.timers import percentile
+
+
+# Streamed so the client reports llm_first_token_seconds; uncached so every note reaches the model.
+EXTRACT_OPTIONS = {"stream": True, "cache": False}
+
+
+def _extract(client: LLMClient, note: str) -> None:
+    try:
+        client.extract_structured(note, options=EXTRACT_OPTIONS)
+    except Exception as e:
+        # The first token has arrived by the time parsing or repair fails.
+        print(f"Extraction failed: {e}")
+
+
+def measure_ttft(notes: List[str], layout: str) -> List[float]:
+    """Time to first token of one streamed extraction per note.
+
+    Every note gets its own client so the two layouts differ only in the
+    system prompt. "shared" sends the stable SYSTEM_PROMPT, so the provider
+    can reuse its cached prefix across notes. "cold" starts the system
+    message with a random tag, which defeats prefix reuse and shows the cost
+    of re-encoding the instructions on every call.
+    """
+    sink = metrics.add_sink(metrics.InMemoryHistogram())
+    try:
+        for note in notes:
+            prompt = SYSTEM_PROMPT if layout == "shared" else f"[request {uuid.uuid4().hex}]\n{SYSTEM_PROMPT}"
+            client = LLMClient(use_cache=False, system_prompt=prompt)
+            try:
+                _extract(client, note)
+            finally:
+                client.close()
+    finally:
+        metrics.remove_sink(sink)
+    return [v for (name, _), values in sink.observations.items() if name == "llm_first_token_seconds" for v in values]
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    return {
+        "count": len(values),
+        "p50_seconds": round(percentile(values, 50), 4),
+        "p90_seconds": round(percentile(values, 90), 4),
+        "mean_seconds": round(sum(values) / len(values), 4) if values else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare time-to-first-token with and without a shared prompt prefix.")
+    parser.add_argument("--input", default="src/data/synthetic_notes.jsonl", help="Path to JSONL dataset")
+    parser.add_argument("--outdir", default="eval/outputs", help="Directory to write results")
+    parser.add_argument("--limit", type=int, default=20, help="Number of notes per layout")
+    args = parser.parse_args()
+
+    notes = [mask_pii_spans(item.get("note_text") or "")[0] for item in itertools.islice(iter_jsonl(args.input), args.limit)]
+    client = LLMClient(use_cache=False)
+    try:
+        # One untimed call so model load time does not land on either layout.
+        client.warmup()
+        _extract(client, notes[0])
+    finally:
+        client.close()
+    results = {layout: summarize(measure_ttft(notes, layout)) for layout in ("cold", "shared")}
+    cold, shared = results["cold"]["p50_seconds"], results["shared"]["p50_seconds"]
+    results["p50_speedup"] = round(cold / shared, 2) if shared else None
+    results["provider"] = client.provider
+    results["model"] = client.active_model
+
+    os.makedirs(args.outdir, exist_ok=True)
+    path = os.path.join(args.outdir, "bench_prompt_prefix.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Wrote: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,22 @@
 import argparse
+import hashlib
+import itertools
 import json
 import os
+import textwrap
 import time
-from typing import Any, Dict, List
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from src.data.load_dataset import load_jsonl
+from src.data.load_dataset import iter_jsonl
 from src.core.pipeline import run_pipeline
-
-# Reuse existing helper if present
-try:
-    from eval.metrics import field_presence_accuracy
-except Exception:
-    field_presence_accuracy = None
+from src.llm.registry import close_clients, get_client
+from src.utils import metrics as metric_sinks
+from src.utils.config import get_config
+from src.utils.metrics import QuantileSketch
+from src.utils.timers import collect_stages
+from src.validate.salvage import SALVAGE_FLAG_PREFIX
 
 
 def model_to_dict(obj: Any) -> Dict[str, Any]:
@@ -56,6 +61,51 @@ def flags_contain_any(flags: List[str], needles: List[str]) -> bool:
     return any(n.lower() in s for n in needles)
 
 
+def _flag_case(p: Dict, g: Dict) -> Dict[str, int]:
+    """Counter increments for one (pred, gold) pair; see compute_flag_metrics."""
+    out = {"dx_needed": 0, "dx_hit": 0, "med_needed": 0, "med_hit": 0, "med_fp": 0, "med_complete_cases": 0}
+    pflags = p.get("flags") or []
+    if not isinstance(pflags, list):
+        pflags = [str(pflags)]
+    # Salvage flags name field paths ("medications[0].dose"), not missing data.
+    pflags = [f for f in pflags if not str(f or "").startswith(SALVAGE_FLAG_PREFIX)]
+
+    gdx = g.get("diagnosis") or []
+    if not gdx:
+        out["dx_needed"] = 1
+        if flags_contain_any(pflags, ["diagnosis not documented", "not inferred"]):
+            out["dx_hit"] = 1
+
+    gmeds = g.get("medications") or []
+    needs_med_flag = False
+    if isinstance(gmeds, list) and gmeds:
+        for m in gmeds:
+            if not isinstance(m, dict):
+                continue
+            if m.get("dose") is None or m.get("frequency") is None or m.get("duration") is None:
+                needs_med_flag = True
+                break
+
+    if needs_med_flag:
+        out["med_needed"] = 1
+        if flags_contain_any(pflags, ["dose", "frequency", "duration"]):
+            out["med_hit"] = 1
+    else:
+        if isinstance(gmeds, list) and gmeds:
+            out["med_complete_cases"] = 1
+            if flags_contain_any(pflags, ["dose", "frequency", "duration"]):
+                out["med_fp"] = 1
+    return out
+
+
+def _flag_metrics_from_counts(c: Dict[str, int]) -> Dict[str, float]:
+    return {
+        "dx_missing_flag_recall": (c["dx_hit"] / c["dx_needed"]) if c["dx_needed"] else 0.0,
+        "med_incomplete_flag_recall": (c["med_hit"] / c["med_needed"]) if c["med_needed"] else 0.0,
+        "med_incomplete_flag_false_positive_rate": (c["med_fp"] / c["med_complete_cases"]) if c["med_complete_cases"] else 0.0,
+    }
+
+
 def compute_flag_metrics(preds: List[Dict], golds: List[Dict]) -> Dict[str, float]:
     """
     Poster-friendly flag metrics:
@@ -63,56 +113,179 @@ def compute_flag_metrics(preds: List[Dict], golds: List[Dict]) -> Dict[str, floa
     - Med-incomplete flag recall (when any gold med misses dose/freq/duration)
     - Med-incomplete false positive rate (flagged even when gold meds complete)
     """
-    dx_needed = 0
-    dx_hit = 0
+    counts = {"dx_needed": 0, "dx_hit": 0, "med_needed": 0, "med_hit": 0, "med_fp": 0, "med_complete_cases": 0}
+    for p, g in zip(preds, golds):
+        for k, v in _flag_case(p, g).items():
+            counts[k] += v
+    return _flag_metrics_from_counts(counts)
 
-    med_needed = 0
-    med_hit = 0
-    med_fp = 0
-    med_complete_cases = 0
 
-    for p, g in zip(preds, golds):
-        pflags = p.get("flags") or []
-        if not isinstance(pflags, list):
-            pflags = [str(pflags)]
-
-        gdx = g.get("diagnosis") or []
-        if not gdx:
-            dx_needed += 1
-            if flags_contain_any(pflags, ["diagnosis not documented", "not inferred"]):
-                dx_hit += 1
-
-        gmeds = g.get("medications") or []
-        needs_med_flag = False
-        if isinstance(gmeds, list) and gmeds:
-            for m in gmeds:
-                if not isinstance(m, dict):
-                    continue
-                if m.get("dose") is None or m.get("frequency") is None or m.get("duration") is None:
-                    needs_med_flag = True
-                    break
-
-        if needs_med_flag:
-            med_needed += 1
-            if flags_contain_any(pflags, ["dose", "frequency", "duration"]):
-                med_hit += 1
-        else:
-            if isinstance(gmeds, list) and gmeds:
-                med_complete_cases += 1
-                if flags_contain_any(pflags, ["dose", "frequency", "duration"]):
-                    med_fp += 1
+PRESENCE_FIELDS = [
+    ("complaint_presence_accuracy", "complaints"),
+    ("diagnosis_presence_accuracy", "diagnosis"),
+    ("medications_presence_accuracy", "medications"),
+    ("tests_presence_accuracy", "tests"),
+    ("follow_up_presence_accuracy", "follow_up"),
+    ("vitals_presence_accuracy", "vitals"),
+    ("bp_presence_accuracy", "vitals.bp"),
+    ("hr_presence_accuracy", "vitals.hr"),
+    ("spo2_presence_accuracy", "vitals.spo2"),
+    ("temp_presence_accuracy", "vitals.temp"),
+]
 
-    return {
-        "dx_missing_flag_recall": (dx_hit / dx_needed) if dx_needed else 0.0,
-        "med_incomplete_flag_recall": (med_hit / med_needed) if med_needed else 0.0,
-        "med_incomplete_flag_false_positive_rate": (med_fp / med_complete_cases) if med_complete_cases else 0.0,
-    }
+
+STAGES = ["pii_mask", "compact", "pre_extract", "llm_extract", "salvage", "repair", "normalize", "validate", "fhir_build"]
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+class StreamingMetrics:
+    """Running accumulators for the metrics written to metrics_preds.json.
+
+    Memory stays constant in the number of examples; `result()` matches the
+    list-based presence_accuracy/compute_flag_metrics on the same data.
+    """
+
+    def __init__(self) -> None:
+        self.n_examples = 0
+        self.n_errors = 0
+        self.n_repaired = 0
+        self.total_seconds = 0.0
+        self.presence_correct = {name: 0 for name, _ in PRESENCE_FIELDS}
+        self.flag_counts = {"dx_needed": 0, "dx_hit": 0, "med_needed": 0, "med_hit": 0, "med_fp": 0, "med_complete_cases": 0}
+        # Fixed-size sketches, so memory does not grow with the number of notes.
+        self.latencies: Dict[str, QuantileSketch] = {name: QuantileSketch() for name in ["total"] + STAGES}
+
+    def add(
+        self,
+        pred: Dict[str, Any],
+        gold: Dict[str, Any],
+        seconds: float,
+        error: bool = False,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.n_examples += 1
+        self.n_errors += int(error)
+        self.total_seconds += seconds
+        self.latencies["total"].add(seconds)
+        if (timings or {}).get("repair"):
+            self.n_repaired += 1
+        for name in STAGES:
+            self.latencies[name].add((timings or {}).get(name, 0.0))
+        for name, field in PRESENCE_FIELDS:
+            pv = get_nested(pred, field) if "." in field else pred.get(field)
+            gv = get_nested(gold, field) if "." in field else gold.get(field)
+            if bool(pv) == bool(gv):
+                self.presence_correct[name] += 1
+        for k, v in _flag_case(pred, gold).items():
+            self.flag_counts[k] += v
+
+    def result(self) -> Dict[str, Any]:
+        n = self.n_examples
+        metrics: Dict[str, Any] = {
+            "n_examples": n,
+            "n_errors": self.n_errors,
+            "avg_seconds_per_note": self.total_seconds / n if n else 0.0,
+            "repair_rate": self.n_repaired / n if n else 0.0,
+        }
+        for name, _ in PRESENCE_FIELDS:
+            metrics[name] = self.presence_correct[name] / n if n else 0.0
+        metrics.update(_flag_metrics_from_counts(self.flag_counts))
+        for name, sketch in self.latencies.items():
+            for q in LATENCY_PERCENTILES:
+                metrics[f"{name}_p{q}_seconds"] = sketch.quantile(q)
+        return metrics
 
 
 def safe_mkdir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
 
+CHECKPOINT_NAME = "checkpoint.jsonl"
+
+
+def note_fingerprint(note_text: str) -> str:
+    return hashlib.sha1((note_text or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _checkpoint_entries(path: str) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """Yield (entry, end_offset) for each complete line; stops at a torn last line."""
+    with open(path, "rb") as f:
+        offset = 0
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                break
+            offset += len(raw)
+            yield entry, offset
+
+
+def prepare_checkpoint(path: str, resume: bool) -> Iterator[Dict[str, Any]]:
+    """Return finished entries to replay (in index order) and drop any torn tail."""
+    if not resume or not os.path.exists(path):
+        open(path, "w", encoding="utf-8").close()
+        return iter(())
+    valid = 0
+    for _, valid in _checkpoint_entries(path):
+        pass
+    with open(path, "r+b") as f:
+        f.truncate(valid)
+    return (entry for entry, _ in _checkpoint_entries(path))
+
+
+def write_json_array(rows_path: str, path: str) -> None:
+    """Write the JSONL rows in `rows_path` to `path` as one indented JSON array, a row at a time.
+
+    The output is the same as json.dump(rows, f, indent=2), without holding the rows in memory.
+    """
+    with open(rows_path, "r", encoding="utf-8") as src, open(path, "w", encoding="utf-8") as out:
+        out.write("[")
+        for n, line in enumerate(src):
+            row = json.dumps(json.loads(line), indent=2, ensure_ascii=False)
+            out.write(("," if n else "") + "\n" + textwrap.indent(row, "  "))
+        out.write("\n]")
+
+
+def evaluate_note(note_text: str, options: Dict[str, Any]) -> Tuple[Dict[str, Any], float, Optional[str], Dict[str, float]]:
+    t0 = time.time()
+    # Collect here rather than reading res["timings"] so failed notes keep their partial stages.
+    with collect_stages() as timings:
+        try:
+            res = run_pipeline(note_text, options=dict(options))
+            pred = model_to_dict(res.get("structured"))
+            pred["flags"] = res.get("flags") or pred.get("flags") or []
+            error = None
+        except Exception as e:
+            pred = {"flags": [f"PIPELINE_ERROR: {type(e).__name__}"]}
+            error = f"{type(e).__name__}: {str(e)}"
+    return pred, time.time() - t0, error, timings.as_dict()
+
+
+def iter_evaluations(items: Iterator[Dict[str, Any]], options: Dict[str, Any], workers: int):
+    """Yield (index, item, (pred, seconds, error, timings)) in input order.
+
+    With workers > 1 notes run concurrently, but at most 2 * workers are
+    read ahead so memory stays bounded.
+    """
+    if workers <= 1:
+        for i, item in enumerate(items):
+            yield i, item, evaluate_note((item.get("note_text") or "").strip(), options)
+        return
+    window: deque = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="eval") as pool:
+        for i, item in enumerate(items):
+            note_text = (item.get("note_text") or "").strip()
+            window.append((i, item, pool.submit(evaluate_note, note_text, options)))
+            if len(window) >= 2 * workers:
+                j, it, fut = window.popleft()
+                yield j, it, fut.result()
+        while window:
+            j, it, fut = window.popleft()
+            yield j, it, fut.result()
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Run evaluation using real pipeline predictions.")
     parser.add_argument("--input", default="src/data/synthetic_notes.jsonl", help="Path to JSONL dataset")
@@ -120,63 +293,106 @@ def main() -> None:
     parser.add_argument("--limit", type=int, default=0, help="Limit number of examples (0 = all)")
     parser.add_argument("--strict", action="store_true", help="Enable strict_mode in pipeline options")
     parser.add_argument("--save_preds", action="store_true", help="Write preds vs gold JSONL for inspection")
+    parser.add_argument("--resume", action="store_true", help="Skip notes already finished in outdir/checkpoint.jsonl")
+    parser.add_argument("--workers", type=int, default=1, help="Number of notes to run through the pipeline concurrently")
+    parser.add_argument(
+        "--llm_budget_seconds",
+        type=float,
+        default=None,
+        help="Seconds each note may spend retrying LLM calls after its first failure (pipeline default: 60)",
+    )
     args = parser.parse_args()
+    options: Dict[str, Any] = {"strict_mode": bool(args.strict)}
+    if args.llm_budget_seconds is not None:
+        options["llm_budget_seconds"] = args.llm_budget_seconds
 
-    data = load_jsonl(args.input)
+    data = iter_jsonl(args.input)
     if args.limit and args.limit > 0:
-        data = data[: args.limit]
-
-    preds: List[Dict[str, Any]] = []
-    golds: List[Dict[str, Any]] = []
-    per_note_times: List[float] = []
-    errors: List[Dict[str, Any]] = []
-
-    for i, item in enumerate(data):
-        note_text = (item.get("note_text") or "").strip()
-        gold = item.get("ground_truth") or {}
-        golds.append(gold)
+        data = itertools.islice(data, args.limit)
+    data = iter(data)
 
-        t0 = time.time()
-        try:
-            res = run_pipeline(note_text, options={"strict_mode": bool(args.strict)})
-            structured = model_to_dict(res.get("structured"))
-            structured["flags"] = res.get("flags") or structured.get("flags") or []
-            preds.append(structured)
-        except Exception as e:
-            preds.append({"flags": [f"PIPELINE_ERROR: {type(e).__name__}"]})
-            errors.append({"index": i, "error": f"{type(e).__name__}: {str(e)}"})
-        finally:
-            per_note_times.append(time.time() - t0)
-
-    metrics: Dict[str, Any] = {
-        "n_examples": len(data),
-        "n_errors": len(errors),
-        "avg_seconds_per_note": sum(per_note_times) / len(per_note_times) if per_note_times else 0.0,
-    }
-
-    if field_presence_accuracy:
-        metrics["complaint_presence_accuracy"] = field_presence_accuracy(preds, golds, "complaints")
-        metrics["diagnosis_presence_accuracy"] = field_presence_accuracy(preds, golds, "diagnosis")
-        metrics["medications_presence_accuracy"] = field_presence_accuracy(preds, golds, "medications")
-        metrics["tests_presence_accuracy"] = field_presence_accuracy(preds, golds, "tests")
-        metrics["follow_up_presence_accuracy"] = field_presence_accuracy(preds, golds, "follow_up")
-        metrics["vitals_presence_accuracy"] = field_presence_accuracy(preds, golds, "vitals")
-    else:
-        metrics["complaint_presence_accuracy"] = presence_accuracy(preds, golds, "complaints")
-        metrics["diagnosis_presence_accuracy"] = presence_accuracy(preds, golds, "diagnosis")
-        metrics["medications_presence_accuracy"] = presence_accuracy(preds, golds, "medications")
-        metrics["tests_presence_accuracy"] = presence_accuracy(preds, golds, "tests")
-        metrics["follow_up_presence_accuracy"] = presence_accuracy(preds, golds, "follow_up")
-        metrics["vitals_presence_accuracy"] = presence_accuracy(preds, golds, "vitals")
-
-    metrics["bp_presence_accuracy"] = presence_accuracy(preds, golds, "vitals.bp")
-    metrics["hr_presence_accuracy"] = presence_accuracy(preds, golds, "vitals.hr")
-    metrics["spo2_presence_accuracy"] = presence_accuracy(preds, golds, "vitals.spo2")
-    metrics["temp_presence_accuracy"] = presence_accuracy(preds, golds, "vitals.temp")
-
-    metrics.update(compute_flag_metrics(preds, golds))
+    cfg = get_config()
+    metric_sinks.configure_sinks(cfg.metrics_sinks)
+    if cfg.provider == "ollama" and cfg.ollama_model:
+        # Same registry entry run_pipeline uses; keeps model load time out of the first note's latency.
+        get_client().warmup()
 
     safe_mkdir(args.outdir)
+    path_preds = os.path.join(args.outdir, "preds_vs_gold.jsonl")
+    preds_file = open(path_preds, "w", encoding="utf-8") if args.save_preds else None
+
+    path_ckpt = os.path.join(args.outdir, CHECKPOINT_NAME)
+    done = prepare_checkpoint(path_ckpt, args.resume)
+    pending = next(done, None)
+    ckpt_file = None
+    n_resumed = 0
+
+    stats = StreamingMetrics()
+    path_err = os.path.join(args.outdir, "errors.json")
+    # Errors are streamed here and turned into the errors.json array at the end.
+    path_err_rows = path_err + ".part"
+    for stale in (path_err, path_err_rows):
+        if os.path.exists(stale):
+            os.remove(stale)  # from an earlier run; replayed errors are written again
+    err_file = None
+
+    def record(i, item, pred, seconds, error, timings) -> None:
+        nonlocal err_file
+        gold = item.get("ground_truth") or {}
+        if error:
+            # Streamed to disk like the predictions, so nothing per note is kept in memory.
+            if err_file is None:
+                err_file = open(path_err_rows, "w", encoding="utf-8")
+            err_file.write(json.dumps({"index": i, "error": error}, ensure_ascii=False) + "\n")
+            err_file.flush()
+        stats.add(pred, gold, seconds, error=bool(error), timings=timings)
+        if preds_file is not None:
+            # Written as we go so a crash keeps everything finished so far.
+            preds_file.write(json.dumps({"note_text": item.get("note_text"), "pred": pred, "gold": gold}, ensure_ascii=False) + "\n")
+            preds_file.flush()
+
+    try:
+        # Replay notes finished by an earlier run; only the rest is evaluated.
+        while pending is not None:
+            item = next(data, None)
+            if item is None:
+                break
+            i = n_resumed
+            fingerprint = note_fingerprint((item.get("note_text") or "").strip())
+            if pending.get("index") != i or pending.get("fingerprint") != fingerprint:
+                raise SystemExit(f"{path_ckpt} does not match {args.input} at note {i}; rerun without --resume.")
+            record(i, item, pending["pred"], pending["seconds"], pending.get("error"), pending.get("timings"))
+            n_resumed += 1
+            pending = next(done, None)
+
+        for offset, item, (pred, seconds, error, timings) in iter_evaluations(data, options, args.workers):
+            i = n_resumed + offset
+            if ckpt_file is None:
+                ckpt_file = open(path_ckpt, "a", encoding="utf-8")
+            entry = {
+                "index": i,
+                "fingerprint": note_fingerprint((item.get("note_text") or "").strip()),
+                "pred": pred,
+                "seconds": seconds,
+                "error": error,
+                "timings": timings,
+            }
+            ckpt_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            ckpt_file.flush()
+            record(i, item, pred, seconds, error, timings)
+    finally:
+        if preds_file is not None:
+            preds_file.close()
+        if ckpt_file is not None:
+            ckpt_file.close()
+        if err_file is not None:
+            err_file.close()
+        close_clients()
+
+    if n_resumed:
+        print(f"Resumed {n_resumed} finished notes from {path_ckpt}")
+
+    metrics = stats.result()
 
     path_json = os.path.join(args.outdir, "metrics_preds.json")
     with open(path_json, "w", encoding="utf-8") as f:
@@ -188,23 +404,21 @@ def main() -> None:
         for k, v in metrics.items():
             f.write(f"{k},{v}\n")
 
-    if args.save_preds:
-        path_preds = os.path.join(args.outdir, "preds_vs_gold.jsonl")
-        with open(path_preds, "w", encoding="utf-8") as f:
-            for item, p, g in zip(data, preds, golds):
-                f.write(json.dumps({"note_text": item.get("note_text"), "pred": p, "gold": g}, ensure_ascii=False) + "\n")
+    exporter = metric_sinks.get_sink(metric_sinks.PrometheusTextExporter)
+    if exporter is not None:
+        with open(os.path.join(args.outdir, "metrics.prom"), "w", encoding="utf-8") as f:
+            f.write(exporter.render())
 
-    if errors:
-        path_err = os.path.join(args.outdir, "errors.json")
-        with open(path_err, "w", encoding="utf-8") as f:
-            json.dump(errors, f, indent=2, ensure_ascii=False)
+    if err_file is not None:
+        write_json_array(path_err_rows, path_err)
+        os.remove(path_err_rows)
 
     print(f"Wrote: {path_json}")
     print(f"Wrote: {path_csv}")
     if args.save_preds:
-        print(f"Wrote: {os.path.join(args.outdir, 'preds_vs_gold.jsonl')}")
-    if errors:
-        print(f"Wrote: {os.path.join(args.outdir, 'errors.json')}")
+        print(f"Wrote: {path_preds}")
+    if err_file is not None:
+        print(f"Wrote: {path_err}")
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
 # Package initializer for src so local imports resolve when running streamlit.
-__all__ = ["core", "llm", "privacy", "validate", "export", "data", "utils"]
+__all__ = ["core", "llm", "privacy", "extract", "validate", "export", "data", "utils"]
 
 __version__ = "0.1.0"
@@ -1,58 +1,422 @@
-from typing import Tuple, Dict, Any
-from src.privacy.pii import mask_pii
-from src.llm.client import LLMClient, LLMClientError
-from src.core.schemas import StructuredNote
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Tuple, Dict, Any, List, Iterable, Optional
+from src.privacy.scanner import PiiSpan, mask_pii_spans
+from src.llm.client import LLMClient, LLMClientError, clean_questions
+from src.llm.registry import get_client
+from src.llm.retry import RetryBudget, current_retry_budget, retry_budget, shared_retry_budget
+from src.core.schemas import NOTE_SECTIONS, StructuredNote, section_fields
+from src.extract.chunking import merge_extractions, split_sections
+from src.extract.compact import compact_note
+from src.extract.rules import pre_extract
 from src.validate.normalizers import normalize_structured
+from src.validate.salvage import salvage_model, salvage_structured
 from src.validate.validators import run_validations
 from src.export.fhir_bundle import build_fhir_bundle
+from src.utils import metrics
 from src.utils.logging import get_logger
+from src.utils.timers import collect_stages, stage
 
 logger = get_logger()
 
+DEFAULT_LLM_BUDGET_SECONDS = 60.0
+DEFAULT_LLM_BUDGET_ATTEMPTS = 5
+# Notes longer than this (masked chars) are never packed with others.
+DEFAULT_PACK_MAX_CHARS = 1500
+DEFAULT_CHUNK_CONCURRENCY = 4
 
-def run_pipeline(note_text: str, options: dict = None, llm_client: LLMClient = None) -> Dict[str, Any]:
-    options = options or {}
-    flags = []
 
-    # 1. PII mask
-    masked_note, pii_flags = mask_pii(note_text)
-    if pii_flags:
-        flags.extend(pii_flags)
+def _llm_note(masked_note: str, options: dict) -> str:
+    """The text the LLM sees: the masked note, compacted unless options["compact"] is False."""
+    if not options.get("compact", True):
+        return masked_note
+    with stage("compact"):
+        compacted = compact_note(masked_note)
+    metrics.incr("compacted_chars", len(masked_note) - len(compacted))
+    return compacted
 
-    # 2. LLM extract
-    if llm_client is None:
-        llm_client = LLMClient(model=options.get("model"))
 
+# (masked_note, pii_flags, pii_spans, llm_note) for one note.
+_Prepared = Tuple[str, List[str], List[PiiSpan], str]
+
+
+def _prepare(note_text: str, options: dict) -> _Prepared:
+    """Mask PII and build the LLM's view of the note."""
+    with stage("pii_mask"):
+        masked_note, pii_flags, pii_spans = mask_pii_spans(note_text)
+    return masked_note, pii_flags, pii_spans, _llm_note(masked_note, options)
+
+
+def _retry_budget(options: dict):
+    return retry_budget(
+        total_seconds=options.get("llm_budget_seconds", DEFAULT_LLM_BUDGET_SECONDS),
+        max_attempts=options.get("llm_budget_attempts", DEFAULT_LLM_BUDGET_ATTEMPTS),
+    )
+
+
+def _fan_out_budget(options: dict, calls: int) -> RetryBudget:
+    """The caller's retry budget, widened for `calls` concurrent calls that replace one.
+
+    Workers enter it with shared_retry_budget() (see _submit_in_budget); a
+    note's retries stay within one budget however many chunks and sections
+    it is split into.
+    """
+    budget = current_retry_budget()
+    if budget is None:
+        budget = RetryBudget(
+            options.get("llm_budget_seconds", DEFAULT_LLM_BUDGET_SECONDS),
+            options.get("llm_budget_attempts", DEFAULT_LLM_BUDGET_ATTEMPTS),
+        )
+    budget.fan_out(calls)
+    return budget
+
+
+def _in_budget(budget: RetryBudget, fn, *args):
+    with shared_retry_budget(budget):
+        return fn(*args)
+
+
+def _submit_in_budget(pool: ThreadPoolExecutor, budget: RetryBudget, fn, *args) -> Future:
+    """Run `fn(*args)` on `pool` under `budget`, in a copy of the caller's context.
+
+    Pool threads do not inherit context variables; the copy carries the
+    stage collector, so worker stages such as "repair" are timed too.
+    """
+    return pool.submit(contextvars.copy_context().run, _in_budget, budget, fn, *args)
+
+
+def _dump(model) -> Dict[str, Any]:
+    return model.model_dump() if hasattr(model, "model_dump") else model.dict()
+
+
+def _extract_section(llm_client, note: str, section: str, options: dict) -> Tuple[Dict[str, Any], List[str]]:
+    """One sub-prompt, validated against its NOTE_SECTIONS model; invalid fields are salvaged or dropped."""
+    model_cls = NOTE_SECTIONS[section]
+    start = time.perf_counter()
+    data = llm_client.extract_section(note, section, options=options)
+    metrics.observe("section_seconds", time.perf_counter() - start, section=section)
+    flags: List[str] = []
     try:
-        llm_result = llm_client.extract_structured(masked_note, options=options)
-    except LLMClientError as e:
-        logger.exception("LLM client error")
-        raise
+        parsed = model_cls(**data)
+    except Exception:
+        metrics.incr("section_salvaged", section=section)
+        parsed = salvage_model(model_cls, data, "", flags)
+    part = {k: v for k, v in _dump(parsed).items() if k in data} if parsed is not None else {}
+    if "questions" in data:
+        part["questions"] = data["questions"]
+    return part, flags
+
+
+def _extract_sections(llm_client, note: str, options: dict) -> Tuple[Dict[str, Any], List[str]]:
+    """Ask for each of NOTE_SECTIONS in its own prompt, concurrently, and assemble the parts.
+
+    Wall-clock time is that of the slowest sub-prompt rather than one call
+    generating every field. Sections whose fields the rules already filled
+    are not asked for.
+    """
+    prefilled = set(options.get("prefilled_fields") or ())
+    sections = [
+        name for name in NOTE_SECTIONS
+        if not prefilled.issuperset(k for k in section_fields(name) if not k.endswith("_evidence"))
+    ]
+    section_options = {k: v for k, v in options.items() if k not in ("on_partial", "stream", "prefilled_fields")}
+    on_partial = options.get("on_partial")
+    assembled: Dict[str, Any] = {}
+    flags: List[str] = []
+    if not sections:
+        return assembled, flags
+    metrics.incr("sectioned_notes")
+    budget = _fan_out_budget(options, len(sections))
+    with ThreadPoolExecutor(max_workers=len(sections), thread_name_prefix="section") as pool:
+        futures = {
+            _submit_in_budget(pool, budget, _extract_section, llm_client, note, name, section_options): name
+            for name in sections
+        }
+        for future in as_completed(futures):
+            part, part_flags = future.result()
+            assembled.update(part)
+            flags.extend(part_flags)
+            if on_partial is not None:
+                # Called here rather than in the workers so callers see fields on their own thread.
+                for field, value in part.items():
+                    on_partial(field, value)
+    # Keep the usual key order regardless of which sub-prompt finished first.
+    order = {k: i for i, k in enumerate(k for name in NOTE_SECTIONS for k in section_fields(name))}
+    return dict(sorted(assembled.items(), key=lambda kv: order.get(kv[0], len(order)))), flags
+
+
+def _extract_once(llm_client, note: str, options: dict) -> Tuple[Dict[str, Any], List[str]]:
+    if options.get("sectioned"):
+        return _extract_sections(llm_client, note, options)
+    return llm_client.extract_structured(note, options=options), []
 
-    raw_llm = llm_result
+
+def _llm_extract(llm_client, note: str, options: dict) -> Tuple[Dict[str, Any], List[str]]:
+    """Extraction result and salvage flags: one call (or one set of sub-prompts with
+    options["sectioned"]), or map-reduce over section chunks when the note exceeds
+    options["chunk_chars"]."""
+    chunk_chars = int(options.get("chunk_chars") or 0)
+    if not chunk_chars or len(note) <= chunk_chars:
+        result, flags = _extract_once(llm_client, note, options)
+        if options.get("sectioned"):
+            _remember(llm_client, note, result, options)
+        return result, flags
+    chunks = split_sections(note, chunk_chars)
+    metrics.incr("chunked_notes")
+    metrics.incr("chunks", len(chunks))
+    # Partial-field callbacks would fire from worker threads with per-chunk values; leave them out.
+    chunk_options = {k: v for k, v in options.items() if k not in ("on_partial", "stream")}
+
+    budget = _fan_out_budget(options, len(chunks))
+    workers = max(1, min(len(chunks), int(options.get("chunk_concurrency") or DEFAULT_CHUNK_CONCURRENCY)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chunk") as pool:
+        futures = [_submit_in_budget(pool, budget, _extract_once, llm_client, chunk, chunk_options) for chunk in chunks]
+        results = [f.result() for f in futures]
+    flags: List[str] = []
+    for _, chunk_flags in results:
+        flags.extend(f for f in chunk_flags if f not in flags)
+    merged = merge_extractions([partial for partial, _ in results])
+    _remember(llm_client, note, merged, options)
+    return merged, flags
+
+
+def _remember(llm_client, note: str, result: Dict[str, Any], options: dict) -> None:
+    """Record an assembled result as the note's extraction turn, for follow-up questions."""
+    remember = getattr(llm_client, "remember_extraction", None)
+    if remember is not None:
+        remember(note, result, {k: v for k, v in options.items() if k != "on_partial"})
+
+
+def _extract_and_parse(llm_client, masked_note: str, options: dict) -> Tuple[Dict[str, Any], StructuredNote, List[str]]:
+    pre = None
+    if options.get("pre_extract", True):
+        with stage("pre_extract"):
+            pre = pre_extract(masked_note)
+        if options.get("on_partial") is not None:
+            # Rule-based fields are final already; show them before the LLM answers.
+            for field, value in pre.fields.items():
+                options["on_partial"](field, value)
+
+    if pre is not None and pre.complete:
+        # Rules covered everything in the note; no LLM call needed.
+        metrics.incr("llm_skipped")
+        raw_llm = pre.as_structured()
+        section_flags = []
+    else:
+        llm_options = options
+        if pre is not None and pre.covered:
+            llm_options = dict(options, prefilled_fields=sorted(pre.covered))
+        try:
+            with stage("llm_extract"):
+                llm_result, section_flags = _llm_extract(llm_client, masked_note, llm_options)
+        except LLMClientError as e:
+            logger.exception("LLM client error")
+            raise
+
+        raw_llm = llm_result
+        if pre is not None and pre.covered:
+            raw_llm = dict(llm_result, **pre.fields)
 
     # 3. Pydantic validate -> model
+    salvage_flags: List[str] = list(section_flags)
     try:
         structured = StructuredNote(**raw_llm)
     except Exception as e:
+        # Keep every field that validates (coercing "92 bpm" and the like);
+        # only output with nothing usable goes back to the LLM.
+        with stage("salvage"):
+            structured, note_flags = salvage_structured(raw_llm)
+        salvage_flags.extend(note_flags)
+        if structured is not None:
+            metrics.incr("salvaged")
+            metrics.incr("salvage_drops", len(note_flags))
+            return raw_llm, structured, salvage_flags
+        salvage_flags = list(section_flags)
         # Attempt repair
         try:
-            repaired = llm_client.repair_json(masked_note, str(raw_llm), options=options)
+            metrics.incr("repairs", source="schema")
+            with stage("repair"):
+                repaired = llm_client.repair_json(masked_note, str(raw_llm), options=options)
             structured = StructuredNote(**repaired)
         except Exception:
             logger.exception("Failed to parse structured output")
             raise ValueError("Unable to parse LLM output into structured JSON")
 
-    # 4. Deterministic normalize + validate -> add flags
-    normalize_structured(structured)
-    vflags = run_validations(structured, note_text)
-    for f in vflags:
-        if f not in flags:
-            flags.append(f)
+    return raw_llm, structured, salvage_flags
+
+
+def run_pipeline(note_text: str, options: dict = None, llm_client: LLMClient = None) -> Dict[str, Any]:
+    return _run_pipeline(note_text, options or {}, llm_client)
+
+
+def _run_pipeline(
+    note_text: str, options: dict, llm_client: LLMClient, prepared: Optional[_Prepared] = None
+) -> Dict[str, Any]:
+    flags = []
+
+    with collect_stages() as timings:
+        # 1. PII mask (batch mode has already done it while packing)
+        masked_note, pii_flags, pii_spans, llm_note = prepared or _prepare(note_text, options)
+        for span in pii_spans:
+            metrics.incr("pii_hits", label=span.label)
+        if pii_flags:
+            flags.extend(pii_flags)
+
+        # 2. LLM extract
+        if llm_client is None:
+            llm_client = get_client(model=options.get("model"))
+
+        # One retry budget covers extraction, its repair fallback and the schema repair below.
+        with _retry_budget(options):
+            raw_llm, structured, salvage_flags = _extract_and_parse(llm_client, llm_note, options)
+        flags.extend(f for f in salvage_flags if f not in flags)
+
+        # 4. Deterministic normalize + validate -> add flags
+        with stage("normalize"):
+            normalize_structured(structured)
+        with stage("validate"):
+            vflags = run_validations(structured, note_text)
+        for f in vflags:
+            if f not in flags:
+                flags.append(f)
+
+        structured.flags = flags
+
+        # 5. Create FHIR bundle
+        with stage("fhir_build"):
+            bundle = build_fhir_bundle(structured)
+
+    result = {
+        "structured": structured,
+        "bundle": bundle,
+        "flags": flags,
+        "masked_note": masked_note,
+        # The text the LLM saw; follow-up calls must use it to find the extraction conversation.
+        "llm_note": llm_note,
+        "raw_llm_json": raw_llm,
+        "timings": timings.as_dict(),
+    }
+    if options.get("with_questions"):
+        # Asked for in the extraction call itself; the flags above come from run_validations as usual.
+        result["questions"] = clean_questions(raw_llm.get("questions"))
+    return result
+
+def _run_one(index: int, note_text: str, options: dict, llm_client, prepared: Optional[_Prepared] = None) -> Dict[str, Any]:
+    try:
+        result = _run_pipeline(note_text, options, llm_client, prepared)
+        result["error"] = None
+    except Exception as e:
+        logger.warning("Batch note %d failed: %s", index, e)
+        result = {
+            "structured": None,
+            "bundle": None,
+            "flags": [f"PIPELINE_ERROR: {type(e).__name__}"],
+            "masked_note": None,
+            "llm_note": None,
+            "raw_llm_json": None,
+            "error": f"{type(e).__name__}: {e}",
+        }
+    result["index"] = index
+    return result
+
+
+class _PackedResults:
+    """Serves extractions fetched by packed requests; anything missing goes to the real client."""
+
+    def __init__(self, client, results: Dict[str, Dict[str, Any]]):
+        self._client = client
+        self._results = results
+
+    def extract_structured(self, note_text, options=None):
+        result = self._results.get(note_text)
+        if result is not None:
+            return dict(result)
+        metrics.incr("packed_fallbacks")
+        return self._client.extract_structured(note_text, options=options)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def _prefetch_packed(notes: List[str], options: dict, llm_client, concurrency: int):
+    """Extract short notes `pack_size` at a time.
 
-    structured.flags = flags
+    Returns a client that serves those results and each note's `_prepare`
+    output, so the per-note runs do not mask and compact again. Packing is
+    skipped for modes the packed prompt cannot serve: combined questions,
+    sectioned sub-prompts and stored conversations for follow-ups. Notes
+    that would be chunked are never packed.
+    """
+    if (
+        not hasattr(llm_client, "extract_structured_packed")
+        or options.get("with_questions")
+        or options.get("sectioned")
+        or getattr(llm_client, "reuse_context", False)
+    ):
+        return llm_client, [None] * len(notes)
+    prepared = [_prepare(note, options) for note in notes]
+    pack_size = int(options["pack_size"])
+    max_chars = options.get("pack_max_chars", DEFAULT_PACK_MAX_CHARS)
+    if options.get("chunk_chars"):
+        max_chars = min(max_chars, int(options["chunk_chars"]))
+    candidates: Dict[str, str] = {}
+    seen = set()
+    for *_, llm_note in prepared:
+        if len(llm_note) > max_chars or llm_note in seen:
+            continue
+        if options.get("pre_extract", True) and pre_extract(llm_note).complete:
+            continue
+        seen.add(llm_note)
+        candidates[str(len(candidates))] = llm_note
+    ids = list(candidates)
+    packs = [{i: candidates[i] for i in ids[k : k + pack_size]} for k in range(0, len(ids), pack_size)]
+
+    def _one(pack):
+        try:
+            with stage("llm_extract_packed"):
+                return llm_client.extract_structured_packed(pack, options=options)
+        except Exception as e:
+            # Every note of a failed pack is retried on its own.
+            logger.warning("Packed extraction of %d notes failed: %s", len(pack), e)
+            return {}
+
+    results: Dict[str, Dict[str, Any]] = {}
+    workers = max(1, min(int(concurrency or 1), len(packs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pack") as pool:
+        for pack, fields in zip(packs, pool.map(_one, packs)):
+            for note_id, value in fields.items():
+                results[pack[note_id]] = value
+    return _PackedResults(llm_client, results), prepared
+
+
+def run_pipeline_batch(
+    notes: Iterable[str],
+    options: dict = None,
+    llm_client: LLMClient = None,
+    concurrency: int = 4,
+) -> List[Dict[str, Any]]:
+    """Run the pipeline over many notes, overlapping up to `concurrency` LLM calls.
+
+    Results come back in input order. A failing note yields a result with
+    `error` set instead of aborting the batch. With `options["pack_size"] = K`
+    (K > 1), short notes are first extracted K per LLM request; notes the
+    packed response misses are extracted individually.
+    """
+    options = options or {}
+    notes = list(notes)
+    if not notes:
+        return []
+    if llm_client is None:
+        llm_client = get_client(model=options.get("model"))
+    prepared = [None] * len(notes)
+    if int(options.get("pack_size") or 1) > 1:
+        llm_client, prepared = _prefetch_packed(notes, options, llm_client, concurrency)
 
-    # 5. Create FHIR bundle
-    bundle = build_fhir_bundle(structured)
+    workers = max(1, min(int(concurrency or 1), len(notes)))
+    if workers == 1:
+        return [_run_one(i, n, options, llm_client, p) for i, (n, p) in enumerate(zip(notes, prepared))]
 
-    return {"structured": structured, "bundle": bundle, "flags": flags, "masked_note": masked_note, "raw_llm_json": raw_llm}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline") as pool:
+        futures = [pool.submit(_run_one, i, n, options, llm_client, p) for i, (n, p) in enumerate(zip(notes, prepared))]
+        return [f.result() for f in futures]
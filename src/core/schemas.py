@@ -1,4 +1,5 @@
-from typing import List, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field, field_validator
 
 
@@ -57,3 +58,98 @@ class StructuredNote(BaseModel):
     complaint_evidence: Optional[Evidence] = None
     diagnosis_evidence: Optional[Evidence] = None
     meds_evidence: Optional[Evidence] = None
+
+
+# Sub-models for sectioned extraction: each group of fields is asked for in its
+# own prompt and validated on its own, then the parts make up one StructuredNote.
+class VitalsSection(BaseModel):
+    vitals: Optional[Vitals] = None
+
+
+class MedicationsSection(BaseModel):
+    medications: Optional[List[Medication]] = None
+    meds_evidence: Optional[Evidence] = None
+
+
+class ProblemsSection(BaseModel):
+    complaints: Optional[List[str]] = None
+    duration: Optional[str] = None
+    findings: Optional[str] = None
+    diagnosis: Optional[List[str]] = None
+    complaint_evidence: Optional[Evidence] = None
+    diagnosis_evidence: Optional[Evidence] = None
+
+
+class PlanSection(BaseModel):
+    tests: Optional[List[str]] = None
+    advice: Optional[str] = None
+    follow_up: Optional[str] = None
+
+
+NOTE_SECTIONS: Dict[str, type] = {
+    "vitals": VitalsSection,
+    "medications": MedicationsSection,
+    "problems": ProblemsSection,
+    "plan": PlanSection,
+}
+
+
+def section_fields(section: str) -> List[str]:
+    """StructuredNote keys covered by one of NOTE_SECTIONS, in declaration order."""
+    model_cls = NOTE_SECTIONS[section]
+    if hasattr(model_cls, "model_fields"):  # pydantic v2
+        return list(model_cls.model_fields)
+    return list(model_cls.__fields__)
+
+
+@lru_cache(maxsize=None)
+def structured_note_json_schema() -> Dict[str, Any]:
+    """JSON Schema for StructuredNote, built once and handed to providers for constrained decoding.
+
+    Treat the returned dict as read-only; it is shared.
+    """
+    if hasattr(StructuredNote, "model_json_schema"):  # pydantic v2
+        return StructuredNote.model_json_schema()
+    return StructuredNote.schema()
+
+
+@lru_cache(maxsize=None)
+def packed_notes_json_schema() -> Dict[str, Any]:
+    """JSON Schema for a packed response: {"notes": [{"id": ..., <StructuredNote fields>}, ...]}."""
+    note = dict(structured_note_json_schema())
+    # Sub-model definitions must stay at the root for "#/$defs/..." refs to resolve.
+    defs = {k: note.pop(k) for k in ("$defs", "definitions") if k in note}
+    note.pop("title", None)
+    item = dict(note, properties={"id": {"type": "string"}, **note.get("properties", {})})
+    item["required"] = ["id"] + list(note.get("required", []))
+    schema = {
+        "title": "PackedNotes",
+        "type": "object",
+        "properties": {"notes": {"type": "array", "items": item}},
+        "required": ["notes"],
+    }
+    schema.update(defs)
+    return schema
+
+
+@lru_cache(maxsize=None)
+def extraction_with_questions_json_schema() -> Dict[str, Any]:
+    """StructuredNote schema plus a required top-level "questions" list, for combined extraction."""
+    schema = dict(structured_note_json_schema())
+    schema["properties"] = dict(schema.get("properties", {}), questions={"type": "array", "items": {"type": "string"}})
+    schema["required"] = list(schema.get("required", [])) + ["questions"]
+    return schema
+
+
+@lru_cache(maxsize=None)
+def section_json_schema(section: str, with_questions: bool = False) -> Dict[str, Any]:
+    """JSON Schema for one of NOTE_SECTIONS; `with_questions` adds a required "questions" list."""
+    model_cls = NOTE_SECTIONS[section]
+    if hasattr(model_cls, "model_json_schema"):  # pydantic v2
+        schema = model_cls.model_json_schema()
+    else:
+        schema = model_cls.schema()
+    if with_questions:
+        schema["properties"] = dict(schema.get("properties", {}), questions={"type": "array", "items": {"type": "string"}})
+        schema["required"] = list(schema.get("required", [])) + ["questions"]
+    return schema
@@ -1,12 +1,16 @@
 import json
-from typing import List, Dict
+from typing import Dict, Iterator, List
 
-def load_jsonl(path: str) -> List[Dict]:
-    out = []
+
+def iter_jsonl(path: str) -> Iterator[Dict]:
+    """Yield one record per non-empty line without reading the whole file."""
     with open(path, 'r', encoding='utf-8') as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
-            out.append(json.loads(line))
-    return out
+            yield json.loads(line)
+
+
+def load_jsonl(path: str) -> List[Dict]:
+    return list(iter_jsonl(path))
@@ -0,0 +1,154 @@
+import re
+from typing import Any, Dict, List, Optional
+
+# "Vitals:", "History of present illness -", "PLAN" at the start of a line.
+SECTION_START_RE = re.compile(r"^\s*(?:[A-Za-z][A-Za-z /&()]{0,38}\s*[:\-](?!\d)|[A-Z][A-Z /&]{2,38}$)")
+SENTENCE_END_RE = re.compile(r"(?<=[.;!?])\s+")
+
+LIST_FIELDS = ("complaints", "diagnosis", "tests", "questions")
+JOINED_FIELDS = ("findings", "advice")
+FIRST_FIELDS = ("duration", "follow_up", "complaint_evidence", "diagnosis_evidence", "meds_evidence")
+
+
+def _sections(text: str) -> List[str]:
+    """Split on blank lines and on lines that open a new section."""
+    sections: List[List[str]] = [[]]
+    for line in text.split("\n"):
+        if not line.strip():
+            if sections[-1]:
+                sections.append([])
+            continue
+        if SECTION_START_RE.match(line) and sections[-1]:
+            sections.append([])
+        sections[-1].append(line)
+    return ["\n".join(s) for s in sections if s]
+
+
+def _split_long(section: str, max_chars: int) -> List[str]:
+    """Break one oversized section on lines, then sentences, then whitespace."""
+    pieces: List[str] = []
+    for line in section.split("\n"):
+        for unit in SENTENCE_END_RE.split(line.strip()):
+            while len(unit) > max_chars:
+                cut = unit.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                pieces.append(unit[:cut].strip())
+                unit = unit[cut:].strip()
+            if unit:
+                pieces.append(unit)
+    return pieces
+
+
+def split_sections(text: str, max_chars: int) -> List[str]:
+    """Chunks of at most `max_chars`, cut on section boundaries where possible.
+
+    Neighbouring sections are packed together greedily so a note yields as few
+    chunks as its length allows.
+    """
+    if len(text) <= max_chars:
+        return [text]
+    units: List[str] = []
+    for section in _sections(text):
+        units.extend([section] if len(section) <= max_chars else _split_long(section, max_chars))
+    chunks: List[str] = []
+    current = ""
+    for unit in units:
+        candidate = f"{current}\n{unit}" if current else unit
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        chunks.append(current)
+        current = unit
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _norm(value: Any) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", str(value).lower()).strip()
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _same(a: Any, b: Any) -> bool:
+    # "500 mg" and "500mg" are the same dose.
+    return _norm(a).replace(" ", "") == _norm(b).replace(" ", "")
+
+
+def _merge_med(meds: List[Dict[str, Any]], med: Dict[str, Any]) -> None:
+    """Fold `med` into an entry for the same drug whose known details agree, else append it.
+
+    Evidence is not a detail: each chunk quotes its own text, and the first
+    quote is kept.
+    """
+    name = _norm(med.get("name", ""))
+    for existing in meds:
+        if _norm(existing.get("name", "")) != name:
+            continue
+        clash = any(
+            k != "evidence" and existing.get(k) is not None and v is not None and not _same(existing[k], v)
+            for k, v in med.items()
+        )
+        if not clash:
+            for k, v in med.items():
+                if existing.get(k) is None and v is not None:
+                    existing[k] = v
+            return
+    meds.append(dict(med))
+
+
+def merge_extractions(partials: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Combine per-chunk extractions (in note order) into one result.
+
+    Lists are concatenated and de-duplicated case-insensitively, keeping the
+    first spelling. Medications with the same name merge when their non-null
+    details agree (so a later "continue metformin" does not add a second
+    entry), and stay separate when they conflict (e.g. a dose change). Vitals
+    and single-valued fields take the first non-null value; findings and
+    advice from different chunks are joined with "; ".
+    """
+    merged: Dict[str, Any] = {}
+    meds: List[Dict[str, Any]] = []
+    vitals: Dict[str, Any] = {}
+    for part in partials:
+        if not isinstance(part, dict):
+            continue
+        for key in LIST_FIELDS + ("flags",):
+            if key not in part:
+                continue
+            items = merged.get(key) or []
+            seen = {_norm(i) for i in items}
+            for item in _as_list(part[key]):
+                if _norm(item) not in seen:
+                    seen.add(_norm(item))
+                    items.append(item)
+            # Keep null (not []) when no chunk found anything, as a single call would.
+            merged[key] = items if items or key == "flags" else None
+        for key in JOINED_FIELDS:
+            value = part.get(key)
+            if value in (None, ""):
+                continue
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = value
+            elif _norm(value) not in _norm(existing):
+                merged[key] = f"{existing}; {value}"
+        for key in FIRST_FIELDS:
+            if merged.get(key) is None and part.get(key) is not None:
+                merged[key] = part[key]
+        if isinstance(part.get("vitals"), dict):
+            for k, v in part["vitals"].items():
+                if vitals.get(k) is None and v is not None:
+                    vitals[k] = v
+        for med in _as_list(part.get("medications")):
+            if isinstance(med, dict) and med.get("name"):
+                _merge_med(meds, med)
+    if vitals:
+        merged["vitals"] = vitals
+    if meds or any(isinstance(p, dict) and "medications" in p for p in partials):
+        merged["medications"] = meds
+    return merged
@@ -0,0 +1,54 @@
+import re
+from typing import List
+
+# Lines that never carry clinical content: page furniture, print stamps,
+# separators and empty signature blocks.
+BOILERPLATE_RE = re.compile(
+    r"^\s*(?:"
+    r"page\s+\d+(?:\s*(?:of|/)\s*\d+)?"
+    r"|(?:this\s+is\s+an?\s+)?(?:electronically|computer)[\s\-]generated\b.*"
+    r"|(?:printed|generated)\s+on\s*[:\-]?\s*[\d/\-\.: ]+(?:am|pm)?"
+    r"|[\-=_*~#.]{3,}"
+    r"|(?:doctor'?s?\s+)?(?:signature|sign|seal)\s*[:.\-]?"
+    r")\s*$",
+    re.IGNORECASE,
+)
+# A short line that only names a section ("Vitals:", "PLAN", "Rx -").
+HEADER_LINE_RE = re.compile(r"^\s*[A-Za-z][A-Za-z /&]{0,38}\s*[:\-]?\s*$")
+INLINE_SPACE_RE = re.compile(r"[ \t ]+")
+
+
+def _is_header(line: str) -> bool:
+    return bool(HEADER_LINE_RE.match(line)) and (line.rstrip().endswith((":", "-")) or line.strip().isupper())
+
+
+def compact_note(text: str) -> str:
+    """Shrink a note before it goes into a prompt without losing clinical content.
+
+    Collapses runs of spaces/tabs and blank lines, strips trailing space,
+    drops boilerplate lines and a header that repeats the section already
+    open (e.g. re-printed after a page break). Words and numbers are never
+    changed.
+    """
+    if not text:
+        return text
+    out: List[str] = []
+    section = None
+    for raw in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+        line = INLINE_SPACE_RE.sub(" ", raw).strip()
+        if not line:
+            if out and out[-1] != "":
+                out.append("")
+            continue
+        if BOILERPLATE_RE.match(line):
+            continue
+        if _is_header(line):
+            key = line.rstrip(":- ").lower()
+            if key == section:
+                # Same section again (typically re-printed after a page break).
+                continue
+            section = key
+        out.append(line)
+    while out and out[-1] == "":
+        out.pop()
+    return "\n".join(out)
@@ -0,0 +1,150 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+BP_RE = re.compile(r"\bBP\s*[:\-]?\s*(\d{2,3})\s*/\s*(\d{2,3})\b", re.IGNORECASE)
+HR_RE = re.compile(r"\b(?:HR|PR|pulse(?:\s+rate)?)\s*[:\-]?\s*(\d{2,3})(?:\s*(?:bpm|/min))?\b", re.IGNORECASE)
+SPO2_RE = re.compile(r"\b(?:SpO2|O2\s*sat(?:uration)?|sats?)\s*[:\-]?\s*(\d{2,3}(?:\.\d+)?)\s*%?", re.IGNORECASE)
+TEMP_RE = re.compile(r"\bTemp(?:erature)?\s*[:\-]?\s*(\d{2,3}(?:\.\d+)?)\s*°?\s*([CF])?\b", re.IGNORECASE)
+VITAL_WORD_RE = re.compile(r"\b(?:BP|HR|PR|pulse|SpO2|sats?|temp|temperature)\b", re.IGNORECASE)
+
+_FREQ = r"OD|BD|BID|TID|TDS|QID|HS|SOS|PRN|once\s+daily|twice\s+daily|thrice\s+daily|three\s+times\s+daily"
+MED_RE = re.compile(
+    r"\b(?:(?:tab|tablet|cap|capsule|syp|syrup|inj)\.?\s+)?"
+    r"(?P<name>[A-Za-z][A-Za-z\-]+(?:\s+[A-Za-z][A-Za-z\-]+)?)\s+"
+    r"(?P<dose>\d+(?:\.\d+)?\s*(?:mg|mcg|g|ml|iu|units?))\b"
+    r"(?:\s+(?P<route>PO|oral|IV|IM|SC|SL|topical)\b)?"
+    r"(?:\s+(?P<freq>" + _FREQ + r")\b)?"
+    r"(?:\s+(?P<prn>PRN|SOS)\b)?"
+    r"(?:\s*(?:x|for)\s*(?P<duration>\d+\s*(?:days?|weeks?|months?)))?",
+    re.IGNORECASE,
+)
+# Anything medication-like left over after MED_RE means the rules missed a drug.
+MED_HINT_RE = re.compile(
+    r"\b(?:" + _FREQ + r"|mg|mcg|ml|tabs?|caps?|syp|inj|puffs?|inhaler|drops?|neb|ointment|cream)\b",
+    re.IGNORECASE,
+)
+_NAME_STOPWORDS = {
+    "rx", "prescribed", "add", "added", "on", "start", "started", "continue", "continued",
+    "given", "take", "and", "with", "then", "also", "tab", "tablet", "cap", "capsule", "syp", "inj",
+}
+# Words of the preceding free text ("Fever since 2 days paracetamol ...") that MED_RE's
+# two-word name group can swallow; never the start of a drug name.
+_DURATION_WORDS = {
+    "x", "for", "since", "of", "from", "ago", "today", "yesterday", "day", "days", "week", "weeks",
+    "month", "months", "year", "years", "yrs", "hour", "hours", "hrs", "min", "mins",
+}
+# Section labels that carry no information of their own once vitals/meds are taken out.
+HEADER_RE = re.compile(r"\b(?:vitals?|rx|meds?|medications?|prescription|plan|bpm)\b", re.IGNORECASE)
+
+
+@dataclass
+class PreExtraction:
+    fields: Dict[str, Any] = field(default_factory=dict)
+    covered: Set[str] = field(default_factory=set)
+    complete: bool = False
+
+    def as_structured(self) -> Dict[str, Any]:
+        """Full StructuredNote-shaped dict, for notes that need no LLM call."""
+        out: Dict[str, Any] = {
+            "complaints": None, "duration": None, "vitals": None, "findings": None, "diagnosis": None,
+            "medications": None, "tests": None, "advice": None, "follow_up": None, "flags": [],
+        }
+        out.update(self.fields)
+        return out
+
+
+def extract_vitals(text: str) -> Tuple[Dict[str, Any], List[Tuple[int, int]]]:
+    vitals: Dict[str, Any] = {}
+    spans: List[Tuple[int, int]] = []
+    m = BP_RE.search(text)
+    if m:
+        vitals["bp_systolic"], vitals["bp_diastolic"] = int(m.group(1)), int(m.group(2))
+        spans.append(m.span())
+    m = HR_RE.search(text)
+    if m:
+        vitals["hr"] = int(m.group(1))
+        spans.append(m.span())
+    m = SPO2_RE.search(text)
+    if m:
+        vitals["spo2"] = float(m.group(1))
+        spans.append(m.span())
+    m = TEMP_RE.search(text)
+    if m:
+        vitals["temp"] = f"{m.group(1)} {m.group(2).upper()}" if m.group(2) else m.group(1)
+        spans.append(m.span())
+    return vitals, spans
+
+
+def _clean_name(name: str) -> str:
+    words = name.split()
+    while words and (words[0].lower() in _NAME_STOPWORDS or words[0].lower() in _DURATION_WORDS):
+        words = words[1:]
+    return " ".join(words)
+
+
+CLAUSE_TAIL_RE = re.compile(r"[^.;,\n]*")
+
+
+def extract_medications(text: str) -> Tuple[List[Dict[str, Any]], List[Tuple[int, int]], bool]:
+    """Return (meds, spans, exact). `exact` is False when some match is followed
+    by more words in the same clause ("OD before breakfast"), i.e. the rule
+    may have dropped part of the instruction."""
+    meds: List[Dict[str, Any]] = []
+    spans: List[Tuple[int, int]] = []
+    exact = True
+    for m in MED_RE.finditer(text):
+        if CLAUSE_TAIL_RE.match(text, m.end()).group(0).strip():
+            exact = False
+        name = _clean_name(m.group("name"))
+        if not name:
+            continue
+        freq = m.group("freq")
+        prn = bool(m.group("prn")) or (freq or "").upper() in ("PRN", "SOS")
+        meds.append({
+            "name": name,
+            "dose": re.sub(r"\s+", " ", m.group("dose")).strip(),
+            "route": m.group("route"),
+            "frequency": freq,
+            "duration": m.group("duration"),
+            "prn": True if prn else None,
+        })
+        spans.append(m.span())
+    return meds, spans, exact
+
+
+def _residual(text: str, spans: List[Tuple[int, int]]) -> str:
+    parts = []
+    pos = 0
+    for start, end in sorted(spans):
+        if start >= pos:
+            parts.append(text[pos:start])
+            pos = end
+    parts.append(text[pos:])
+    return " ".join(parts)
+
+
+def pre_extract(text: str) -> PreExtraction:
+    """Fill vitals and medications from regular patterns before any LLM call.
+
+    A field is `covered` only when nothing in the note that looks like that
+    field was left unmatched; `complete` means no other content remains, so
+    the LLM can be skipped.
+    """
+    result = PreExtraction()
+    if not text:
+        return result
+    vitals, vital_spans = extract_vitals(text)
+    meds, med_spans, meds_exact = extract_medications(text)
+
+    if vitals and not VITAL_WORD_RE.search(_residual(text, vital_spans)):
+        result.fields["vitals"] = vitals
+        result.covered.add("vitals")
+    if meds and meds_exact and not MED_HINT_RE.search(_residual(text, med_spans)):
+        result.fields["medications"] = meds
+        result.covered.add("medications")
+
+    spans = (vital_spans if "vitals" in result.covered else []) + (med_spans if "medications" in result.covered else [])
+    leftover = HEADER_RE.sub(" ", _residual(text, spans))
+    result.complete = bool(result.covered) and not re.search(r"[A-Za-z]{2,}", leftover)
+    return result
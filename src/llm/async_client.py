@@ -0,0 +1,201 @@
+import asyncio
+from typing import Dict, Any, Optional
+
+try:
+    import httpx
+except Exception:  # pragma: no cover - optional dependency for the async client
+    httpx = None
+
+from src.core.schemas import structured_note_json_schema
+from src.llm.client import LLMClient, LLMClientError, openai
+from src.llm.prompts import REPAIR_PROMPT
+from src.llm.retry import async_retry, parse_retry_after
+from src.utils import metrics
+from src.utils.logging import get_logger
+from src.utils.timers import stage
+
+logger = get_logger()
+
+# Default number of requests allowed in flight per provider. A local Ollama
+# server usually runs one or two slots; hosted APIs take far more.
+DEFAULT_MAX_IN_FLIGHT = {"openai": 16, "ollama": 2}
+
+
+class AsyncLLMClient(LLMClient):
+    """asyncio flavour of LLMClient.
+
+    One pooled keep-alive HTTP client (Ollama) or one AsyncOpenAI client is
+    created lazily and reused for every call; a semaphore caps how many
+    requests are in flight at once. Use as `async with AsyncLLMClient() as c:`
+    or call `aclose()` when done.
+    """
+
+    def __init__(self, *args, max_in_flight: Optional[int] = None, **kwargs):
+        self._async_openai_client = None
+        self._http: Optional["httpx.AsyncClient"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        super().__init__(*args, **kwargs)
+        if httpx is None and self.provider == "ollama":
+            raise LLMClientError("httpx package not installed. Install it to use AsyncLLMClient with Ollama.")
+        self.max_in_flight = max_in_flight or DEFAULT_MAX_IN_FLIGHT.get(self.provider, 4)
+
+    def _setup_openai(self) -> None:
+        if hasattr(openai, "ChatCompletion"):
+            # Legacy SDK exposes `acreate` on the module-level resources.
+            super()._setup_openai()
+            return
+        from openai import AsyncOpenAI  # type: ignore
+
+        self._async_openai_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+
+    def _limiter(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    def _http_client(self) -> "httpx.AsyncClient":
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.ollama_base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_in_flight,
+                    max_keepalive_connections=self.max_in_flight,
+                ),
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._async_openai_client is not None:
+            await self._async_openai_client.close()
+            self._async_openai_client = None
+
+    async def __aenter__(self) -> "AsyncLLMClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def _aopenai_chat(self, prompt: str, temperature: float, schema: Optional[Dict[str, Any]] = None) -> str:
+        metrics.incr("llm_calls", provider="openai")
+        schema = schema if self.structured_output else None
+        try:
+            if self._async_openai_client is None:
+                resp = await openai.ChatCompletion.acreate(**self._openai_kwargs(prompt, schema))
+            else:
+                resp = await self._async_openai_client.chat.completions.create(**self._openai_kwargs(prompt, schema))
+        except Exception as e:
+            if not self._schema_rejected(e, schema):
+                raise
+            return await self._aopenai_chat(prompt, temperature)
+        return resp.choices[0].message.content
+
+    async def _aollama_call(self, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        metrics.incr("llm_calls", provider="ollama")
+        try:
+            resp = await self._http_client().post(f"/{endpoint.lstrip('/')}", json=payload)
+        except Exception as e:
+            raise LLMClientError(f"Ollama request failed: {e}") from e
+        if resp.status_code >= 400:
+            raise LLMClientError(
+                f"Ollama error {resp.status_code}: {resp.text}",
+                status_code=resp.status_code,
+                retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+            )
+        return resp.json()
+
+    async def _aollama_chat(self, prompt: str, schema: Optional[Dict[str, Any]] = None) -> str:
+        fmt = schema if (schema is not None and self.structured_output) else "json"
+        if self._ollama_endpoint() == "chat":
+            try:
+                data = await self._aollama_call("api/chat", self._ollama_chat_payload(prompt, fmt))
+            except LLMClientError as e:
+                if not self._schema_rejected(e, schema if fmt != "json" else None):
+                    raise
+                return await self._aollama_chat(prompt)
+            content = (data.get("message") or {}).get("content")
+            if content and str(content).strip():
+                self._remember_endpoint("chat")
+                return content
+
+        try:
+            data = await self._aollama_call("api/generate", self._ollama_generate_payload(prompt, fmt))
+        except LLMClientError as e:
+            if not self._schema_rejected(e, schema if fmt != "json" else None):
+                raise
+            return await self._aollama_chat(prompt)
+        content = data.get("response")
+        if not content or not str(content).strip():
+            raise LLMClientError("Ollama response missing content.")
+        self._remember_endpoint("generate")
+        return content
+
+    async def _achat(self, prompt: str, temperature: float, schema: Optional[Dict[str, Any]] = None) -> str:
+        async with self._limiter():
+            if self.provider == "openai":
+                return await self._aopenai_chat(prompt, temperature=temperature, schema=schema)
+            return await self._aollama_chat(prompt, schema=schema)
+
+    async def extract_structured(self, note_text: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
+        key = self._cache_key(note_text, options)
+        if key is not None:
+            cached = self.cache.get(key)
+            metrics.incr("cache_hits" if cached is not None else "cache_misses")
+            if cached is not None:
+                return cached
+        result = await self._extract_structured(note_text, options=options)
+        if key is not None:
+            self.cache.set(key, result)
+        return result
+
+    @async_retry(max_attempts=3)
+    async def _extract_structured(self, note_text: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
+        prompt = self._extraction_template(options).format(note_text=note_text)
+        try:
+            content = await self._achat(prompt, temperature=0.1, schema=self._extraction_schema(options))
+        except Exception as e:
+            logger.exception("LLM extraction failed")
+            raise LLMClientError(str(e)) from e
+
+        try:
+            return self._safe_json_load(content)
+        except Exception:
+            metrics.incr("repairs", source="client")
+            with stage("repair"):
+                return await self.repair_json(note_text, content, options=options, schema=self._extraction_schema(options))
+
+    @async_retry(max_attempts=2)
+    async def repair_json(
+        self,
+        note_text: str,
+        bad_json: str,
+        options: Dict[str, Any] = None,
+        schema: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        prompt = REPAIR_PROMPT.format(bad_json=bad_json)
+        try:
+            content = await self._achat(prompt, temperature=0.0, schema=schema or structured_note_json_schema())
+            return self._safe_json_load(content)
+        except Exception as e:
+            logger.exception("LLM repair failed")
+            raise LLMClientError(str(e)) from e
+
+    @async_retry(max_attempts=2)
+    async def generate_followup_questions(
+        self,
+        note_text: str,
+        structured_json: Dict[str, Any],
+        flags: Optional[list] = None,
+        reuse_context: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        # Accepted to match LLMClient; the async client keeps no conversations, so the full prompt is always sent.
+        prompt = self._questions_prompt(note_text, structured_json, flags)
+        try:
+            content = await self._achat(prompt, temperature=0.2)
+            return self._parse_questions(content)
+        except Exception as e:
+            logger.exception("LLM follow-up questions failed")
+            raise LLMClientError(str(e)) from e
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from src.utils.config import get_config
+
+
+def make_cache_key(masked_note: str, prompt_template: str, provider: str, model: str) -> str:
+    """Content address for one extraction: same note, prompt, provider and model -> same key."""
+    h = hashlib.sha256()
+    for part in (provider or "", model or "", prompt_template or "", masked_note or ""):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class ExtractionCache:
+    """Two-tier cache of extraction results.
+
+    An in-memory LRU sits in front of an optional SQLite file. Entries older
+    than `ttl_seconds` are treated as misses; each tier is trimmed to
+    `max_entries` (oldest first).
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS extraction_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS extraction_cache_created ON extraction_cache(created)")
+            self._db.commit()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None and self._expired(entry[1]):
+                del self._mem[key]
+                entry = None
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT value, created FROM extraction_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    entry = (json.loads(row[0]), row[1])
+                    self._remember(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._mem.move_to_end(key)
+            self.hits += 1
+            # Hand out a copy so callers cannot mutate the cached value.
+            return json.loads(json.dumps(entry[0]))
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        created = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, (json.loads(payload), created))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO extraction_cache (key, value, created) VALUES (?, ?, ?)",
+                    (key, payload, created),
+                )
+                self._evict_disk()
+                self._db.commit()
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        if self.ttl_seconds is not None:
+            self._db.execute("DELETE FROM extraction_cache WHERE created < ?", (time.time() - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM extraction_cache WHERE key NOT IN "
+            "(SELECT key FROM extraction_cache ORDER BY created DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM extraction_cache")
+                self._db.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": len(self._mem),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_default_cache: Optional[ExtractionCache] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[ExtractionCache]:
+    """Process-wide cache built from env config, or None when caching is disabled."""
+    global _default_cache
+    cfg = get_config()
+    if not cfg.cache_enabled:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ExtractionCache(
+                path=cfg.cache_path,
+                max_entries=cfg.cache_max_entries,
+                ttl_seconds=cfg.cache_ttl_seconds,
+            )
+        return _default_cache
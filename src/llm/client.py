@@ -1,5 +1,11 @@
 import json
-from typing import Dict, Any, Optional
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Dict, Any, Iterator, List, Optional
 
 import requests
 
@@ -8,16 +14,116 @@ try:
 except Exception:  # pragma: no cover - optional dependency for local Ollama use
     openai = None
 
-from src.llm.prompts import EXTRACTION_PROMPT, REPAIR_PROMPT, QUESTIONS_PROMPT
-from src.llm.retry import retry
+from src.core.schemas import (
+    extraction_with_questions_json_schema,
+    packed_notes_json_schema,
+    section_fields,
+    section_json_schema,
+    structured_note_json_schema,
+)
+from src.llm.cache import ExtractionCache, get_default_cache, make_cache_key
+from src.llm.hedging import CancelEvent, HedgePolicy, run_hedged
+from src.llm.json_repair import repair_json_text
+from src.llm.prompts import (
+    EXTRACTION_PROMPT,
+    EXTRACTION_WITH_QUESTIONS_PROMPT,
+    PACKED_EXTRACTION_PROMPT,
+    PACKED_NOTE_BLOCK,
+    PREFILLED_FIELDS_NOTE,
+    QUESTIONS_FOLLOWUP_PROMPT,
+    QUESTIONS_FOLLOWUP_UPDATED_PROMPT,
+    QUESTIONS_PROMPT,
+    REPAIR_PROMPT,
+    SECTION_EXTRACTION_PROMPT,
+    SYSTEM_PROMPT,
+)
+from src.llm.retry import parse_retry_after, retry, status_code_of
+from src.llm.streaming import PartialCallback, StreamingJSONParser
+from src.llm.tokens import estimate_tokens, size_context
 from src.utils.config import get_config
+from src.utils import metrics
 from src.utils.logging import get_logger
+from src.utils.timers import stage
 
 logger = get_logger()
 
+# Extraction conversations kept per client for follow-up questions.
+MAX_CONVERSATIONS = 64
+# HTTP 400 bodies that mean "this provider/model cannot do schema-constrained output".
+SCHEMA_ERROR_RE = re.compile(r"response_format|json_schema|\bformat\b", re.IGNORECASE)
+# Threads shared by the original and duplicate attempts of hedged calls.
+HEDGE_WORKERS = 32
+
+Messages = List[Dict[str, str]]
+
+# (ollama_base_url, model) -> "chat" or "generate": which endpoint returned
+# content last time. Shared by all clients so a model that needs the generate
+# fallback pays for the failed chat call once per process, not once per note.
+_ollama_endpoints: Dict[Any, str] = {}
+_ollama_endpoints_lock = threading.Lock()
+
+
+def parse_keep_alive(value: Optional[str]) -> Any:
+    """OLLAMA_KEEP_ALIVE as Ollama expects it: seconds as a number, or a duration string such as "30m"."""
+    if value is None or not str(value).strip():
+        return None
+    value = str(value).strip()
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
 
 class LLMClientError(Exception):
-    pass
+    def __init__(self, message: str = "", status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _abort_response(resp: requests.Response) -> None:
+    """Close a streamed response from another thread, waking a read blocked on its socket."""
+    shutdown = getattr(resp.raw, "shutdown", None)
+    if shutdown is not None:
+        # urllib3 >= 2.3: shuts the socket down so a recv() in another thread returns.
+        shutdown()
+    resp.close()
+
+
+def _filled(value: Any) -> Any:
+    """`value` without empty entries (None, "", [], {}) or flags/questions, for comparing records."""
+    if isinstance(value, dict):
+        pairs = ((k, _filled(v)) for k, v in value.items() if k not in ("flags", "questions"))
+        return {k: v for k, v in pairs if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [_filled(v) for v in value]
+    return value
+
+
+def clean_questions(value: Any) -> List[str]:
+    """Non-empty question strings from a model's "questions" value ([] if it is not a list)."""
+    if not isinstance(value, list):
+        return []
+    return [str(q).strip() for q in value if str(q).strip()]
+
+
+def split_packed_response(data: Dict[str, Any], notes: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """Map a packed response back to note ids, keeping the first entry per id.
+
+    Accepts the requested {"notes": [{"id": ...}, ...]} shape and the common
+    slip of an object keyed by id.
+    """
+    entries: List[Any] = data.get("notes") if isinstance(data.get("notes"), list) else []
+    if not entries:
+        entries = [dict(v, id=k) for k, v in data.items() if k in notes and isinstance(v, dict)]
+    out: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        note_id = str(entry.get("id", ""))
+        if note_id in notes and note_id not in out:
+            out[note_id] = {k: v for k, v in entry.items() if k != "id"}
+    return out
 
 
 class LLMClient:
@@ -29,6 +135,9 @@ class LLMClient:
         base_url: Optional[str] = None,
         ollama_model: Optional[str] = None,
         ollama_base_url: Optional[str] = None,
+        cache: Optional[ExtractionCache] = None,
+        use_cache: bool = True,
+        system_prompt: Optional[str] = None,
     ):
         cfg = get_config()
         self.api_key = cfg.api_key
@@ -39,46 +148,135 @@ class LLMClient:
         self.ollama_model = ollama_model or cfg.ollama_model
         self.ollama_base_url = (ollama_base_url or cfg.ollama_base_url or "http://localhost:11434").rstrip("/")
         self._openai_client = None
+        self._session: Optional[requests.Session] = None
+        self.cache = (cache or get_default_cache()) if use_cache else None
+        # Flips to False the first time the provider rejects a JSON Schema format.
+        self.structured_output = cfg.structured_output
+        # Sent unchanged as the first message of every call so providers can reuse the cached prefix.
+        self.system_prompt = system_prompt or SYSTEM_PROMPT
+        self.reuse_context = cfg.reuse_context
+        self.keep_alive = parse_keep_alive(cfg.ollama_keep_alive)
+        self.num_ctx_max = cfg.ollama_num_ctx_max
+        self._conversations: "OrderedDict[str, Messages]" = OrderedDict()
+        self._conversations_lock = threading.Lock()
+        self.hedge = HedgePolicy(cfg.hedge_percentile, cfg.hedge_budget) if cfg.hedge else None
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._hedge_lock = threading.Lock()
 
         if self.provider == "openai":
             if not self.api_key:
                 raise LLMClientError("OPENAI_API_KEY missing. Set it in environment to enable OpenAI calls.")
             if openai is None:
                 raise LLMClientError("openai package not installed. Install it or switch to Ollama.")
-
-            # Support both legacy and v1+ OpenAI SDKs.
-            if hasattr(openai, "ChatCompletion"):
-                openai.api_key = self.api_key
-                if self.base_url:
-                    openai.api_base = self.base_url
-            else:
-                from openai import OpenAI  # type: ignore
-
-                self._openai_client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+            self._setup_openai()
         elif self.provider == "ollama":
             if not self.ollama_model:
                 raise LLMClientError("OLLAMA_MODEL missing. Set it in environment to enable Ollama calls.")
         else:
             raise LLMClientError(f"Unknown LLM provider: {self.provider}")
 
-    def _openai_chat(self, prompt: str, temperature: float) -> str:
-        if self._openai_client is None:
-            resp = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                # temperature=temperature,
-                timeout=self.timeout,
-            )
-            return resp.choices[0].message.content
+    def _setup_openai(self) -> None:
+        # Support both legacy and v1+ OpenAI SDKs.
+        if hasattr(openai, "ChatCompletion"):
+            openai.api_key = self.api_key
+            if self.base_url:
+                openai.api_base = self.base_url
+        else:
+            from openai import OpenAI  # type: ignore
 
-        resp = self._openai_client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            # temperature=temperature,
-            timeout=self.timeout,
-        )
+            self._openai_client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+
+    def _messages(self, prompt: str, history: Optional[Messages] = None) -> Messages:
+        return [{"role": "system", "content": self.system_prompt}, *(history or []), {"role": "user", "content": prompt}]
+
+    def _openai_kwargs(self, prompt: str, schema: Optional[Dict[str, Any]], history: Optional[Messages] = None) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {
+            "model": self.model,
+            "messages": self._messages(prompt, history),
+            # "temperature": temperature,
+            "timeout": self.timeout,
+        }
+        if schema is not None:
+            kwargs["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "structured_note", "schema": schema},
+            }
+        return kwargs
+
+    def _openai_chat(
+        self,
+        prompt: str,
+        temperature: float,
+        schema: Optional[Dict[str, Any]] = None,
+        history: Optional[Messages] = None,
+    ) -> str:
+        metrics.incr("llm_calls", provider="openai")
+        schema = schema if self.structured_output else None
+        try:
+            if self._openai_client is None:
+                resp = openai.ChatCompletion.create(**self._openai_kwargs(prompt, schema, history))
+            else:
+                resp = self._openai_client.chat.completions.create(**self._openai_kwargs(prompt, schema, history))
+        except Exception as e:
+            if not self._schema_rejected(e, schema):
+                raise
+            return self._openai_chat(prompt, temperature, history=history)
         return resp.choices[0].message.content
 
+    def _openai_stream(
+        self,
+        prompt: str,
+        temperature: float,
+        schema: Optional[Dict[str, Any]] = None,
+        cancel: Optional[CancelEvent] = None,
+    ) -> Iterator[str]:
+        metrics.incr("llm_calls", provider="openai")
+        schema = schema if self.structured_output else None
+        kwargs = dict(self._openai_kwargs(prompt, schema), stream=True)
+        try:
+            if self._openai_client is None:
+                stream = openai.ChatCompletion.create(**kwargs)
+            else:
+                stream = self._openai_client.chat.completions.create(**kwargs)
+        except Exception as e:
+            if not self._schema_rejected(e, schema):
+                raise
+            yield from self._openai_stream(prompt, temperature, cancel=cancel)
+            return
+        close = getattr(stream, "close", None)
+        if cancel is not None and close is not None:
+            cancel.on_set(close)
+        try:
+            for chunk in stream:
+                choices = chunk["choices"] if isinstance(chunk, dict) else chunk.choices
+                if not choices:
+                    continue
+                delta = choices[0]["delta"] if isinstance(choices[0], dict) else choices[0].delta
+                piece = delta.get("content") if isinstance(delta, dict) else getattr(delta, "content", None)
+                if piece:
+                    yield piece
+        finally:
+            # Closing the HTTP stream stops generation server-side.
+            if close is not None:
+                close()
+
+    def _schema_rejected(self, exc: Exception, schema: Optional[Dict[str, Any]]) -> bool:
+        """Remember a provider that refuses schema-constrained output (HTTP 400) and fall back to plain JSON.
+
+        Only a 400 that names the format parameter counts: the flag is shared
+        by every later request, so an oversized note or a bad model name must
+        not turn schemas off.
+        """
+        if schema is None or status_code_of(exc) != 400:
+            return False
+        reason = f"{exc} {exc.__cause__ or ''}"
+        if not SCHEMA_ERROR_RE.search(reason):
+            return False
+        logger.warning("Provider rejected JSON Schema output; falling back to plain JSON mode: %s", reason)
+        metrics.incr("structured_output_fallbacks", provider=self.provider)
+        self.structured_output = False
+        return True
+
     def _extract_json_candidate(self, text: str) -> Optional[str]:
         if not text:
             return None
@@ -116,80 +314,506 @@ class LLMClient:
                         return parsed
                 except Exception:
                     pass
+        # Fix common formatting slips locally before paying for an LLM repair call.
+        repaired = repair_json_text(str(content))
+        if repaired is not None:
+            metrics.incr("local_repairs")
+            return repaired
         raise LLMClientError("LLM response is not valid JSON.")
 
-    def _ollama_call(self, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    def _http_session(self) -> requests.Session:
+        # One keep-alive session per client so repeated calls skip the TCP handshake.
+        if self._session is None:
+            self._session = requests.Session()
+        return self._session
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        if self._openai_client is not None and hasattr(self._openai_client, "close"):
+            self._openai_client.close()
+            self._openai_client = None
+        if self._hedge_pool is not None:
+            # Cancelling the losing attempts closed their connections; they exit on their own.
+            self._hedge_pool.shutdown(wait=False)
+            self._hedge_pool = None
+
+    def _ollama_post(self, endpoint: str, payload: Dict[str, Any], stream: bool = False) -> requests.Response:
         url = f"{self.ollama_base_url}/{endpoint.lstrip('/')}"
+        metrics.incr("llm_calls", provider="ollama")
         try:
-            resp = requests.post(url, json=payload, timeout=self.timeout)
+            resp = self._http_session().post(url, json=payload, timeout=self.timeout, stream=stream)
         except Exception as e:
-            raise LLMClientError(f"Ollama request failed: {e}")
+            raise LLMClientError(f"Ollama request failed: {e}") from e
         if resp.status_code >= 400:
-            raise LLMClientError(f"Ollama error {resp.status_code}: {resp.text}")
-        return resp.json()
-
-    def _ollama_chat(self, prompt: str) -> str:
-        data = self._ollama_call(
-            "api/chat",
-            {
-                "model": self.ollama_model,
-                "messages": [
-                    {"role": "system", "content": "Return ONLY valid JSON. No markdown, no commentary."},
-                    {"role": "user", "content": prompt},
-                ],
-                "stream": False,
-                "format": "json",
-                "options": {"temperature": 0},
-            },
-        )
-        content = (data.get("message") or {}).get("content")
-        if content and str(content).strip():
-            return content
-
-        data = self._ollama_call(
-            "api/generate",
-            {
-                "model": self.ollama_model,
-                "prompt": prompt,
-                "stream": False,
-                "format": "json",
-                "options": {"temperature": 0},
-            },
-        )
+            try:
+                raise LLMClientError(
+                    f"Ollama error {resp.status_code}: {resp.text}",
+                    status_code=resp.status_code,
+                    retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+                )
+            finally:
+                resp.close()
+        return resp
+
+    def _ollama_call(self, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return self._ollama_post(endpoint, payload).json()
+
+    def _ollama_stream(
+        self, endpoint: str, payload: Dict[str, Any], cancel: Optional[CancelEvent] = None
+    ) -> Iterator[str]:
+        """Yield content pieces from an Ollama NDJSON stream (chat or generate).
+
+        Setting `cancel` closes the response from the cancelling thread, so a
+        read blocked on a stalled server fails at once instead of at the timeout.
+        """
+        resp = self._ollama_post(endpoint, dict(payload, stream=True), stream=True)
+        if cancel is not None:
+            cancel.on_set(lambda: _abort_response(resp))
+        try:
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get("error"):
+                    raise LLMClientError(f"Ollama error: {event['error']}")
+                piece = (event.get("message") or {}).get("content") or event.get("response")
+                if piece:
+                    yield piece
+                if event.get("done"):
+                    return
+        finally:
+            # Dropping the connection makes Ollama stop generating.
+            resp.close()
+
+    def _ollama_chat_payload(self, prompt: str, fmt: Any = "json", history: Optional[Messages] = None) -> Dict[str, Any]:
+        return self._with_keep_alive({
+            "model": self.ollama_model,
+            "messages": self._messages(prompt, history),
+            "stream": False,
+            "format": fmt,
+            "options": self._ollama_options(prompt, fmt, history),
+        })
+
+    def _ollama_generate_payload(self, prompt: str, fmt: Any = "json", history: Optional[Messages] = None) -> Dict[str, Any]:
+        if history:
+            prompt = "\n\n".join([m["content"] for m in history] + [prompt])
+        return self._with_keep_alive({
+            "model": self.ollama_model,
+            "system": self.system_prompt,
+            "prompt": prompt,
+            "stream": False,
+            "format": fmt,
+            "options": self._ollama_options(prompt, fmt),
+        })
+
+    def _ollama_options(self, prompt: str, fmt: Any, history: Optional[Messages] = None) -> Dict[str, Any]:
+        options: Dict[str, Any] = {"temperature": 0}
+        if not self.num_ctx_max:
+            return options
+        full_text = "\n".join([self.system_prompt, *(m["content"] for m in history or []), prompt])
+        sizing = size_context(full_text, prompt, fmt if isinstance(fmt, dict) else None, max_ctx=self.num_ctx_max)
+        if estimate_tokens(full_text) + sizing["num_predict"] > sizing["num_ctx"]:
+            # Ollama would silently drop the start of the prompt; say so.
+            logger.warning("Prompt (~%d tokens) exceeds num_ctx %d", estimate_tokens(full_text), sizing["num_ctx"])
+            metrics.incr("context_overflow", provider="ollama")
+        options.update(sizing)
+        return options
+
+    def _with_keep_alive(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    def _ollama_endpoint(self) -> str:
+        """Endpoint that produced content for this model before ("chat" until we learn otherwise)."""
+        return _ollama_endpoints.get((self.ollama_base_url, self.ollama_model), "chat")
+
+    def _remember_endpoint(self, endpoint: str) -> None:
+        key = (self.ollama_base_url, self.ollama_model)
+        with _ollama_endpoints_lock:
+            if _ollama_endpoints.get(key) != endpoint:
+                logger.info("Ollama model %s answers on api/%s", self.ollama_model, endpoint)
+                _ollama_endpoints[key] = endpoint
+
+    def warmup(self) -> Optional[float]:
+        """Load the model (and keep it loaded for `keep_alive`) before the first real request.
+
+        Returns the seconds it took, or None when there is nothing to warm or
+        the server is unreachable; never raises.
+        """
+        if self.provider != "ollama":
+            return None
+        start = time.perf_counter()
+        try:
+            # An empty prompt makes Ollama load the model without generating anything. Load it
+            # with the num_ctx a typical extraction uses, or the first real request reloads it.
+            payload = {"model": self.ollama_model, "prompt": "", "stream": False}
+            if self.num_ctx_max:
+                typical = self._ollama_options(EXTRACTION_PROMPT, structured_note_json_schema())
+                payload["options"] = {"num_ctx": typical["num_ctx"]}
+            self._ollama_call("api/generate", self._with_keep_alive(payload))
+        except Exception as e:
+            logger.warning("Ollama warm-up for %s failed: %s", self.ollama_model, e)
+            return None
+        elapsed = time.perf_counter() - start
+        metrics.observe("warmup_seconds", elapsed, provider=self.provider)
+        return elapsed
+
+    def _ollama_chat(
+        self,
+        prompt: str,
+        schema: Optional[Dict[str, Any]] = None,
+        history: Optional[Messages] = None,
+    ) -> str:
+        fmt = schema if (schema is not None and self.structured_output) else "json"
+        if self._ollama_endpoint() == "chat":
+            try:
+                data = self._ollama_call("api/chat", self._ollama_chat_payload(prompt, fmt, history))
+            except LLMClientError as e:
+                if not self._schema_rejected(e, schema if fmt != "json" else None):
+                    raise
+                return self._ollama_chat(prompt, history=history)
+            content = (data.get("message") or {}).get("content")
+            if content and str(content).strip():
+                self._remember_endpoint("chat")
+                return content
+
+        try:
+            data = self._ollama_call("api/generate", self._ollama_generate_payload(prompt, fmt, history))
+        except LLMClientError as e:
+            if not self._schema_rejected(e, schema if fmt != "json" else None):
+                raise
+            return self._ollama_chat(prompt, history=history)
         content = data.get("response")
         if not content or not str(content).strip():
             raise LLMClientError("Ollama response missing content.")
+        self._remember_endpoint("generate")
         return content
 
-    @retry(max_attempts=3)
+    def _ollama_stream_chat(
+        self, prompt: str, schema: Optional[Dict[str, Any]] = None, cancel: Optional[CancelEvent] = None
+    ) -> Iterator[str]:
+        fmt = schema if (schema is not None and self.structured_output) else "json"
+        endpoint = self._ollama_endpoint()
+        emitted = False
+        try:
+            if endpoint == "chat":
+                with closing(self._ollama_stream("api/chat", self._ollama_chat_payload(prompt, fmt), cancel)) as pieces:
+                    for piece in pieces:
+                        if not emitted and piece.strip():
+                            emitted = True
+                            self._remember_endpoint("chat")
+                        yield piece
+                if emitted or (cancel is not None and cancel.is_set()):
+                    return
+            with closing(self._ollama_stream("api/generate", self._ollama_generate_payload(prompt, fmt), cancel)) as pieces:
+                for piece in pieces:
+                    if not emitted and piece.strip():
+                        emitted = True
+                        self._remember_endpoint("generate")
+                    yield piece
+        except LLMClientError as e:
+            if emitted or not self._schema_rejected(e, schema if fmt != "json" else None):
+                raise
+            yield from self._ollama_stream_chat(prompt, cancel=cancel)
+
+    def _questions_prompt(self, note_text: str, structured_json: Dict[str, Any], flags: Optional[list]) -> str:
+        return QUESTIONS_PROMPT.format(
+            note_text=note_text,
+            structured_json=json.dumps(structured_json, ensure_ascii=False),
+            flags_json=json.dumps(flags or [], ensure_ascii=False),
+        )
+
+    def _parse_questions(self, content: str) -> Dict[str, Any]:
+        data = self._safe_json_load(content)
+        return {"questions": clean_questions(data.get("questions"))}
+
+    def _chat(
+        self,
+        prompt: str,
+        temperature: float,
+        schema: Optional[Dict[str, Any]] = None,
+        history: Optional[Messages] = None,
+    ) -> str:
+        if self.hedge is not None and history is None:
+            return self._hedged_chat(prompt, temperature=temperature, schema=schema)
+        if self.provider == "openai":
+            return self._openai_chat(prompt, temperature=temperature, schema=schema, history=history)
+        return self._ollama_chat(prompt, schema=schema, history=history)
+
+    def _hedged_chat(self, prompt: str, temperature: float, schema: Optional[Dict[str, Any]] = None) -> str:
+        """_chat that sends a duplicate when the first answer is slower than usual (see HedgePolicy).
+
+        Attempts are streamed so the loser can be stopped: cancelling it closes
+        its connection, which unblocks a stalled read and makes the provider
+        stop generating.
+        """
+        if self._hedge_pool is None:
+            with self._hedge_lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+        return run_hedged(
+            lambda cancel: self._stream_chat(prompt, temperature=temperature, schema=schema, cancel=cancel),
+            self.hedge,
+            self._hedge_pool,
+            accept=self._is_json_object,
+        )
+
+    def _is_json_object(self, content: str) -> bool:
+        candidates = [content, self._extract_json_candidate(content)]
+        for candidate in candidates:
+            try:
+                if candidate and isinstance(json.loads(candidate), dict):
+                    return True
+            except ValueError:
+                pass
+        return False
+
+    def _remember_conversation(self, note_text: str, prompt: str, content: str) -> None:
+        with self._conversations_lock:
+            self._conversations[note_text] = [
+                {"role": "user", "content": prompt},
+                {"role": "assistant", "content": content},
+            ]
+            self._conversations.move_to_end(note_text)
+            while len(self._conversations) > MAX_CONVERSATIONS:
+                self._conversations.popitem(last=False)
+
+    def _conversation_for(self, note_text: str) -> Optional[Messages]:
+        with self._conversations_lock:
+            return self._conversations.get(note_text)
+
+    def _stream_chat(
+        self,
+        prompt: str,
+        temperature: float,
+        schema: Optional[Dict[str, Any]] = None,
+        on_partial: Optional[PartialCallback] = None,
+        cancel: Optional[CancelEvent] = None,
+    ) -> str:
+        """Stream a response and stop reading as soon as the top-level JSON object closes (or `cancel` is set)."""
+        if self.provider == "openai":
+            pieces = self._openai_stream(prompt, temperature=temperature, schema=schema, cancel=cancel)
+        else:
+            pieces = self._ollama_stream_chat(prompt, schema=schema, cancel=cancel)
+        parser = StreamingJSONParser(on_field=on_partial)
+        started = time.perf_counter()
+        with closing(pieces):
+            for piece in pieces:
+                if started is not None:
+                    metrics.observe("llm_first_token_seconds", time.perf_counter() - started, provider=self.provider)
+                    started = None
+                if parser.feed(piece) or (cancel is not None and cancel.is_set()):
+                    break
+        content = parser.text()
+        if not content.strip():
+            raise LLMClientError("LLM stream ended without content.")
+        return content
+
+    @property
+    def active_model(self) -> Optional[str]:
+        return self.model if self.provider == "openai" else self.ollama_model
+
+    def _cache_key(self, note_text: str, options: Optional[Dict[str, Any]]) -> Optional[str]:
+        if self.cache is None or not (options or {}).get("cache", True):
+            return None
+        return make_cache_key(
+            note_text, self.system_prompt + self._extraction_template(options), self.provider, self.active_model
+        )
+
+    def _extraction_template(self, options: Optional[Dict[str, Any]]) -> str:
+        options = options or {}
+        template = EXTRACTION_WITH_QUESTIONS_PROMPT if options.get("with_questions") else EXTRACTION_PROMPT
+        prefilled = options.get("prefilled_fields")
+        if not prefilled:
+            return template
+        # Ask only for what the rule-based pre-extractor could not fill.
+        return template + PREFILLED_FIELDS_NOTE.format(fields=", ".join(sorted(prefilled)))
+
+    @staticmethod
+    def _extraction_schema(options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if (options or {}).get("with_questions"):
+            return extraction_with_questions_json_schema()
+        return structured_note_json_schema()
+
     def extract_structured(self, note_text: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
-        prompt = EXTRACTION_PROMPT.format(note_text=note_text)
+        key = self._cache_key(note_text, options)
+        if key is not None:
+            cached = self.cache.get(key)
+            metrics.incr("cache_hits" if cached is not None else "cache_misses")
+            if cached is not None:
+                on_partial = (options or {}).get("on_partial")
+                if on_partial is not None:
+                    for field, value in cached.items():
+                        on_partial(field, value)
+                self.remember_extraction(note_text, cached, options)
+                return cached
+        result = self._extract_structured(note_text, options=options)
+        if key is not None:
+            self.cache.set(key, result)
+        return result
+
+    @retry(max_attempts=3)
+    def _extract_structured(self, note_text: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
+        options = options or {}
+        prompt = self._extraction_template(options).format(note_text=note_text)
         try:
-            if self.provider == "openai":
-                content = self._openai_chat(prompt, temperature=0.1)
+            if options.get("stream") or options.get("on_partial"):
+                content = self._stream_chat(
+                    prompt, temperature=0.1, schema=self._extraction_schema(options), on_partial=options.get("on_partial")
+                )
             else:
-                content = self._ollama_chat(prompt)
+                content = self._chat(prompt, temperature=0.1, schema=self._extraction_schema(options))
         except Exception as e:
             logger.exception("LLM extraction failed")
-            raise LLMClientError(str(e))
+            raise LLMClientError(str(e)) from e
 
         try:
-            return self._safe_json_load(content)
+            result = self._safe_json_load(content)
+        except Exception:
+            metrics.incr("repairs", source="client")
+            with stage("repair"):
+                repaired = self.repair_json(note_text, content, options=options, schema=self._extraction_schema(options))
+            self.remember_extraction(note_text, repaired, options)
+            return repaired
+        if self.reuse_context:
+            self._remember_conversation(note_text, prompt, content)
+        return result
+
+    def remember_extraction(self, note_text: str, result: Dict[str, Any], options: Dict[str, Any] = None) -> None:
+        """Store an extraction turn for `note_text` whose answer did not come from one fresh call.
+
+        Cache hits, repaired output and results assembled from chunks or
+        section sub-prompts use the result JSON as the assistant message, so
+        follow-up questions can still continue the conversation. No-op unless
+        reuse_context is on.
+        """
+        if not self.reuse_context:
+            return
+        prompt = self._extraction_template(options).format(note_text=note_text)
+        self._remember_conversation(note_text, prompt, json.dumps(result, ensure_ascii=False))
+
+    def _matches_turn(self, content: str, structured_json: Dict[str, Any]) -> bool:
+        """True when the assistant answer `content` already says what `structured_json` does."""
+        try:
+            answer = self._safe_json_load(content)
         except Exception:
-            return self.repair_json(note_text, content, options=options)
+            return False
+        return _filled(answer) == _filled(structured_json)
+
+    @staticmethod
+    def _section_keys(section: str, options: Optional[Dict[str, Any]]) -> List[str]:
+        keys = section_fields(section)
+        # Combined mode asks for questions once, alongside the plan fields.
+        if section == "plan" and (options or {}).get("with_questions"):
+            keys.append("questions")
+        return keys
+
+    def extract_section(self, note_text: str, section: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Extract only the keys of one of NOTE_SECTIONS from the whole note.
+
+        Keys outside the section are dropped from the answer, so the parts of
+        a note can be assembled without one overwriting another.
+        """
+        keys = self._section_keys(section, options)
+        key = None
+        if self.cache is not None and (options or {}).get("cache", True):
+            key = make_cache_key(
+                note_text, self.system_prompt + SECTION_EXTRACTION_PROMPT + ",".join(keys), self.provider, self.active_model
+            )
+            cached = self.cache.get(key)
+            metrics.incr("cache_hits" if cached is not None else "cache_misses")
+            if cached is not None:
+                return cached
+        result = self._extract_section(note_text, section, keys)
+        if key is not None:
+            self.cache.set(key, result)
+        return result
+
+    @retry(max_attempts=3)
+    def _extract_section(self, note_text: str, section: str, keys: List[str]) -> Dict[str, Any]:
+        prompt = SECTION_EXTRACTION_PROMPT.format(keys=", ".join(keys), note_text=note_text)
+        schema = section_json_schema(section, with_questions="questions" in keys)
+        try:
+            content = self._chat(prompt, temperature=0.1, schema=schema)
+        except Exception as e:
+            logger.exception("LLM section extraction failed")
+            raise LLMClientError(str(e)) from e
+        try:
+            result = self._safe_json_load(content)
+        except Exception:
+            metrics.incr("repairs", source="client")
+            with stage("repair"):
+                # The section's own schema, so keys such as "questions" survive the repair.
+                result = self.repair_json(note_text, content, schema=schema)
+        return {k: result[k] for k in keys if k in result}
+
+    def extract_structured_packed(self, notes: Dict[str, str], options: Dict[str, Any] = None) -> Dict[str, Dict[str, Any]]:
+        """Extract several short notes ({id: masked text}) in one request.
+
+        Returns {id: fields} for every note the model answered properly. Notes
+        that are missing or malformed in the response are left out so the
+        caller can extract them one by one.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        pending: Dict[str, str] = {}
+        keys: Dict[str, Optional[str]] = {}
+        for note_id, text in notes.items():
+            key = keys[note_id] = self._packed_cache_key(text, options)
+            cached = self.cache.get(key) if key is not None else None
+            if key is not None:
+                metrics.incr("cache_hits" if cached is not None else "cache_misses")
+            if cached is not None:
+                results[note_id] = cached
+            else:
+                pending[note_id] = text
+        if not pending:
+            return results
+        fresh = self._extract_packed(pending)
+        metrics.incr("packed_notes", len(fresh))
+        metrics.incr("packed_misses", len(pending) - len(fresh))
+        for note_id, fields in fresh.items():
+            results[note_id] = fields
+            if keys[note_id] is not None:
+                self.cache.set(keys[note_id], fields)
+        return results
+
+    def _packed_cache_key(self, note_text: str, options: Optional[Dict[str, Any]]) -> Optional[str]:
+        if self.cache is None or not (options or {}).get("cache", True):
+            return None
+        return make_cache_key(
+            note_text, self.system_prompt + PACKED_EXTRACTION_PROMPT, self.provider, self.active_model
+        )
 
     @retry(max_attempts=2)
-    def repair_json(self, note_text: str, bad_json: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
+    def _extract_packed(self, notes: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        blocks = "\n".join(PACKED_NOTE_BLOCK.format(note_id=i, note_text=t) for i, t in notes.items())
+        prompt = PACKED_EXTRACTION_PROMPT.format(notes_block=blocks)
+        try:
+            content = self._chat(prompt, temperature=0.1, schema=packed_notes_json_schema())
+        except Exception as e:
+            logger.exception("LLM packed extraction failed")
+            raise LLMClientError(str(e)) from e
+        return split_packed_response(self._safe_json_load(content), notes)
+
+    @retry(max_attempts=2)
+    def repair_json(
+        self,
+        note_text: str,
+        bad_json: str,
+        options: Dict[str, Any] = None,
+        schema: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Ask the LLM to fix `bad_json`; `schema` defaults to the full StructuredNote schema."""
         prompt = REPAIR_PROMPT.format(bad_json=bad_json)
         try:
-            if self.provider == "openai":
-                content = self._openai_chat(prompt, temperature=0.0)
-            else:
-                content = self._ollama_chat(prompt)
+            content = self._chat(prompt, temperature=0.0, schema=schema or structured_note_json_schema())
             return self._safe_json_load(content)
         except Exception as e:
             logger.exception("LLM repair failed")
-            raise LLMClientError(str(e))
+            raise LLMClientError(str(e)) from e
 
     @retry(max_attempts=2)
     def generate_followup_questions(
@@ -197,22 +821,33 @@ class LLMClient:
         note_text: str,
         structured_json: Dict[str, Any],
         flags: Optional[list] = None,
+        reuse_context: Optional[bool] = None,
     ) -> Dict[str, Any]:
-        prompt = QUESTIONS_PROMPT.format(
-            note_text=note_text,
-            structured_json=json.dumps(structured_json, ensure_ascii=False),
-            flags_json=json.dumps(flags or [], ensure_ascii=False),
-        )
-        try:
-            if self.provider == "openai":
-                content = self._openai_chat(prompt, temperature=0.2)
+        """Ask for clarifying questions.
+
+        With `reuse_context` (default: the LLM_REUSE_CONTEXT setting) and an
+        extraction of the same note on this client, the question request
+        continues that conversation and sends only the flags as new text. When
+        `structured_json` differs from the extraction in that conversation
+        (rule-filled fields, salvage, edits), it is sent too and replaces it.
+        """
+        history = None
+        if self.reuse_context if reuse_context is None else reuse_context:
+            history = self._conversation_for(note_text)
+        if history is not None:
+            metrics.incr("context_reuse")
+            flags_json = json.dumps(flags or [], ensure_ascii=False)
+            if self._matches_turn(history[-1]["content"], structured_json):
+                prompt = QUESTIONS_FOLLOWUP_PROMPT.format(flags_json=flags_json)
             else:
-                content = self._ollama_chat(prompt)
-            data = self._safe_json_load(content)
-            if "questions" not in data or not isinstance(data.get("questions"), list):
-                return {"questions": []}
-            questions = [str(q).strip() for q in data.get("questions", []) if str(q).strip()]
-            return {"questions": questions}
+                prompt = QUESTIONS_FOLLOWUP_UPDATED_PROMPT.format(
+                    structured_json=json.dumps(structured_json, ensure_ascii=False), flags_json=flags_json
+                )
+        else:
+            prompt = self._questions_prompt(note_text, structured_json, flags)
+        try:
+            content = self._chat(prompt, temperature=0.2, history=history)
+            return self._parse_questions(content)
         except Exception as e:
             logger.exception("LLM follow-up questions failed")
-            raise LLMClientError(str(e))
+            raise LLMClientError(str(e)) from e
@@ -0,0 +1,151 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from typing import Callable, Deque, List, Optional, TypeVar
+
+from src.utils import metrics
+from src.utils.logging import get_logger
+from src.utils.metrics import percentile
+
+logger = get_logger()
+
+T = TypeVar("T")
+
+DEFAULT_HEDGE_PERCENTILE = 95.0
+# At most this share of requests may send a duplicate.
+DEFAULT_HEDGE_BUDGET = 0.1
+# No hedging until this many latencies have been seen: the percentile means nothing before.
+MIN_SAMPLES = 20
+WINDOW = 200
+
+
+class CancelEvent(threading.Event):
+    """An Event that also runs the callbacks registered with `on_set` when it is set.
+
+    Attempts register a callback that closes their open connection, so a
+    request blocked on a socket read stops as soon as it is cancelled
+    instead of waiting for data or its timeout.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks: List[Callable[[], None]] = []
+        self._callbacks_lock = threading.Lock()
+
+    def on_set(self, callback: Callable[[], None]) -> None:
+        """Run `callback` when the event is set (right away if it already is)."""
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def set(self) -> None:
+        with self._callbacks_lock:
+            super().set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug("Cancel callback failed: %s", e)
+
+
+class HedgePolicy:
+    """When to send a duplicate request, and how many duplicates are allowed.
+
+    The hedge delay is the `percentile` of the last WINDOW request latencies;
+    hedges (finished and in flight) stay under `budget` of those requests.
+    """
+
+    def __init__(
+        self,
+        percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        budget: float = DEFAULT_HEDGE_BUDGET,
+        min_samples: int = MIN_SAMPLES,
+        window: int = WINDOW,
+    ):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._hedged: Deque[bool] = deque(maxlen=window)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little history."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            return percentile(list(self._latencies), self.percentile)
+
+    def try_hedge(self) -> bool:
+        """Reserve one hedge if the budget allows it; pair with `record(..., hedged=True)`."""
+        with self._lock:
+            if sum(self._hedged) + self._in_flight + 1 > self.budget * len(self._hedged):
+                return False
+            self._in_flight += 1
+            return True
+
+    def record(self, seconds: float, hedged: bool = False) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+            self._hedged.append(hedged)
+            if hedged:
+                self._in_flight -= 1
+
+
+def run_hedged(
+    attempt: Callable[[CancelEvent], T],
+    policy: HedgePolicy,
+    pool: Executor,
+    accept: Callable[[T], bool] = lambda result: True,
+) -> T:
+    """Run `attempt(cancel)` and, if it is slower than the policy's delay, a second copy.
+
+    The first result `accept` approves wins; the other attempt's `cancel`
+    event is set, which runs its `on_set` callbacks so it can stop early. With no acceptable result, the first
+    one returned is used; when every attempt fails, the first error is raised.
+    """
+    start = time.perf_counter()
+    cancels = [CancelEvent()]
+    # Attempts run in copies of the caller's context so their stages reach its collector.
+    futures = {pool.submit(contextvars.copy_context().run, attempt, cancels[0]): 0}
+    delay = policy.delay()
+    hedged = False
+    if delay is not None:
+        done, _ = wait(futures, timeout=delay)
+        if not done and policy.try_hedge():
+            hedged = True
+            metrics.incr("hedged_requests")
+            cancels.append(CancelEvent())
+            futures[pool.submit(contextvars.copy_context().run, attempt, cancels[1])] = 1
+    pending = set(futures)
+    fallback = []
+    errors = []
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=futures.get):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if accept(result):
+                    if futures[future] == 1:
+                        metrics.incr("hedge_wins")
+                    return result
+                fallback.append(result)
+        if fallback:
+            return fallback[0]
+        raise errors[0]
+    finally:
+        for cancel in cancels:
+            cancel.set()
+        for future in pending:
+            future.cancel()
+        policy.record(time.perf_counter() - start, hedged)
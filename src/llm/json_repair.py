@@ -0,0 +1,178 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)(?:```|$)", re.DOTALL)
+_WORD_CHARS = re.compile(r"[A-Za-z0-9_\-\.]")
+_NUMBER_CHARS = re.compile(r"[0-9eE\+\-\.]")
+_LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+
+
+def _strip_trailing(out: List[str], chars: str) -> None:
+    """Drop trailing whitespace and any of `chars` from the emitted chunks."""
+    while out:
+        last = out[-1].rstrip()
+        if last and last[-1] in chars:
+            out[-1] = last[:-1]
+            continue
+        if not last:
+            out.pop()
+            continue
+        out[-1] = last
+        return
+
+
+def _last_significant(out: List[str]) -> str:
+    for chunk in reversed(out):
+        stripped = chunk.rstrip()
+        if stripped:
+            return stripped[-1]
+    return ""
+
+
+def _read_string(text: str, i: int, quote: str):
+    """Return (json_string_literal, next_index, terminated)."""
+    raw = []
+    i += 1
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c == "\\" and i + 1 < n:
+            nxt = text[i + 1]
+            if quote == "'" and nxt == "'":
+                raw.append("'")
+            else:
+                raw.append(c + nxt)
+            i += 2
+            continue
+        if c == quote:
+            break
+        if quote == "'" and c == '"':
+            raw.append('\\"')
+        elif c == "\n":
+            raw.append("\\n")
+        else:
+            raw.append(c)
+        i += 1
+    terminated = i < n
+    if raw and raw[-1] == "\\":
+        raw.pop()
+    return '"' + "".join(raw) + '"', i + 1, terminated
+
+
+def _normalize(text: str):
+    """Return (json_text, cut_short, unclosed).
+
+    cut_short is "string" or "scalar" when the input ended inside that kind of
+    value, else "". unclosed is True when brackets were still open at the end
+    of the input.
+    """
+    out: List[str] = []
+    cut_short = ""
+    stack: List[str] = []
+    i = 0
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c in "\"'":
+            literal, i, terminated = _read_string(text, i, c)
+            cut_short = "" if terminated else "string"
+            out.append(literal)
+            continue
+        if c == "/" and text.startswith("//", i) or c == "#":
+            end = text.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        if c == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        if c in "{[":
+            stack.append("}" if c == "{" else "]")
+            out.append(c)
+        elif c in "}]":
+            _strip_trailing(out, ",")
+            if stack:
+                stack.pop()
+            out.append(c)
+            if not stack:
+                # Root object closed; ignore any chatter after it.
+                break
+        elif c.isalpha() or c == "_":
+            j = i
+            while j < n and _WORD_CHARS.match(text[j]):
+                j += 1
+            word = text[i:j]
+            cut_short = "scalar" if j >= n and word not in _LITERALS else ""
+            rest = text[j:].lstrip()
+            if word in _LITERALS and not rest.startswith(":"):
+                out.append(_LITERALS[word])
+            else:
+                # Unquoted key, or a bare word value: quote it either way.
+                out.append(json.dumps(word))
+            i = j
+            continue
+        elif c.isdigit() or c == "-":
+            j = i + 1
+            while j < n and _NUMBER_CHARS.match(text[j]):
+                j += 1
+            cut_short = "scalar" if j >= n else ""
+            out.append(text[i:j])
+            i = j
+            continue
+        else:
+            out.append(c)
+        i += 1
+
+    unclosed = bool(stack)
+    # Close whatever a truncated response left open.
+    if stack:
+        last = _last_significant(out)
+        if last == ":":
+            out.append(" null")
+        elif last == ",":
+            _strip_trailing(out, ",")
+        for closer in reversed(stack):
+            if _last_significant(out) == ",":
+                _strip_trailing(out, ",")
+            out.append(closer)
+    return "".join(out), cut_short, unclosed
+
+
+def repair_json_text(text: str) -> Optional[Dict[str, Any]]:
+    """Best-effort local fix for common LLM JSON mistakes.
+
+    Handles markdown fences, comments, single quotes, Python None/True/False,
+    unquoted keys, trailing commas and truncated closing brackets. Returns
+    None when the result still is not a JSON object.
+    """
+    if not text:
+        return None
+    fence = _FENCE_RE.search(text)
+    if fence and "{" in fence.group(1):
+        text = fence.group(1)
+    start = text.find("{")
+    if start == -1:
+        return None
+    candidate = text[start:]
+    # A response cut off mid-member ('{"a": 1, "b' or '"spo2": 9') must lose
+    # that member: its value may be incomplete. Back off to earlier commas.
+    for attempt in range(8):
+        fixed, cut_short, unclosed = _normalize(candidate)
+        # Our cuts land just before a comma, so after the first pass only an
+        # open string (the cut fell inside the truncated text) is still partial.
+        if not cut_short or (attempt and cut_short != "string"):
+            try:
+                parsed = json.loads(fixed)
+                return parsed if isinstance(parsed, dict) else None
+            except ValueError:
+                pass
+        if not attempt and not (cut_short or unclosed):
+            # Complete but malformed: cutting members would silently lose
+            # valid fields, so leave it to the LLM repair.
+            return None
+        cut = candidate.rfind(",")
+        if cut <= 0:
+            return None
+        candidate = candidate[:cut]
+    return None
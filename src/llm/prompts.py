@@ -1,9 +1,12 @@
-EXTRACTION_PROMPT = '''
-You are an assistant that extracts structured JSON only from a free-text outpatient note.
-Return JSON only and strictly follow the schema keys. Do NOT add or invent any facts.
-If a field cannot be found, set it to null or empty list as appropriate.
+# Every request sends SYSTEM_PROMPT unchanged as its first message and puts
+# the per-call text (task line, note, JSON) in the user message after it. The
+# identical prefix lets OpenAI prompt caching and Ollama's KV cache skip
+# re-encoding the instructions; keep anything variable out of it.
+SYSTEM_PROMPT = '''
+You are a clinical documentation assistant working on free-text outpatient notes.
+Every reply is valid JSON only. No markdown, no commentary, no explanation.
 
-Schema keys expected (top-level):
+Structured note schema keys (top-level):
 - complaints: list of short strings or null
 - duration: string or null
 - vitals: object with bp_systolic, bp_diastolic, hr, spo2, temp (use null if absent)
@@ -22,33 +25,57 @@ HARD RULES:
 
 Provide evidence fields only as short text when present (e.g., evidence_text and confidence). Keep confidence one of: high/medium/low when possible.
 
-Now extract from the following NOTE and output JSON only:
+Each request starts with a TASK line:
+- TASK extract: extract the structured note from NOTE. Return JSON only and strictly follow the schema keys. Do NOT add or invent any facts. If a field cannot be found, set it to null or empty list as appropriate.
+- TASK extract_section: do TASK extract, but return only the keys listed in KEYS (each of them, null when absent) and leave every other key out. If KEYS includes questions, fill it as in TASK extract_with_questions.
+- TASK extract_many: each NOTE is a separate patient visit with an id. Extract every note independently as in TASK extract; never copy facts between notes. Return {"notes": [{"id": "<note id>", ...schema keys...}, ...]} with exactly one entry per note id, in any order.
+- TASK repair: BROKEN_JSON is a broken or partially incorrect structured note. Return valid JSON that matches the schema keys. Only correct formatting, use null or empty lists for missing keys, and do not add clinical facts that are not present in BROKEN_JSON.
+- TASK extract_with_questions: do TASK extract, and add a top-level "questions" list with clarifying questions about the NOTE as in TASK questions (use [] if nothing is missing or unclear).
+- TASK questions: generate clarifying questions to complete missing or ambiguous fields, using ONLY the NOTE, STRUCTURED_JSON and FLAGS provided. Do NOT invent diagnoses or clinical facts. Keep questions short and specific, and ask only what is missing or unclear (e.g., dose, frequency, duration, vitals, follow-up). Return {"questions": ["question 1", "question 2"]}, or {"questions": []} if everything is complete.
+'''
+
+EXTRACTION_PROMPT = '''TASK extract
+NOTE:
 """
 {note_text}
 """
 '''
 
-REPAIR_PROMPT = '''
-You are given a broken or partially incorrect JSON string. Your job: return valid JSON that matches the expected schema keys for the structured note, do not add clinical facts that are not present in the original broken JSON, only correct formatting, ensure all required keys are present (use null or empty lists where appropriate), and do not add new factual content.
+EXTRACTION_WITH_QUESTIONS_PROMPT = '''TASK extract_with_questions
+NOTE:
+"""
+{note_text}
+"""
+'''
 
-Return JSON only.
+SECTION_EXTRACTION_PROMPT = '''TASK extract_section
+KEYS: {keys}
+NOTE:
+"""
+{note_text}
+"""
+'''
 
-Broken JSON:
-{bad_json}
+PREFILLED_FIELDS_NOTE = '''
+These keys were already extracted deterministically: {fields}.
+Do NOT output them; return JSON with only the remaining keys.
 '''
 
-QUESTIONS_PROMPT = '''
-You are a clinical documentation assistant. Generate clarifying questions to complete missing or ambiguous fields.
-Use ONLY the note text, structured JSON, and flags provided. Do NOT invent diagnoses or clinical facts.
+PACKED_EXTRACTION_PROMPT = '''TASK extract_many
+{notes_block}'''
 
-Return JSON only in this exact shape:
-{{"questions": ["question 1", "question 2", "question 3"]}}
+PACKED_NOTE_BLOCK = '''NOTE id={note_id}:
+"""
+{note_text}
+"""
+'''
 
-Guidance:
-- Keep questions short and specific.
-- Ask only what is missing or unclear (e.g., dose, frequency, duration, vitals, follow-up).
-- If everything is complete, return {{"questions": []}}.
+REPAIR_PROMPT = '''TASK repair
+BROKEN_JSON:
+{bad_json}
+'''
 
+QUESTIONS_PROMPT = '''TASK questions
 NOTE:
 {note_text}
 
@@ -58,3 +85,23 @@ STRUCTURED_JSON:
 FLAGS:
 {flags_json}
 '''
+
+# Follow-up turn after an extraction of the same note: the NOTE and the
+# extracted JSON are already in the conversation.
+QUESTIONS_FOLLOWUP_PROMPT = '''TASK questions
+NOTE and STRUCTURED_JSON: the note and your JSON answer above.
+
+FLAGS:
+{flags_json}
+'''
+
+# As above, when the final record differs from that JSON answer (rule-filled
+# fields, salvage, clinician edits): the record is sent again in full.
+QUESTIONS_FOLLOWUP_UPDATED_PROMPT = '''TASK questions
+NOTE: the note above.
+STRUCTURED_JSON (final record; replaces your JSON answer above):
+{structured_json}
+
+FLAGS:
+{flags_json}
+'''
@@ -0,0 +1,83 @@
+import atexit
+import threading
+from typing import Dict, Optional, Tuple
+
+from src.llm.client import LLMClient
+from src.llm.router import DEFAULT_THRESHOLD, ModelRouter
+
+_clients: Dict[Tuple, LLMClient] = {}
+_routers: Dict[Tuple, ModelRouter] = {}
+_lock = threading.Lock()
+
+
+def get_client(
+    model: Optional[str] = None,
+    provider: Optional[str] = None,
+    base_url: Optional[str] = None,
+    ollama_model: Optional[str] = None,
+    ollama_base_url: Optional[str] = None,
+) -> LLMClient:
+    """Return the shared LLMClient for these settings, creating it on first use.
+
+    Clients are kept for the life of the process so config is read once and
+    HTTP connection pools are reused across notes.
+    """
+    key = (provider, model, base_url, ollama_model, ollama_base_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = LLMClient(
+                model=model,
+                provider=provider,
+                base_url=base_url,
+                ollama_model=ollama_model,
+                ollama_base_url=ollama_base_url,
+            )
+            _clients[key] = client
+        return client
+
+
+def get_router(
+    small_model: str,
+    model: Optional[str] = None,
+    provider: Optional[str] = None,
+    base_url: Optional[str] = None,
+    ollama_model: Optional[str] = None,
+    ollama_base_url: Optional[str] = None,
+    threshold: float = DEFAULT_THRESHOLD,
+) -> ModelRouter:
+    """Return the shared ModelRouter over these settings (large) and `small_model` on the same provider.
+
+    Shared like the clients so the routing threshold keeps adapting across notes.
+    """
+    key = (small_model, provider, model, base_url, ollama_model, ollama_base_url, threshold)
+    router = _routers.get(key)
+    if router is not None:
+        return router
+    large = get_client(model, provider, base_url, ollama_model, ollama_base_url)
+    if large.provider == "ollama":
+        small = get_client(model, provider, base_url, small_model, ollama_base_url)
+    else:
+        small = get_client(small_model, provider, base_url, ollama_model, ollama_base_url)
+    with _lock:
+        router = _routers.setdefault(key, ModelRouter(small, large, threshold=threshold))
+    return router
+
+
+def close_clients() -> None:
+    """Close and forget every shared client."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        _routers.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            pass
+
+
+atexit.register(close_clients)
@@ -1,20 +1,262 @@
-import time
+import asyncio
+import contextvars
 import functools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Iterator, Optional
+
+from src.utils import metrics
+
+RETRYABLE_STATUS = {408, 429}
+
+
+class RetryBudgetExceeded(Exception):
+    pass
+
+
+def _error_chain(exc: BaseException) -> Iterator[BaseException]:
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__
+
+
+def status_code_of(exc: BaseException) -> Optional[int]:
+    for attr in ("status_code", "http_status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def retry_after_of(exc: BaseException) -> Optional[float]:
+    for e in _error_chain(exc):
+        value = getattr(e, "retry_after", None)
+        if value is not None:
+            return float(value)
+        headers = getattr(e, "headers", None) or getattr(getattr(e, "response", None), "headers", None)
+        if headers is not None:
+            try:
+                parsed = parse_retry_after(headers.get("Retry-After"))
+            except Exception:
+                parsed = None
+            if parsed is not None:
+                return parsed
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """True only for failures a later attempt can fix: timeouts, connection drops, 429 and 5xx."""
+    for e in _error_chain(exc):
+        if isinstance(e, RetryBudgetExceeded):
+            return False
+        flagged = getattr(e, "retryable", None)
+        if flagged is not None:
+            return bool(flagged)
+        status = status_code_of(e)
+        if status is not None:
+            return status in RETRYABLE_STATUS or status >= 500
+        if isinstance(e, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+            return True
+        name = type(e).__name__
+        if "Timeout" in name or "Connect" in name or name in ("RateLimitError", "ServiceUnavailableError"):
+            return True
+    return False
+
+
+class RetryBudget:
+    """Attempts and wall time shared by every retrying call in one logical operation.
+
+    The time budget only bounds retrying: its clock starts at the first
+    failed attempt, so a slow answer that succeeds (on a CPU-only server,
+    say) does not use it up before a repair call.
+    """
+
+    def __init__(self, total_seconds: Optional[float] = None, max_attempts: Optional[int] = None):
+        self.total_seconds = total_seconds
+        self.deadline: Optional[float] = None
+        self.attempts_left = max_attempts
+        # Worker threads of one note (chunks, section sub-prompts) may share the budget.
+        self._lock = threading.Lock()
+
+    def start_clock(self) -> None:
+        """Start the time budget, if it has not started yet; called on each failed attempt."""
+        with self._lock:
+            if self.deadline is None and self.total_seconds is not None:
+                self.deadline = time.monotonic() + self.total_seconds
+
+    def remaining(self) -> Optional[float]:
+        if self.total_seconds is None:
+            return None
+        if self.deadline is None:
+            return self.total_seconds
+        return self.deadline - time.monotonic()
+
+    def spend_attempt(self) -> None:
+        with self._lock:
+            if self.attempts_left is not None:
+                if self.attempts_left <= 0:
+                    raise RetryBudgetExceeded("LLM call budget exhausted")
+                self.attempts_left -= 1
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise RetryBudgetExceeded("LLM time budget exhausted")
+
+    def fan_out(self, calls: int) -> None:
+        """One call is being replaced by `calls` concurrent ones: cover their extra first
+        attempts, so only retries draw on what is left."""
+        with self._lock:
+            if self.attempts_left is not None and calls > 1:
+                self.attempts_left += calls - 1
+
+
+_current_budget: contextvars.ContextVar[Optional[RetryBudget]] = contextvars.ContextVar("retry_budget", default=None)
+
+
+def current_retry_budget() -> Optional[RetryBudget]:
+    """The budget of the enclosing retry_budget() block, if any (to hand to worker threads)."""
+    return _current_budget.get()
+
+
+@contextmanager
+def shared_retry_budget(budget: RetryBudget):
+    """Use `budget`, taken from another thread with current_retry_budget(), inside the block."""
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+@contextmanager
+def retry_budget(total_seconds: Optional[float] = None, max_attempts: Optional[int] = None):
+    """Share one budget across all retrying calls made inside the block."""
+    budget = RetryBudget(total_seconds, max_attempts)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3
+    initial_delay: float = 1.0
+    backoff: float = 2.0
+    max_delay: float = 20.0
+    jitter: bool = True
+    # Used only when no enclosing retry_budget() is active.
+    budget_seconds: Optional[float] = 60.0
+    budget_attempts: Optional[int] = 6
+
+    def should_retry(self, exc: BaseException) -> bool:
+        return is_retryable(exc)
+
+    def delay_for(self, attempt: int, exc: BaseException) -> float:
+        ceiling = min(self.max_delay, self.initial_delay * (self.backoff ** (attempt - 1)))
+        delay = random.uniform(0, ceiling) if self.jitter else ceiling
+        retry_after = retry_after_of(exc)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _enter_budget(self):
+        budget = _current_budget.get()
+        if budget is not None:
+            return budget, None
+        budget = RetryBudget(self.budget_seconds, self.budget_attempts)
+        return budget, _current_budget.set(budget)
+
+    def _next_delay(self, budget: RetryBudget, attempt: int, exc: BaseException) -> Optional[float]:
+        """Delay before the next attempt, or None when the error should be raised."""
+        if attempt >= self.max_attempts or not self.should_retry(exc):
+            return None
+        if budget.attempts_left is not None and budget.attempts_left <= 0:
+            return None
+        delay = self.delay_for(attempt, exc)
+        remaining = budget.remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
+
+
+def retry(max_attempts=3, initial_delay=1.0, backoff=2.0, policy: Optional[RetryPolicy] = None):
+    policy = policy or RetryPolicy(max_attempts=max_attempts, initial_delay=initial_delay, backoff=backoff)
 
-def retry(max_attempts=3, initial_delay=1.0, backoff=2.0):
     def deco(f):
         @functools.wraps(f)
         def wrapper(*args, **kwargs):
-            delay = initial_delay
-            attempt = 0
-            while True:
-                try:
-                    return f(*args, **kwargs)
-                except Exception as e:
-                    attempt += 1
-                    if attempt >= max_attempts:
-                        raise
-                    time.sleep(delay)
-                    delay *= backoff
+            budget, token = policy._enter_budget()
+            try:
+                attempt = 0
+                while True:
+                    budget.spend_attempt()
+                    try:
+                        return f(*args, **kwargs)
+                    except Exception as e:
+                        attempt += 1
+                        budget.start_clock()
+                        delay = policy._next_delay(budget, attempt, e)
+                        if delay is None:
+                            raise
+                        metrics.incr("retries", function=f.__name__)
+                        time.sleep(delay)
+            finally:
+                if token is not None:
+                    _current_budget.reset(token)
+        return wrapper
+    return deco
+
+
+def async_retry(max_attempts=3, initial_delay=1.0, backoff=2.0, policy: Optional[RetryPolicy] = None):
+    policy = policy or RetryPolicy(max_attempts=max_attempts, initial_delay=initial_delay, backoff=backoff)
+
+    def deco(f):
+        @functools.wraps(f)
+        async def wrapper(*args, **kwargs):
+            budget, token = policy._enter_budget()
+            try:
+                attempt = 0
+                while True:
+                    budget.spend_attempt()
+                    try:
+                        return await f(*args, **kwargs)
+                    except Exception as e:
+                        attempt += 1
+                        budget.start_clock()
+                        delay = policy._next_delay(budget, attempt, e)
+                        if delay is None:
+                            raise
+                        metrics.incr("retries", function=f.__name__)
+                        await asyncio.sleep(delay)
+            finally:
+                if token is not None:
+                    _current_budget.reset(token)
         return wrapper
     return deco
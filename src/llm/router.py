@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from src.core.schemas import NOTE_SECTIONS, StructuredNote
+from src.extract.chunking import SECTION_START_RE
+from src.extract.rules import MED_HINT_RE, MED_RE
+from src.llm.client import MAX_CONVERSATIONS, LLMClient
+from src.utils import metrics
+from src.utils.logging import get_logger
+from src.utils.metrics import percentile
+
+logger = get_logger()
+
+# A note at or above these counts scores the full weight of that term.
+LONG_NOTE_CHARS = 2000
+MANY_MEDS = 4
+MANY_SECTIONS = 6
+DEFAULT_THRESHOLD = 0.5
+# Share of small-model answers that should validate; the threshold settles where this holds.
+DEFAULT_TARGET_SUCCESS = 0.9
+DEFAULT_STEP = 0.02
+MIN_THRESHOLD = 0.05
+MAX_THRESHOLD = 0.95
+STATS_WINDOW = 200
+
+
+def note_complexity(text: str) -> float:
+    """0..1 score of how hard a (masked) note is to extract: length, medication lines and sections."""
+    if not text:
+        return 0.0
+    lines = [line for line in text.split("\n") if line.strip()]
+    meds = max(len(MED_RE.findall(text)), sum(1 for line in lines if MED_HINT_RE.search(line)))
+    sections = sum(1 for line in lines if SECTION_START_RE.match(line))
+    return round(
+        0.4 * min(len(text) / LONG_NOTE_CHARS, 1.0)
+        + 0.4 * min(meds / MANY_MEDS, 1.0)
+        + 0.2 * min(sections / MANY_SECTIONS, 1.0),
+        4,
+    )
+
+
+class ModelStats:
+    """Recent latency and validation outcomes for one model."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+
+    def record(self, seconds: float, ok: bool) -> None:
+        self.latencies.append(seconds)
+        self.outcomes.append(ok)
+
+    @property
+    def success_rate(self) -> Optional[float]:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else None
+
+    def p50(self) -> Optional[float]:
+        return percentile(list(self.latencies), 50) if self.latencies else None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"calls": len(self.outcomes), "success_rate": self.success_rate, "p50_seconds": self.p50()}
+
+
+class ModelRouter:
+    """Sends each note to a small or a large client by `note_complexity`.
+
+    Notes scoring below `threshold` go to `small`; when its answer does not
+    validate (or the call fails) the note is escalated to `large`. The
+    threshold adapts: every small-model success nudges it up and every
+    escalation nudges it down, so it settles where `target_success` of the
+    small model's answers validate. Successes only raise it while the small
+    model is actually faster than the large one.
+
+    Exposes the LLMClient methods the pipeline uses, so it can be passed as
+    `llm_client`; anything else goes to the large client. Follow-up calls for
+    a note (`remember_extraction`, `generate_followup_questions`) go to the
+    client that extracted it, which holds the note's conversation.
+    """
+
+    def __init__(
+        self,
+        small: LLMClient,
+        large: LLMClient,
+        threshold: float = DEFAULT_THRESHOLD,
+        target_success: float = DEFAULT_TARGET_SUCCESS,
+        step: float = DEFAULT_STEP,
+    ):
+        self.small = small
+        self.large = large
+        self.threshold = threshold
+        self.target_success = target_success
+        self.step = step
+        self.stats: Dict[str, ModelStats] = {"small": ModelStats(), "large": ModelStats()}
+        self._lock = threading.Lock()
+        # note_text -> tier whose answer was used, for that note's follow-up calls.
+        self._served: "OrderedDict[str, str]" = OrderedDict()
+
+    def choose(self, note_text: str) -> str:
+        """Tier for this note: "small" or "large"."""
+        return "small" if note_complexity(note_text) < self.threshold else "large"
+
+    def _client(self, tier: str) -> LLMClient:
+        return self.small if tier == "small" else self.large
+
+    def _served_client(self, note_text: str) -> LLMClient:
+        """The client that extracted `note_text`, or the one `choose` picks for an unseen note."""
+        with self._lock:
+            tier = self._served.get(note_text)
+        return self._client(tier or self.choose(note_text))
+
+    def _record_served(self, note_text: str, tier: str) -> None:
+        with self._lock:
+            self._served[note_text] = tier
+            self._served.move_to_end(note_text)
+            while len(self._served) > MAX_CONVERSATIONS:
+                self._served.popitem(last=False)
+
+    def _adapt(self, ok: bool) -> None:
+        small_p50, large_p50 = self.stats["small"].p50(), self.stats["large"].p50()
+        if ok and large_p50 is not None and small_p50 is not None and small_p50 >= large_p50:
+            return
+        delta = self.step * (1 - self.target_success) if ok else -self.step * self.target_success
+        self.threshold = min(MAX_THRESHOLD, max(MIN_THRESHOLD, self.threshold + delta))
+
+    def _call(self, tier: str, fn: Callable[[LLMClient], Dict[str, Any]], check: Callable[[Dict[str, Any]], Any]):
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            result = fn(self._client(tier))
+            check(result)
+        except Exception as e:
+            error = e
+        elapsed = time.perf_counter() - start
+        metrics.observe("model_seconds", elapsed, model=tier)
+        with self._lock:
+            self.stats[tier].record(elapsed, error is None)
+            if tier == "small":
+                self._adapt(error is None)
+        if error is not None:
+            if tier == "large":
+                raise error
+            logger.info("Small model answer rejected (%s); escalating to the large model", error)
+        return result, error is None
+
+    def _route(self, note_text: str, fn: Callable[[LLMClient], Dict[str, Any]], check: Callable[[Dict[str, Any]], Any]):
+        tier = self.choose(note_text)
+        metrics.incr("routed", model=tier)
+        if tier == "small":
+            result, ok = self._call("small", fn, check)
+            if ok:
+                self._record_served(note_text, "small")
+                return result
+            metrics.incr("escalations")
+        result = self._call("large", fn, lambda _: None)[0]
+        self._record_served(note_text, "large")
+        return result
+
+    def extract_structured(self, note_text: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
+        return self._route(
+            note_text,
+            lambda c: c.extract_structured(note_text, options=options),
+            lambda r: StructuredNote(**r),
+        )
+
+    def extract_section(self, note_text: str, section: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
+        return self._route(
+            note_text,
+            lambda c: c.extract_section(note_text, section, options=options),
+            lambda r: NOTE_SECTIONS[section](**r),
+        )
+
+    def repair_json(
+        self,
+        note_text: str,
+        bad_json: str,
+        options: Dict[str, Any] = None,
+        schema: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        # Output that needs repair is already the hard case.
+        return self.large.repair_json(note_text, bad_json, options=options, schema=schema)
+
+    def remember_extraction(self, note_text: str, result: Dict[str, Any], options: Dict[str, Any] = None) -> None:
+        self._served_client(note_text).remember_extraction(note_text, result, options)
+
+    def generate_followup_questions(self, note_text: str, structured_json: Dict[str, Any], *args, **kwargs) -> Dict[str, Any]:
+        client = self._served_client(note_text)
+        return client.generate_followup_questions(note_text, structured_json, *args, **kwargs)
+
+    def warmup(self) -> Optional[float]:
+        seconds = [s for s in (self.small.warmup(), self.large.warmup()) if s is not None]
+        return sum(seconds) if seconds else None
+
+    def close(self) -> None:
+        self.small.close()
+        self.large.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current threshold and per-model stats, for dashboards and logs."""
+        with self._lock:
+            return {"threshold": self.threshold, **{tier: s.as_dict() for tier, s in self.stats.items()}}
+
+    def __getattr__(self, name: str):
+        return getattr(self.large, name)
@@ -0,0 +1,91 @@
+from typing import Any, Callable, Dict, List, Optional
+
+from src.llm.json_repair import repair_json_text
+from src.utils.logging import get_logger
+
+logger = get_logger()
+
+PartialCallback = Callable[[str, Any], None]
+
+
+class StreamingJSONParser:
+    """Incremental parser for one top-level JSON object arriving in chunks.
+
+    `feed()` returns True once the root object has closed, so the caller can
+    stop reading the stream. Each time a top-level member finishes, the new
+    key/value pair is passed to `on_field`. Text before the first "{" (for
+    example a markdown fence) is ignored.
+    """
+
+    def __init__(self, on_field: Optional[PartialCallback] = None):
+        self.on_field = on_field
+        self._chunks: List[str] = []
+        self._size = 0
+        self._start = -1
+        self._end = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._emitted: Dict[str, Any] = {}
+
+    @property
+    def complete(self) -> bool:
+        return self._end != -1
+
+    def feed(self, chunk: str) -> bool:
+        if self.complete or not chunk:
+            return self.complete
+        offset = self._size
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        for i, c in enumerate(chunk):
+            if self._start == -1:
+                if c == "{":
+                    self._start = offset + i
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                continue
+            if c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end = offset + i + 1
+                    self._emit_fields(self._end)
+                    return True
+            elif c == "," and self._depth == 1:
+                self._emit_fields(offset + i)
+        return False
+
+    def text(self) -> str:
+        """The root object once complete, otherwise everything received so far."""
+        buffer = "".join(self._chunks)
+        if self.complete:
+            return buffer[self._start : self._end]
+        return buffer
+
+    def _emit_fields(self, upto: int) -> None:
+        if self.on_field is None:
+            return
+        buffer = "".join(self._chunks)
+        # Members before `upto` are finished; close the object so it parses.
+        parsed = repair_json_text(buffer[self._start : upto] + ("}" if upto != self._end else ""))
+        if not parsed:
+            return
+        for key, value in parsed.items():
+            if key in self._emitted:
+                continue
+            self._emitted[key] = value
+            try:
+                self.on_field(key, value)
+            except Exception:
+                logger.exception("Partial field callback failed for %s", key)
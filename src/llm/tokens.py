@@ -0,0 +1,80 @@
+import json
+import math
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+# Clinical shorthand ("BP 130/85, HR 92") splits into more tokens than prose,
+# so err on the small side: overestimating only costs a larger context bucket,
+# underestimating truncates the note.
+CHARS_PER_TOKEN = 3.2
+MIN_NUM_CTX = 2048
+MIN_NUM_PREDICT = 256
+MAX_NUM_PREDICT = 4096
+# Output rarely needs more than this many tokens per token of (note) input.
+OUTPUT_PER_INPUT = 2.0
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Rough token count for `text` without loading a tokenizer."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _skeleton(schema: Dict[str, Any], node: Any, depth: int = 0) -> Any:
+    """Smallest JSON document with every key of `node` (one item per array)."""
+    if not isinstance(node, dict) or depth > 6:
+        return None
+    ref = node.get("$ref")
+    if isinstance(ref, str) and ref.startswith("#/"):
+        target: Any = schema
+        for part in ref[2:].split("/"):
+            target = target.get(part, {}) if isinstance(target, dict) else {}
+        return _skeleton(schema, target, depth + 1)
+    for key in ("anyOf", "oneOf", "allOf"):
+        for option in node.get(key, []):
+            shape = _skeleton(schema, option, depth + 1)
+            if shape is not None:
+                return shape
+    if "properties" in node:
+        return {name: _skeleton(schema, sub, depth + 1) for name, sub in node["properties"].items()}
+    if node.get("type") == "array":
+        item = _skeleton(schema, node.get("items", {}), depth + 1)
+        return [item] if item is not None else []
+    return None
+
+
+@lru_cache(maxsize=32)
+def _schema_output_tokens(schema_json: str) -> int:
+    schema = json.loads(schema_json)
+    return estimate_tokens(json.dumps(_skeleton(schema, schema)))
+
+
+def schema_output_tokens(schema: Optional[Dict[str, Any]]) -> int:
+    """Tokens the keys and punctuation of a schema-shaped answer take, before any values."""
+    if not isinstance(schema, dict):
+        return 0
+    return _schema_output_tokens(json.dumps(schema, sort_keys=True))
+
+
+def size_context(
+    prompt_text: str,
+    note_text: str = "",
+    schema: Optional[Dict[str, Any]] = None,
+    max_ctx: int = 8192,
+) -> Dict[str, int]:
+    """num_ctx / num_predict for one Ollama request.
+
+    num_predict covers the schema skeleton plus values proportional to the
+    note. num_ctx is rounded up to a power of two (never below MIN_NUM_CTX):
+    Ollama reloads the model whenever num_ctx changes, so a handful of buckets
+    keeps reloads rare while short notes still get a small KV cache.
+    """
+    num_predict = schema_output_tokens(schema) + math.ceil(OUTPUT_PER_INPUT * estimate_tokens(note_text)) + 64
+    num_predict = max(MIN_NUM_PREDICT, min(MAX_NUM_PREDICT, num_predict))
+    needed = estimate_tokens(prompt_text) + num_predict
+    num_ctx = MIN_NUM_CTX
+    while num_ctx < needed and num_ctx < max_ctx:
+        num_ctx *= 2
+    num_ctx = max(MIN_NUM_CTX, min(num_ctx, max_ctx))
+    return {"num_ctx": num_ctx, "num_predict": min(num_predict, num_ctx)}
@@ -1,28 +1,7 @@
 from typing import Tuple, List
-from src.privacy.patterns import PHONE_RE, EMAIL_RE, AADHAAR_RE, MRN_RE, NAME_RE
-
-
-def mask_pattern(text: str, regex, label: str):
-    flags = []
-    def _repl(m):
-        flags.append(f"PII detected: {label}")
-        return f"[{label} REDACTED]"
-    new_text = regex.sub(_repl, text)
-    return new_text, flags
+from src.privacy.scanner import mask_pii_spans
 
 
 def mask_pii(note: str) -> Tuple[str, List[str]]:
-    flags = []
-    masked = note
-    for regex, label in [
-        (PHONE_RE, "PHONE"),
-        (EMAIL_RE, "EMAIL"),
-        (AADHAAR_RE, "AADHAAR"),
-        (MRN_RE, "MRN"),
-        (NAME_RE, "NAME"),
-    ]:
-        masked, new_flags = mask_pattern(masked, regex, label)
-        flags.extend(new_flags)
-    # unique
-    flags = list(dict.fromkeys(flags))
+    masked, flags, _ = mask_pii_spans(note)
     return masked, flags
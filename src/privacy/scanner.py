@@ -0,0 +1,79 @@
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from src.privacy.patterns import PHONE_RE, EMAIL_RE, AADHAAR_RE, MRN_RE, NAME_RE
+
+# Highest priority first: when spans overlap, the earlier label wins.
+PII_PATTERNS = [
+    (PHONE_RE, "PHONE"),
+    (EMAIL_RE, "EMAIL"),
+    (AADHAAR_RE, "AADHAAR"),
+    (MRN_RE, "MRN"),
+    (NAME_RE, "NAME"),
+]
+
+
+@dataclass(frozen=True)
+class PiiSpan:
+    start: int
+    end: int
+    label: str
+    text: str
+
+
+def _gaps(spans: List[PiiSpan], length: int) -> List[Tuple[int, int]]:
+    """(start, end) ranges of the text not covered by `spans` (sorted, non-overlapping)."""
+    gaps = []
+    pos = 0
+    for s in spans:
+        if s.start > pos:
+            gaps.append((pos, s.start))
+        pos = s.end
+    if pos < length:
+        gaps.append((pos, length))
+    return gaps
+
+
+def scan_pii(text: str) -> List[PiiSpan]:
+    """Find non-overlapping PII spans in `text`, sorted by offset.
+
+    Each pattern only searches the text the higher-priority patterns left
+    uncovered, so the result matches masking the patterns one after another:
+    a name that runs into an MRN is still found in the part before it.
+    A single alternation regex cannot keep that priority: it takes the
+    leftmost match, so "MRN 9876543210" would mask as an MRN, not a phone.
+    """
+    if not text:
+        return []
+    accepted: List[PiiSpan] = []
+    for regex, label in PII_PATTERNS:
+        found = [
+            PiiSpan(m.start(), m.end(), label, m.group(0))
+            for gap_start, gap_end in _gaps(accepted, len(text))
+            for m in regex.finditer(text, gap_start, gap_end)
+            if m.start() != m.end()
+        ]
+        if found:
+            accepted = sorted(accepted + found, key=lambda s: s.start)
+    return accepted
+
+
+def apply_spans(text: str, spans: List[PiiSpan], template: str = "[{label} REDACTED]") -> str:
+    """Rebuild `text` once, replacing each span with `template`."""
+    if not spans:
+        return text
+    parts = []
+    pos = 0
+    for s in spans:
+        parts.append(text[pos:s.start])
+        parts.append(template.format(label=s.label, text=s.text))
+        pos = s.end
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def mask_pii_spans(note: str) -> Tuple[str, List[str], List[PiiSpan]]:
+    spans = scan_pii(note)
+    found = {s.label for s in spans}
+    flags = [f"PII detected: {label}" for _, label in PII_PATTERNS if label in found]
+    return apply_spans(note, spans), flags, spans
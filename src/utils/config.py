@@ -15,6 +15,23 @@ class Config:
     provider: str
     ollama_model: Optional[str]
     ollama_base_url: str
+    cache_enabled: bool = True
+    cache_path: Optional[str] = None
+    cache_max_entries: int = 1024
+    cache_ttl_seconds: Optional[float] = None
+    metrics_sinks: Optional[str] = None
+    structured_output: bool = True
+    reuse_context: bool = False
+    combined_questions: bool = False
+    ollama_keep_alive: Optional[str] = None
+    ollama_num_ctx_max: int = 8192
+    chunk_chars: int = 0
+    sectioned: bool = False
+    small_model: Optional[str] = None
+    router_threshold: float = 0.5
+    hedge: bool = False
+    hedge_percentile: float = 95.0
+    hedge_budget: float = 0.1
 
 
 def get_config() -> Config:
@@ -23,6 +40,26 @@ def get_config() -> Config:
     model = os.environ.get("OPENAI_MODEL") or "gpt-5-mini"
     ollama_model = os.environ.get("OLLAMA_MODEL") or None
     ollama_base_url = os.environ.get("OLLAMA_BASE_URL") or "http://localhost:11434"
+    ollama_keep_alive = os.environ.get("OLLAMA_KEEP_ALIVE") or None
+    ollama_num_ctx_max = int(os.environ.get("OLLAMA_NUM_CTX_MAX") or 8192)
+    chunk_chars = int(os.environ.get("LLM_CHUNK_CHARS") or 0)
+    small_model = os.environ.get("LLM_SMALL_MODEL") or None
+    router_threshold = float(os.environ.get("LLM_ROUTER_THRESHOLD") or 0.5)
+
+    cache_enabled = (os.environ.get("LLM_CACHE") or "1").strip().lower() not in ("0", "false", "no", "off")
+    cache_path = os.environ.get("LLM_CACHE_PATH") or None
+    cache_max_entries = int(os.environ.get("LLM_CACHE_MAX_ENTRIES") or 1024)
+    cache_ttl_env = os.environ.get("LLM_CACHE_TTL_SECONDS")
+    cache_ttl_seconds = float(cache_ttl_env) if cache_ttl_env else None
+
+    metrics_sinks = os.environ.get("METRICS_SINKS") or None
+    structured_output = (os.environ.get("LLM_STRUCTURED_OUTPUT") or "1").strip().lower() not in ("0", "false", "no", "off")
+    reuse_context = (os.environ.get("LLM_REUSE_CONTEXT") or "0").strip().lower() in ("1", "true", "yes", "on")
+    combined_questions = (os.environ.get("LLM_COMBINED_QUESTIONS") or "0").strip().lower() in ("1", "true", "yes", "on")
+    sectioned = (os.environ.get("LLM_SECTIONED") or "0").strip().lower() in ("1", "true", "yes", "on")
+    hedge = (os.environ.get("LLM_HEDGE") or "0").strip().lower() in ("1", "true", "yes", "on")
+    hedge_percentile = float(os.environ.get("LLM_HEDGE_PERCENTILE") or 95.0)
+    hedge_budget = float(os.environ.get("LLM_HEDGE_BUDGET") or 0.1)
 
     provider_env = os.environ.get("LLM_PROVIDER")
     if provider_env:
@@ -43,4 +80,21 @@ def get_config() -> Config:
         provider=provider,
         ollama_model=ollama_model,
         ollama_base_url=ollama_base_url,
+        cache_enabled=cache_enabled,
+        cache_path=cache_path,
+        cache_max_entries=cache_max_entries,
+        cache_ttl_seconds=cache_ttl_seconds,
+        metrics_sinks=metrics_sinks,
+        structured_output=structured_output,
+        reuse_context=reuse_context,
+        combined_questions=combined_questions,
+        ollama_keep_alive=ollama_keep_alive,
+        ollama_num_ctx_max=ollama_num_ctx_max,
+        chunk_chars=chunk_chars,
+        sectioned=sectioned,
+        small_model=small_model,
+        router_threshold=router_threshold,
+        hedge=hedge,
+        hedge_percentile=hedge_percentile,
+        hedge_budget=hedge_budget,
     )
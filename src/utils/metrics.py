@@ -0,0 +1,266 @@
+import json
+import math
+import threading
+import time
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from src.utils.logging import get_logger
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile (q in 0..100) of `values`."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100.0
+    lo = math.floor(pos)
+    hi = math.ceil(pos)
+    if lo == hi:
+        return ordered[lo]
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+class QuantileSketch:
+    """Percentiles of a stream in fixed memory.
+
+    Values fall into log-spaced buckets `1 + accuracy` apart, so estimates are
+    within about accuracy/2 of the true value; the bucket count is bounded by
+    the value range, not the number of observations. Values at or below
+    `min_value` count as 0.
+    """
+
+    def __init__(self, accuracy: float = 0.02, min_value: float = 1e-4) -> None:
+        self._gamma = 1.0 + accuracy
+        self._log_gamma = math.log(self._gamma)
+        self.min_value = min_value
+        self._buckets: Dict[int, int] = {}
+        self._zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= self.min_value:
+            self._zeros += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate of `percentile(values, q)`; 0.0 when empty."""
+        if not self.count:
+            return 0.0
+        rank = round((self.count - 1) * q / 100.0)
+        if rank < self._zeros:
+            return 0.0
+        seen = self._zeros
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen > rank:
+                # Middle of the bucket (gamma^(i-1), gamma^i], kept inside the observed range.
+                estimate = 2 * self._gamma ** index / (self._gamma + 1)
+                return min(self.max, max(self.min, estimate))
+        return self.max
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricSink:
+    """Receives pipeline events. Subclasses override what they care about."""
+
+    def observe(self, name: str, value: float, labels: Dict[str, str]) -> None:
+        pass
+
+    def increment(self, name: str, amount: float, labels: Dict[str, str]) -> None:
+        pass
+
+
+class InMemoryHistogram(MetricSink):
+    """Keeps every observation and counter in memory; handy for tests and benchmarks."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.observations: Dict[Tuple[str, LabelKey], List[float]] = {}
+        self.counters: Dict[Tuple[str, LabelKey], float] = {}
+
+    def observe(self, name, value, labels):
+        with self._lock:
+            self.observations.setdefault((name, _label_key(labels)), []).append(value)
+
+    def increment(self, name, amount, labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def count(self, name: str, **labels) -> float:
+        """Counter total for `name`, summed over label sets that include `labels`."""
+        want = set(_label_key(labels))
+        with self._lock:
+            return sum(v for (n, key), v in self.counters.items() if n == name and want <= set(key))
+
+    def summary(self, name: str, **labels) -> Dict[str, float]:
+        key = (name, _label_key(labels))
+        with self._lock:
+            values = list(self.observations.get(key, []))
+        return {
+            "count": len(values),
+            "sum": sum(values),
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99),
+        }
+
+
+class PrometheusTextExporter(MetricSink):
+    """Aggregates into Prometheus histograms/counters; `render()` gives the text exposition format."""
+
+    def __init__(self, prefix: str = "docsathi", buckets=DEFAULT_BUCKETS) -> None:
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._hist: Dict[Tuple[str, LabelKey], List[float]] = {}
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+
+    def observe(self, name, value, labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            # Per-bucket counts followed by total count and sum.
+            state = self._hist.setdefault(key, [0] * len(self.buckets) + [0, 0.0])
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    def increment(self, name, amount, labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @staticmethod
+    def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(key) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            hist = {k: list(v) for k, v in self._hist.items()}
+            counters = dict(self._counters)
+        for name in sorted({n for n, _ in counters}):
+            metric = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (n, key), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{metric}{self._fmt_labels(key)} {value}")
+        for name in sorted({n for n, _ in hist}):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for (n, key), state in sorted(hist.items()):
+                if n != name:
+                    continue
+                for i, upper in enumerate(self.buckets):
+                    lines.append(f"{metric}_bucket{self._fmt_labels(key, ('le', str(upper)))} {state[i]}")
+                lines.append(f"{metric}_bucket{self._fmt_labels(key, ('le', '+Inf'))} {state[-2]}")
+                lines.append(f"{metric}_count{self._fmt_labels(key)} {state[-2]}")
+                lines.append(f"{metric}_sum{self._fmt_labels(key)} {state[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+class JsonLogSink(MetricSink):
+    """Writes one JSON object per event to `stream`, or to the app logger when no stream is given."""
+
+    def __init__(self, stream: Optional[TextIO] = None) -> None:
+        self.stream = stream
+        self._lock = threading.Lock()
+        self._logger = get_logger("abdm.metrics") if stream is None else None
+
+    def _write(self, event: Dict) -> None:
+        line = json.dumps(event, ensure_ascii=False)
+        if self._logger is not None:
+            self._logger.info(line)
+            return
+        with self._lock:
+            self.stream.write(line + "\n")
+
+    def observe(self, name, value, labels):
+        self._write({"ts": time.time(), "type": "timing", "name": name, "value": value, "labels": labels})
+
+    def increment(self, name, amount, labels):
+        self._write({"ts": time.time(), "type": "counter", "name": name, "value": amount, "labels": labels})
+
+
+# Replaced wholesale (never mutated) so emitters can read it without a lock.
+_sinks: Tuple[MetricSink, ...] = ()
+_sinks_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(_sinks)
+
+
+def add_sink(sink: MetricSink) -> MetricSink:
+    global _sinks
+    with _sinks_lock:
+        _sinks = _sinks + (sink,)
+    return sink
+
+
+def remove_sink(sink: MetricSink) -> None:
+    global _sinks
+    with _sinks_lock:
+        _sinks = tuple(s for s in _sinks if s is not sink)
+
+
+def clear_sinks() -> None:
+    global _sinks
+    with _sinks_lock:
+        _sinks = ()
+
+
+def observe(name: str, value: float, **labels) -> None:
+    sinks = _sinks
+    if not sinks:
+        return
+    for sink in sinks:
+        sink.observe(name, value, labels)
+
+
+def incr(name: str, amount: float = 1, **labels) -> None:
+    sinks = _sinks
+    if not sinks:
+        return
+    for sink in sinks:
+        sink.increment(name, amount, labels)
+
+
+def configure_sinks(names: Optional[str]) -> List[MetricSink]:
+    """Install sinks from a comma list such as "memory,prometheus,json"."""
+    factories = {"memory": InMemoryHistogram, "prometheus": PrometheusTextExporter, "json": JsonLogSink}
+    installed = []
+    for name in (names or "").split(","):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in factories:
+            raise ValueError(f"Unknown metrics sink: {name}")
+        installed.append(add_sink(factories[name]()))
+    return installed
+
+
+def get_sink(kind: type) -> Optional[MetricSink]:
+    for sink in _sinks:
+        if isinstance(sink, kind):
+            return sink
+    return None
@@ -1,5 +1,11 @@
+import contextvars
+import threading
 import time
 from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from src.utils import metrics
+from src.utils.metrics import percentile  # noqa: F401  (re-exported for callers)
 
 
 @contextmanager
@@ -8,3 +14,76 @@ def timer(name: str = "timer"):
     yield
     end = time.time()
     print(f"{name}: {end-start:.3f}s")
+
+
+class StageTimings:
+    """Seconds spent per named stage. Nested stages are exclusive: a parent's
+    time excludes its children, so the stages add up to the wall time.
+
+    Worker threads started with `contextvars.copy_context().run` add to the
+    same collector. Their stages nest per thread, so time spent in them
+    overlaps the caller's enclosing stage instead of being subtracted.
+    """
+
+    def __init__(self) -> None:
+        self.totals: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _child_time(self) -> List[float]:
+        stack = getattr(self._local, "child_time", None)
+        if stack is None:
+            stack = self._local.child_time = []
+        return stack
+
+    def _add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.totals)
+
+
+_collector: contextvars.ContextVar[Optional[StageTimings]] = contextvars.ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def collect_stages():
+    """Collect `stage()` timings made in this context; reuses an enclosing collector."""
+    current = _collector.get()
+    if current is not None:
+        yield current
+        return
+    timings = StageTimings()
+    token = _collector.set(timings)
+    try:
+        yield timings
+    finally:
+        _collector.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage into the active collector and any metric sinks.
+
+    Costs one context-var lookup when neither is active.
+    """
+    timings = _collector.get()
+    if timings is None and not metrics.enabled():
+        yield
+        return
+    if timings is None:
+        timings = StageTimings()
+    start = time.perf_counter()
+    child_time = timings._child_time()
+    child_time.append(0.0)
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        exclusive = elapsed - child_time.pop()
+        timings._add(name, exclusive)
+        if child_time:
+            child_time[-1] += elapsed
+        metrics.observe("stage_seconds", exclusive, stage=name)
@@ -0,0 +1,170 @@
+import re
+import typing
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from src.core.schemas import StructuredNote
+
+# Starts every flag salvage adds, so field paths like "medications[0].dose"
+# are not mistaken for the validators' missing-dose flags.
+SALVAGE_FLAG_PREFIX = "SALVAGE: "
+
+_FAIL = object()
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_TRUE_RE = re.compile(r"\b(?:prn|sos|as needed|as required|yes|true)\b")
+_FALSE_RE = re.compile(r"\b(?:no|not|non|never|false|regular|scheduled)\b")
+
+
+def _fields(model_cls) -> Dict[str, Any]:
+    """name -> (annotation, required) for pydantic v2 or v1 models."""
+    if hasattr(model_cls, "model_fields"):
+        return {n: (f.annotation, f.is_required()) for n, f in model_cls.model_fields.items()}
+    return {n: (f.outer_type_, f.required) for n, f in model_cls.__fields__.items()}
+
+
+def _flatten(annotation) -> List[Any]:
+    """Leaf types of an annotation: Optional[int | str] -> [int, str, NoneType]."""
+    args = typing.get_args(annotation)
+    if not args or typing.get_origin(annotation) in (list, List):
+        return [annotation]
+    out: List[Any] = []
+    for a in args:
+        out.extend(_flatten(a))
+    return out
+
+
+def _model_of(annotation) -> Optional[type]:
+    for t in _flatten(annotation):
+        if isinstance(t, type) and issubclass(t, BaseModel):
+            return t
+    return None
+
+
+def _list_item_type(annotation) -> Optional[Any]:
+    for t in _flatten(annotation):
+        if typing.get_origin(t) in (list, List):
+            args = typing.get_args(t)
+            return args[0] if args else Any
+    return None
+
+
+def _single_number(value: str) -> Optional[str]:
+    found = _NUMBER_RE.findall(value)
+    return found[0] if len(found) == 1 else None
+
+
+def _coerce_scalar(value: Any, types: List[Any]) -> Any:
+    """Best recoverable value for one of `types`, or _FAIL."""
+    if isinstance(value, str):
+        text = value.strip()
+        if int in types or float in types:
+            # "92 bpm" -> 92, "98%" -> 98.0; refuse anything with several numbers ("120/80").
+            num = _single_number(text)
+            if num is not None:
+                return int(float(num)) if int in types else float(num)
+        if bool in types:
+            # Whole words only, negation first: "not prn" and "no sos" are False.
+            low = text.lower()
+            if _FALSE_RE.search(low):
+                return False
+            if _TRUE_RE.search(low):
+                return True
+        return _FAIL
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if str in types:
+            return str(value)
+        if int in types:
+            return int(value)
+        return _FAIL
+    if isinstance(value, list) and str in types:
+        parts = [str(v).strip() for v in value if v is not None and str(v).strip()]
+        return "; ".join(parts) if parts else None
+    return _FAIL
+
+
+def _coerce(value: Any, annotation) -> Any:
+    item_type = _list_item_type(annotation)
+    if item_type is not None:
+        if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            value = [value]
+        if not isinstance(value, list):
+            return _FAIL
+        if item_type is str:
+            return [str(v).strip() for v in value if v is not None and str(v).strip()]
+        return _FAIL
+    return _coerce_scalar(value, _flatten(annotation))
+
+
+def _accepts(model_cls, good: Dict[str, Any], name: str, value: Any) -> bool:
+    try:
+        model_cls(**{**good, name: value})
+        return True
+    except Exception:
+        return False
+
+
+def salvage_model(model_cls, data: Any, path: str, flags: List[str]):
+    """Validate `data` field by field, coercing what can be recovered and dropping the rest.
+
+    Returns a model instance, or None when a required field is unrecoverable.
+    """
+    if not isinstance(data, dict):
+        flags.append(f"{SALVAGE_FLAG_PREFIX}Dropped unparseable value for {path or 'note'}")
+        return None
+    fields = _fields(model_cls)
+    good: Dict[str, Any] = {}
+    # Required fields first so later single-field checks have them in place.
+    for name, (annotation, required) in sorted(fields.items(), key=lambda kv: not kv[1][1]):
+        if name not in data:
+            if required:
+                flags.append(f"{SALVAGE_FLAG_PREFIX}Dropped {path or 'note'}: missing {name}")
+                return None
+            continue
+        value = data[name]
+        field_path = f"{path}.{name}" if path else name
+        if value is not None:
+            nested = _model_of(annotation)
+            item_type = _list_item_type(annotation)
+            if nested is not None and isinstance(value, dict):
+                value = salvage_model(nested, value, field_path, flags)
+                if value is None:
+                    continue
+            elif isinstance(item_type, type) and issubclass(item_type, BaseModel):
+                items = value if isinstance(value, list) else [value]
+                value = [
+                    m for m in (salvage_model(item_type, v, f"{field_path}[{i}]", flags) for i, v in enumerate(items))
+                    if m is not None
+                ]
+        if not _accepts(model_cls, good, name, value):
+            coerced = _coerce(value, annotation)
+            if coerced is _FAIL or not _accepts(model_cls, good, name, coerced):
+                flags.append(f"{SALVAGE_FLAG_PREFIX}Dropped unparseable value for {field_path}")
+                if required:
+                    return None
+                continue
+            value = coerced
+        good[name] = value
+    try:
+        return model_cls(**good)
+    except Exception:
+        flags.append(f"{SALVAGE_FLAG_PREFIX}Dropped unparseable value for {path or 'note'}")
+        return None
+
+
+def salvage_structured(raw: Any) -> Tuple[Optional[StructuredNote], List[str]]:
+    """Field-level fallback when StructuredNote(**raw) fails.
+
+    Returns (note, flags). note is None when nothing usable survives, which is
+    the only case that should go back to the LLM for repair.
+    """
+    flags: List[str] = []
+    if not isinstance(raw, dict):
+        return None, [f"{SALVAGE_FLAG_PREFIX}Dropped unparseable value for note"]
+    note = salvage_model(StructuredNote, raw, "", flags)
+    if note is None:
+        return None, flags
+    kept = [n for n in _fields(StructuredNote) if n != "flags" and getattr(note, n) not in (None, [], "")]
+    if not kept:
+        return None, flags
+    return note, flags
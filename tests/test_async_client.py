@@ -0,0 +1,57 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from src.llm.async_client import AsyncLLMClient
+
+
+class _StubOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+    ports = set()
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.peak = max(cls.peak, cls.in_flight)
+            cls.ports.add(self.client_address[1])
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(0.05)
+        body = json.dumps({"message": {"content": json.dumps({"complaints": ["cough"]})}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with cls.lock:
+            cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def test_async_client_limits_in_flight_and_reuses_connections():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    async def _run():
+        async with AsyncLLMClient(provider="ollama", ollama_model="stub", ollama_base_url=url, max_in_flight=2, use_cache=False) as c:
+            return await asyncio.gather(*[c.extract_structured(f"note {i}") for i in range(6)])
+
+    try:
+        results = asyncio.run(_run())
+    finally:
+        server.shutdown()
+    assert all(r == {"complaints": ["cough"]} for r in results)
+    assert _StubOllama.peak <= 2
+    assert len(_StubOllama.ports) <= 2
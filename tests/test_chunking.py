@@ -0,0 +1,68 @@
+from src.core.pipeline import run_pipeline
+from src.extract.chunking import merge_extractions, split_sections
+
+LONG_NOTE = (
+    "History:\nCough and fever for 5 days. Known diabetic on metformin 500 mg BD.\n\n"
+    "Examination:\nBP 130/80. Crepts right base.\n\n"
+    "Plan:\nContinue metformin. Start amoxicillin 500 mg TDS x 5 days. Chest X-ray. Review in 3 days."
+)
+
+
+def test_split_sections_cuts_on_headers_and_respects_limit():
+    chunks = split_sections(LONG_NOTE, 100)
+    assert all(len(c) <= 100 for c in chunks)
+    assert chunks[0].startswith("History:") and chunks[1].startswith("Examination:") and chunks[2].startswith("Plan:")
+    assert split_sections("short note", 100) == ["short note"]
+    assert all(len(c) <= 40 for c in split_sections("word " * 50, 40))
+
+
+def test_merge_dedupes_and_keeps_first_values():
+    merged = merge_extractions([
+        {"complaints": ["Cough", "fever"], "diagnosis": None, "medications": [{"name": "Metformin", "dose": "500 mg", "frequency": "BD"}],
+         "vitals": {"bp_systolic": None}, "duration": "5 days"},
+        {"complaints": ["cough"], "diagnosis": None, "vitals": {"bp_systolic": 130, "bp_diastolic": 80}, "findings": "crepts right base"},
+        {"medications": [{"name": "metformin", "dose": None}, {"name": "Amoxicillin", "dose": "500 mg"}, {"name": "Metformin", "dose": "1 g"}],
+         "tests": ["Chest X-ray"], "follow_up": "3 days", "duration": "ignored"},
+    ])
+    assert merged["complaints"] == ["Cough", "fever"]
+    assert merged["diagnosis"] is None
+    assert merged["vitals"] == {"bp_systolic": 130, "bp_diastolic": 80}
+    assert [(m["name"], m.get("dose")) for m in merged["medications"]] == [
+        ("Metformin", "500 mg"), ("Amoxicillin", "500 mg"), ("Metformin", "1 g")
+    ]
+    assert merged["duration"] == "5 days" and merged["follow_up"] == "3 days"
+
+
+def test_merge_same_drug_despite_different_evidence_and_spacing():
+    merged = merge_extractions([
+        {"medications": [{"name": "Metformin", "dose": "500 mg", "frequency": "BD",
+                          "evidence": {"evidence_text": "Metformin 500 mg BD", "confidence": "high"}}]},
+        {"medications": [{"name": "metformin", "dose": "500mg", "frequency": None,
+                          "evidence": {"evidence_text": "Continue metformin", "confidence": "medium"}}]},
+    ])
+    assert len(merged["medications"]) == 1
+    assert merged["medications"][0]["evidence"]["evidence_text"] == "Metformin 500 mg BD"
+
+
+class ChunkLLM:
+    def __init__(self):
+        self.seen = []
+
+    def extract_structured(self, note_text, options=None):
+        self.seen.append(note_text)
+        if note_text.startswith("History"):
+            return {"complaints": ["cough", "fever"], "medications": [{"name": "Metformin", "dose": "500 mg"}]}
+        if note_text.startswith("Examination"):
+            return {"findings": "crepts right base", "complaints": ["Cough"]}
+        return {"medications": [{"name": "Amoxicillin", "dose": "500 mg"}], "tests": ["Chest X-ray"]}
+
+
+def test_pipeline_extracts_long_note_in_chunks():
+    llm = ChunkLLM()
+    result = run_pipeline(LONG_NOTE, options={"chunk_chars": 100, "pre_extract": False}, llm_client=llm)
+    assert len(llm.seen) == 3
+    structured = result["structured"]
+    assert structured.complaints == ["cough", "fever"]
+    assert [m.name for m in structured.medications] == ["Metformin", "Amoxicillin"]
+    assert structured.tests == ["Chest X-ray"]
+    assert result["bundle"] is not None
@@ -0,0 +1,33 @@
+from src.core.schemas import structured_note_json_schema
+from src.extract.compact import compact_note
+from src.llm.client import LLMClient
+from src.llm.tokens import MIN_NUM_CTX, estimate_tokens, schema_output_tokens, size_context
+
+
+def test_context_buckets_grow_with_note_and_cap_at_max():
+    schema = structured_note_json_schema()
+    short = size_context("x" * 3000, "BP 120/80", schema)
+    long = size_context("x" * 30000, "x" * 27000, schema, max_ctx=8192)
+    assert short["num_ctx"] == MIN_NUM_CTX
+    assert short["num_predict"] >= schema_output_tokens(schema) > 50
+    assert long["num_ctx"] == 8192 and long["num_predict"] <= 8192
+    assert estimate_tokens("") == 0
+
+
+def test_ollama_payload_carries_sized_options():
+    client = LLMClient(provider="ollama", ollama_model="stub", use_cache=False)
+    payload = client._ollama_chat_payload("TASK extract\nNOTE:\ncough", structured_note_json_schema())
+    assert payload["options"]["num_ctx"] == MIN_NUM_CTX
+    assert payload["options"]["num_predict"] > 0
+    client.num_ctx_max = 0
+    assert "num_ctx" not in client._ollama_chat_payload("x")["options"]
+
+
+def test_compact_note_keeps_content_and_drops_noise():
+    note = (
+        "VITALS:\n  BP   130/85 ,\tHR 92  \n\n\n\nPage 1 of 2\n----------\n"
+        "VITALS:\nSpO2 97%\nRx:\nTab Paracetamol 500 mg TDS x 3 days\nSignature:\n"
+    )
+    assert compact_note(note) == (
+        "VITALS:\nBP 130/85 , HR 92\n\nSpO2 97%\nRx:\nTab Paracetamol 500 mg TDS x 3 days"
+    )
@@ -0,0 +1,130 @@
+import json
+
+from eval.run_eval_preds import StreamingMetrics, compute_flag_metrics, presence_accuracy
+from src.data.load_dataset import iter_jsonl
+
+
+def test_iter_jsonl_skips_blank_lines(tmp_path):
+    path = tmp_path / "notes.jsonl"
+    path.write_text('{"a": 1}\n\n{"a": 2}\n', encoding="utf-8")
+    assert [r["a"] for r in iter_jsonl(str(path))] == [1, 2]
+
+
+
+def test_salvage_flags_do_not_count_as_medication_flags():
+    golds = [{"diagnosis": ["HTN"], "medications": [{"name": "y", "dose": "1", "frequency": "OD", "duration": "5d"}]}]
+    preds = [{"flags": ["SALVAGE: Dropped unparseable value for medications[0].dose"]}]
+    assert compute_flag_metrics(preds, golds)["med_incomplete_flag_false_positive_rate"] == 0.0
+
+def test_streaming_metrics_match_list_metrics():
+    golds = [
+        {"complaints": ["cough"], "vitals": {"hr": 80}, "medications": [{"name": "x", "dose": "1", "frequency": None, "duration": None}]},
+        {"diagnosis": ["HTN"], "medications": [{"name": "y", "dose": "1", "frequency": "OD", "duration": "5d"}]},
+    ]
+    preds = [
+        {"complaints": ["cough"], "flags": ["Medication 'x' missing: frequency"]},
+        {"diagnosis": ["HTN"], "vitals": {"hr": 70}, "flags": ["Medication 'y' missing: duration"]},
+    ]
+    stats = StreamingMetrics()
+    for p, g in zip(preds, golds):
+        stats.add(p, g, seconds=1.0)
+    result = stats.result()
+    assert result["avg_seconds_per_note"] == 1.0
+    assert result["complaint_presence_accuracy"] == presence_accuracy(preds, golds, "complaints")
+    assert result["hr_presence_accuracy"] == presence_accuracy(preds, golds, "vitals.hr")
+    for k, v in compute_flag_metrics(preds, golds).items():
+        assert result[k] == v
+    json.dumps(result)
+
+
+def _fake_pipeline(crash_at=None):
+    seen = []
+
+    def run(note_text, options=None):
+        seen.append(note_text)
+        if crash_at is not None and len(seen) == crash_at:
+            raise KeyboardInterrupt
+        from src.core.schemas import StructuredNote
+        return {"structured": StructuredNote(complaints=[note_text]), "flags": ["Diagnosis not documented (not inferred)"]}
+
+    return run, seen
+
+
+def _run_main(monkeypatch, argv):
+    import sys
+    from eval import run_eval_preds
+    monkeypatch.setattr(sys, "argv", ["run_eval_preds.py"] + argv)
+    run_eval_preds.main()
+
+
+def test_resume_skips_finished_notes_and_matches_full_run(tmp_path, monkeypatch):
+    from eval import run_eval_preds
+    import pytest
+
+    data = tmp_path / "notes.jsonl"
+    data.write_text("".join(json.dumps({"note_text": f"note {i}", "ground_truth": {"complaints": ["x"]}}) + "\n" for i in range(5)))
+
+    full, _ = _fake_pipeline()
+    monkeypatch.setattr(run_eval_preds, "run_pipeline", full)
+    _run_main(monkeypatch, ["--input", str(data), "--outdir", str(tmp_path / "full")])
+
+    crashing, _ = _fake_pipeline(crash_at=4)
+    monkeypatch.setattr(run_eval_preds, "run_pipeline", crashing)
+    out = str(tmp_path / "resumed")
+    with pytest.raises(KeyboardInterrupt):
+        _run_main(monkeypatch, ["--input", str(data), "--outdir", out])
+    with open(tmp_path / "resumed" / "checkpoint.jsonl", "a") as f:
+        f.write('{"index": 3, "torn')
+
+    resumed, seen = _fake_pipeline()
+    monkeypatch.setattr(run_eval_preds, "run_pipeline", resumed)
+    _run_main(monkeypatch, ["--input", str(data), "--outdir", out, "--resume"])
+    assert seen == ["note 3", "note 4"]
+
+    a = json.loads((tmp_path / "full" / "metrics_preds.json").read_text())
+    b = json.loads((tmp_path / "resumed" / "metrics_preds.json").read_text())
+    a = {k: v for k, v in a.items() if not k.endswith("seconds") and not k.endswith("_per_note")}
+    b = {k: v for k, v in b.items() if not k.endswith("seconds") and not k.endswith("_per_note")}
+    assert a == b
+
+
+def test_workers_keep_input_order_and_report_stage_percentiles(tmp_path, monkeypatch):
+    import random
+    import time as _time
+    from eval import run_eval_preds
+    from src.utils.timers import stage
+
+    def slow_pipeline(note_text, options=None):
+        from src.core.schemas import StructuredNote
+        with stage("llm_extract"):
+            _time.sleep(random.uniform(0, 0.02))
+        return {"structured": StructuredNote(complaints=[note_text]), "flags": []}
+
+    data = tmp_path / "notes.jsonl"
+    data.write_text("".join(json.dumps({"note_text": f"note {i}", "ground_truth": {}}) + "\n" for i in range(12)))
+    monkeypatch.setattr(run_eval_preds, "run_pipeline", slow_pipeline)
+    _run_main(monkeypatch, ["--input", str(data), "--outdir", str(tmp_path), "--workers", "4", "--save_preds"])
+
+    rows = [json.loads(l) for l in (tmp_path / "preds_vs_gold.jsonl").read_text().splitlines()]
+    assert [r["pred"]["complaints"][0] for r in rows] == [f"note {i}" for i in range(12)]
+    metrics = json.loads((tmp_path / "metrics_preds.json").read_text())
+    assert metrics["llm_extract_p99_seconds"] >= metrics["llm_extract_p50_seconds"] > 0
+    assert metrics["repair_p50_seconds"] == 0.0
+
+
+def test_errors_are_streamed_then_written_as_json_array(tmp_path, monkeypatch):
+    from eval import run_eval_preds
+
+    def failing(note_text, options=None):
+        raise ValueError(f"bad {note_text}")
+
+    data = tmp_path / "notes.jsonl"
+    data.write_text("".join(json.dumps({"note_text": f"note {i}"}) + "\n" for i in range(3)))
+    monkeypatch.setattr(run_eval_preds, "run_pipeline", failing)
+    _run_main(monkeypatch, ["--input", str(data), "--outdir", str(tmp_path)])
+    text = (tmp_path / "errors.json").read_text()
+    rows = json.loads(text)
+    assert [r["index"] for r in rows] == [0, 1, 2] and "bad note 1" in rows[1]["error"]
+    # Same file the in-memory version wrote with json.dump(errors, f, indent=2).
+    assert text == json.dumps(rows, indent=2, ensure_ascii=False)
+    assert not (tmp_path / "errors.json.part").exists()
@@ -0,0 +1,53 @@
+import time
+
+from src.llm.cache import ExtractionCache, make_cache_key
+from src.llm.client import LLMClient
+
+
+def test_cache_key_depends_on_prompt_and_model():
+    base = make_cache_key("note", "PROMPT", "ollama", "m1")
+    assert base == make_cache_key("note", "PROMPT", "ollama", "m1")
+    assert base != make_cache_key("note", "PROMPT v2", "ollama", "m1")
+    assert base != make_cache_key("note", "PROMPT", "ollama", "m2")
+
+
+def test_disk_tier_survives_new_instance_and_ttl_expires(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    c1 = ExtractionCache(path=path, max_entries=2)
+    c1.set("a", {"complaints": ["cough"]})
+    c1.close()
+
+    c2 = ExtractionCache(path=path, max_entries=2, ttl_seconds=60)
+    assert c2.get("a") == {"complaints": ["cough"]}
+    assert c2.get("missing") is None
+    assert c2.stats()["hits"] == 1 and c2.stats()["misses"] == 1
+
+    c3 = ExtractionCache(max_entries=2, ttl_seconds=0.01)
+    c3.set("b", {"x": 1})
+    time.sleep(0.02)
+    assert c3.get("b") is None
+
+
+def test_lru_evicts_oldest():
+    c = ExtractionCache(max_entries=2)
+    c.set("a", {"v": 1})
+    c.set("b", {"v": 2})
+    c.get("a")
+    c.set("c", {"v": 3})
+    assert c.get("b") is None
+    assert c.get("a") == {"v": 1}
+
+
+def test_client_serves_repeat_extraction_from_cache(monkeypatch):
+    client = LLMClient(provider="ollama", ollama_model="stub", cache=ExtractionCache())
+    calls = []
+
+    def fake_chat(prompt, schema=None, history=None):
+        calls.append(prompt)
+        return '{"complaints": ["fever"]}'
+
+    monkeypatch.setattr(client, "_ollama_chat", fake_chat)
+    assert client.extract_structured("fever 2 days") == {"complaints": ["fever"]}
+    assert client.extract_structured("fever 2 days") == {"complaints": ["fever"]}
+    assert len(calls) == 1
+    assert client.cache.stats()["hits"] == 1
@@ -0,0 +1,123 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.llm.client import LLMClient
+from src.llm.hedging import HedgePolicy, run_hedged
+
+
+def _warm_policy(**kwargs):
+    policy = HedgePolicy(min_samples=5, **kwargs)
+    for _ in range(10):
+        policy.record(0.01)
+    return policy
+
+
+def test_policy_waits_for_history_and_respects_budget():
+    assert HedgePolicy(min_samples=5).delay() is None
+    policy = _warm_policy(budget=0.2)
+    assert policy.delay() == 0.01
+    assert policy.try_hedge() and policy.try_hedge()
+    assert not policy.try_hedge()
+    policy.record(0.01, hedged=True)
+    assert not policy.try_hedge()
+
+
+def test_stalled_request_is_hedged_and_loser_cancelled():
+    policy = _warm_policy(budget=0.5)
+    calls = []
+    cancelled = threading.Event()
+
+    def attempt(cancel):
+        calls.append(cancel)
+        if len(calls) == 1:
+            # Stalls until the hedge wins and cancels it.
+            if cancel.wait(5):
+                cancelled.set()
+            return "late"
+        return '{"complaints": ["cough"]}'
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        result = run_hedged(attempt, policy, pool, accept=lambda r: r.startswith("{"))
+        assert cancelled.wait(1)
+    assert result == '{"complaints": ["cough"]}'
+    assert len(calls) == 2
+
+
+def test_invalid_answer_loses_to_valid_hedge():
+    policy = _warm_policy(budget=0.5)
+    order = []
+
+    def attempt(cancel):
+        order.append(len(order))
+        if order[-1] == 0:
+            time.sleep(0.1)
+            return "not json"
+        return '{"ok": true}'
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        assert run_hedged(attempt, policy, pool, accept=lambda r: r.startswith("{")) == '{"ok": true}'
+
+
+def test_client_hedges_through_streamed_chat(monkeypatch):
+    client = LLMClient(provider="ollama", ollama_model="stub", use_cache=False)
+    client.hedge = _warm_policy(budget=0.5)
+    seen = []
+
+    def fake_stream(prompt, temperature, schema=None, on_partial=None, cancel=None):
+        seen.append(cancel)
+        return '{"complaints": ["fever"]}'
+
+    monkeypatch.setattr(client, "_stream_chat", fake_stream)
+    try:
+        assert client.extract_structured("fever") == {"complaints": ["fever"]}
+    finally:
+        client.close()
+    assert len(seen) == 1 and seen[0].is_set()
+
+
+
+class _Raw:
+    def __init__(self):
+        self.shut = threading.Event()
+
+    def shutdown(self):
+        self.shut.set()
+
+
+class _StreamResponse:
+    """Streams `lines`, or blocks without yielding until shut down when `lines` is None."""
+
+    def __init__(self, lines=None):
+        self.lines = lines
+        self.raw = _Raw()
+        self.finished = threading.Event()
+
+    def iter_lines(self):
+        try:
+            if self.lines is None:
+                self.raw.shut.wait(5)
+                raise ConnectionError("connection shut down")
+            yield from self.lines
+        finally:
+            self.finished.set()
+
+    def close(self):
+        pass
+
+
+def test_stalled_stream_is_torn_down_when_hedge_wins(monkeypatch):
+    client = LLMClient(provider="ollama", ollama_model="stub", use_cache=False)
+    client.hedge = _warm_policy(budget=0.5)
+    stalled = _StreamResponse()
+    answer = _StreamResponse([b'{"message": {"content": "{\\"complaints\\": []}"}, "done": true}'])
+    responses = iter([stalled, answer])
+    monkeypatch.setattr(client, "_ollama_post", lambda endpoint, payload, stream=False: next(responses))
+    try:
+        start = time.perf_counter()
+        assert client.extract_structured("cough") == {"complaints": []}
+        # The loser never yielded a piece; only closing its socket can end the read.
+        assert stalled.finished.wait(1)
+        assert time.perf_counter() - start < 2
+    finally:
+        client.close()
@@ -0,0 +1,29 @@
+from src.llm.client import LLMClient
+from src.llm.json_repair import repair_json_text
+
+
+def test_common_llm_json_slips_are_fixed():
+    assert repair_json_text('{"a": 1, "b": [1, 2,],}') == {"a": 1, "b": [1, 2]}
+    assert repair_json_text("{'dx': None, 'prn': True, 'name': \"it's\"}") == {"dx": None, "prn": True, "name": "it's"}
+    assert repair_json_text('{complaints: ["cough"], vitals: {hr: 92}}') == {"complaints": ["cough"], "vitals": {"hr": 92}}
+    assert repair_json_text('{"a": 1, // note\n "b": /* x */ 2}') == {"a": 1, "b": 2}
+    assert repair_json_text("```json\n{\"a\": 1,}\n```\nHope this helps") == {"a": 1}
+
+
+def test_truncated_output_drops_partial_member():
+    text = '{"complaints": ["cough"], "vitals": {"hr": 92, "spo2": 9'
+    assert repair_json_text(text) == {"complaints": ["cough"], "vitals": {"hr": 92}}
+    assert repair_json_text('{"a": "x, y", "b": "p, q') == {"a": "x, y"}
+    assert repair_json_text("no json here") is None
+
+
+def test_local_repair_avoids_llm_repair_call(monkeypatch):
+    client = LLMClient(provider="ollama", ollama_model="stub", use_cache=False)
+    monkeypatch.setattr(client, "_chat", lambda prompt, temperature, schema=None: "{'complaints': ['cough'],}")
+    monkeypatch.setattr(client, "repair_json", lambda *a, **k: (_ for _ in ()).throw(AssertionError("LLM repair called")))
+    assert client.extract_structured("cough") == {"complaints": ["cough"]}
+
+
+def test_complete_but_malformed_object_is_not_cut_down():
+    text = '{"complaints":["cough"],"vitals":{"hr":92 bpm},"medications":[{"name":"x"}],"follow_up":"3 days"}'
+    assert repair_json_text(text) is None
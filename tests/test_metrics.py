@@ -0,0 +1,48 @@
+import io
+import json
+
+from src.core.pipeline import run_pipeline
+from src.utils import metrics
+from src.utils.metrics import InMemoryHistogram, JsonLogSink, PrometheusTextExporter, QuantileSketch, percentile
+from tests.test_pipeline_mocked_llm import DummyLLM
+
+
+def test_pipeline_emits_stage_timings_and_counters():
+    mem = metrics.add_sink(InMemoryHistogram())
+    prom = metrics.add_sink(PrometheusTextExporter())
+    stream = io.StringIO()
+    metrics.add_sink(JsonLogSink(stream))
+    try:
+        run_pipeline("Pt Ramesh Kumar, call 9876543210. Cough 2 days.", llm_client=DummyLLM())
+    finally:
+        metrics.clear_sinks()
+
+    assert mem.summary("stage_seconds", stage="llm_extract")["count"] == 1
+    assert mem.count("pii_hits") == 2
+    assert mem.count("pii_hits", label="PHONE") == 1
+    text = prom.render()
+    assert 'docsathi_stage_seconds_count{stage="fhir_build"} 1' in text
+    assert 'docsathi_pii_hits_total{label="NAME"} 1' in text
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert {e["type"] for e in events} == {"timing", "counter"}
+
+
+def test_no_sinks_means_no_events():
+    assert not metrics.enabled()
+    metrics.incr("llm_calls")
+    metrics.observe("stage_seconds", 1.0, stage="x")
+
+
+def test_quantile_sketch_tracks_percentiles_in_fixed_memory():
+    import random
+
+    rng = random.Random(7)
+    values = [rng.lognormvariate(0, 1) for _ in range(20000)] + [0.0] * 5000
+    sketch = QuantileSketch()
+    for v in values:
+        sketch.add(v)
+    for q in (10, 50, 90, 99):
+        exact = percentile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.02 * exact
+    assert sketch.quantile(5) == 0.0 and QuantileSketch().quantile(50) == 0.0
+    assert len(sketch._buckets) < 1000
@@ -0,0 +1,25 @@
+from src.privacy.pii import mask_pii
+from src.privacy.scanner import mask_pii_spans, scan_pii
+
+
+def test_mask_pii_single_pass_with_spans():
+    note = "Pt Ramesh Kumar, MRN 9876543210, email a.b@x.com. Cough 2 days."
+    masked, flags, spans = mask_pii_spans(note)
+    assert "Ramesh" not in masked and "a.b@x.com" not in masked
+    # The phone pattern outranks MRN for the overlapping digits.
+    assert "MRN [PHONE REDACTED]" in masked
+    assert flags == ["PII detected: PHONE", "PII detected: EMAIL", "PII detected: NAME"]
+    assert [note[s.start:s.end] for s in spans] == [s.text for s in spans]
+    assert mask_pii(note) == (masked, flags)
+
+
+def test_scan_pii_spans_do_not_overlap():
+    spans = scan_pii("call 9876543210 or 9876543211, aadhaar 123456789012")
+    assert all(a.end <= b.start for a, b in zip(spans, spans[1:]))
+
+
+def test_name_next_to_mrn_is_still_masked():
+    masked, flags, _ = mask_pii_spans("Patient Ravi Kumar MRN: A12 cough")
+    assert masked == "[NAME REDACTED] [MRN REDACTED] cough"
+    assert flags == ["PII detected: MRN", "PII detected: NAME"]
+    assert mask_pii("Patient Ravi Kumar MRN: A12 cough")[0] == masked
@@ -1,4 +1,4 @@
-from src.core.pipeline import run_pipeline
+from src.core.pipeline import run_pipeline, run_pipeline_batch
 from src.core.schemas import StructuredNote
 
 
@@ -31,3 +31,116 @@ def test_pipeline_with_mocked_llm():
     structured = result['structured']
     assert isinstance(structured, StructuredNote)
     assert 'Diagnosis not documented' in ' '.join(result['flags']) or 'Diagnosis not documented' in (structured.flags or [])
+
+
+class FlakyLLM(DummyLLM):
+    def extract_structured(self, note_text, options=None):
+        if "boom" in note_text:
+            raise RuntimeError("model unavailable")
+        return super().extract_structured(note_text, options)
+
+
+def test_pipeline_batch_keeps_order_and_isolates_errors():
+    notes = ["cough for 2 days", "boom", "fever since yesterday"]
+    results = run_pipeline_batch(notes, options={}, llm_client=FlakyLLM(), concurrency=3)
+    assert [r['index'] for r in results] == [0, 1, 2]
+    assert results[0]['error'] is None and isinstance(results[0]['structured'], StructuredNote)
+    assert results[1]['structured'] is None
+    assert 'RuntimeError' in results[1]['error']
+    assert results[2]['error'] is None
+
+
+class PackingLLM(DummyLLM):
+    def __init__(self):
+        self.packs = []
+        self.single = []
+
+    def extract_structured(self, note_text, options=None):
+        self.single.append(note_text)
+        return super().extract_structured(note_text, options)
+
+    def extract_structured_packed(self, notes, options=None):
+        self.packs.append(sorted(notes))
+        # The model skips the note mentioning "skip"; it must be retried alone.
+        return {i: {"complaints": [t.split()[0]]} for i, t in notes.items() if "skip" not in t}
+
+
+def test_pipeline_batch_packs_short_notes_and_retries_missing_alone():
+    llm = PackingLLM()
+    notes = ["cough for 2 days", "fever since yesterday", "skip this one", "headache today", "rash on arm"]
+    results = run_pipeline_batch(notes, options={"pack_size": 2}, llm_client=llm, concurrency=2)
+    assert llm.packs == [["0", "1"], ["2", "3"], ["4"]]
+    assert llm.single == ["skip this one"]
+    assert [r['structured'].complaints for r in results] == [
+        ["cough"], ["fever"], ["cough"], ["headache"], ["rash"]
+    ]
+
+
+class CombinedLLM(DummyLLM):
+    def extract_structured(self, note_text, options=None):
+        assert options["with_questions"]
+        return dict(super().extract_structured(note_text, options), questions=["What dose of cough syrup?", " "])
+
+
+def test_pipeline_combined_mode_returns_questions_and_flags():
+    result = run_pipeline("cough for 2 days", options={"with_questions": True}, llm_client=CombinedLLM())
+    assert result["questions"] == ["What dose of cough syrup?"]
+    assert any("Diagnosis not documented" in f for f in result["flags"])
+    assert "questions" not in run_pipeline("cough for 2 days", options={}, llm_client=DummyLLM())
+
+
+class SectionLLM(DummyLLM):
+    def __init__(self):
+        self.sections = []
+
+    def extract_section(self, note_text, section, options=None):
+        self.sections.append(section)
+        return {
+            "vitals": {"vitals": {"hr": "fast", "spo2": 98}},
+            "medications": {"medications": [{"name": "paracetamol", "prn": "PRN"}]},
+            "problems": {"complaints": ["cough"], "duration": "2 days"},
+            "plan": {"tests": ["CBC"], "follow_up": "3 days", "questions": ["Any fever?"]},
+        }[section]
+
+
+def test_pipeline_sectioned_mode_validates_each_section_and_assembles():
+    llm = SectionLLM()
+    partial = []
+    result = run_pipeline(
+        "cough for 2 days",
+        options={"sectioned": True, "with_questions": True, "on_partial": lambda f, v: partial.append(f)},
+        llm_client=llm,
+    )
+    structured = result["structured"]
+    assert sorted(llm.sections) == ["medications", "plan", "problems", "vitals"]
+    assert structured.complaints == ["cough"] and structured.tests == ["CBC"]
+    assert structured.medications[0].prn is True
+    assert structured.vitals.hr is None and structured.vitals.spo2 == 98
+    assert "SALVAGE: Dropped unparseable value for vitals.hr" in result["flags"]
+    assert result["questions"] == ["Any fever?"]
+    assert set(partial) >= {"vitals", "medications", "complaints", "follow_up"}
+    assert list(result["raw_llm_json"])[:2] == ["vitals", "medications"]
+
+
+def test_pipeline_batch_masks_each_packed_note_once(monkeypatch):
+    import src.core.pipeline as pipeline_mod
+
+    calls = []
+    real_mask = pipeline_mod.mask_pii_spans
+    monkeypatch.setattr(pipeline_mod, "mask_pii_spans", lambda note: calls.append(note) or real_mask(note))
+    notes = ["cough for 2 days", "skip this one", "rash on arm"]
+    results = run_pipeline_batch(notes, options={"pack_size": 2}, llm_client=PackingLLM(), concurrency=2)
+    assert sorted(calls) == sorted(notes)
+    assert all(r["error"] is None for r in results)
+
+
+def test_pipeline_batch_skips_packing_for_modes_it_cannot_serve():
+    notes = ["cough for 2 days", "fever since yesterday"]
+    for options in ({"with_questions": True}, {"sectioned": True}):
+        llm = PackingLLM()
+        llm.extract_section = lambda note, section, options=None: {}
+        run_pipeline_batch(notes, options=dict(options, pack_size=2, pre_extract=False), llm_client=llm)
+        assert llm.packs == []
+    llm = PackingLLM()
+    run_pipeline_batch(notes, options={"pack_size": 2, "chunk_chars": 17}, llm_client=llm)
+    assert llm.packs == [["0"]]
@@ -0,0 +1,22 @@
+from src.llm.registry import close_clients, get_client, get_router
+
+
+def test_get_client_reuses_instance_per_settings():
+    try:
+        a = get_client(provider="ollama", ollama_model="m1")
+        assert get_client(provider="ollama", ollama_model="m1") is a
+        assert get_client(provider="ollama", ollama_model="m2") is not a
+    finally:
+        close_clients()
+    assert get_client(provider="ollama", ollama_model="m1") is not a
+    close_clients()
+
+
+def test_get_router_pairs_small_and_large_model_on_same_provider():
+    try:
+        router = get_router("tiny", provider="ollama", ollama_model="big")
+        assert get_router("tiny", provider="ollama", ollama_model="big") is router
+        assert router.small.ollama_model == "tiny" and router.large.ollama_model == "big"
+        assert router.large is get_client(provider="ollama", ollama_model="big")
+    finally:
+        close_clients()
@@ -0,0 +1,96 @@
+import pytest
+
+from src.llm.client import LLMClientError
+from src.llm.retry import RetryBudgetExceeded, RetryPolicy, is_retryable, retry, retry_budget
+
+FAST = RetryPolicy(max_attempts=3, initial_delay=0.001, max_delay=0.001)
+
+
+def test_only_transient_errors_are_retryable():
+    assert is_retryable(LLMClientError("slow down", status_code=429))
+    assert is_retryable(LLMClientError("bad gateway", status_code=502))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(LLMClientError("bad request", status_code=400))
+    assert not is_retryable(LLMClientError("OPENAI_API_KEY missing."))
+    try:
+        try:
+            raise TimeoutError()
+        except TimeoutError as e:
+            raise LLMClientError("wrapped") from e
+    except LLMClientError as wrapped:
+        assert is_retryable(wrapped)
+
+
+def test_non_retryable_error_is_raised_immediately():
+    calls = []
+
+    @retry(policy=FAST)
+    def f():
+        calls.append(1)
+        raise LLMClientError("bad request", status_code=400)
+
+    with pytest.raises(LLMClientError):
+        f()
+    assert len(calls) == 1
+
+
+def test_retry_after_is_honoured(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("src.llm.retry.time.sleep", sleeps.append)
+    calls = []
+
+    @retry(policy=FAST)
+    def f():
+        calls.append(1)
+        if len(calls) == 1:
+            raise LLMClientError("throttled", status_code=429, retry_after=2.5)
+        return "ok"
+
+    assert f() == "ok"
+    assert sleeps == [2.5]
+
+
+def test_budget_is_shared_across_nested_calls():
+    calls = []
+
+    @retry(policy=FAST)
+    def inner():
+        calls.append("inner")
+        raise LLMClientError("unavailable", status_code=503)
+
+    @retry(policy=FAST)
+    def outer():
+        calls.append("outer")
+        return inner()
+
+    with retry_budget(max_attempts=3):
+        with pytest.raises((LLMClientError, RetryBudgetExceeded)):
+            outer()
+    assert len(calls) == 3
+
+
+def test_time_budget_starts_at_first_failure(monkeypatch):
+    import src.llm.retry as retry_mod
+
+    now = [0.0]
+    monkeypatch.setattr(retry_mod.time, "monotonic", lambda: now[0])
+    calls = []
+
+    @retry(policy=FAST)
+    def slow_answer():
+        # A first answer slower than the whole budget, then its repair call.
+        now[0] += 120
+        calls.append("answer")
+
+    @retry(policy=FAST)
+    def repair():
+        calls.append("repair")
+        now[0] += 5
+        raise LLMClientError("unavailable", status_code=503)
+
+    with retry_budget(total_seconds=4, max_attempts=10):
+        slow_answer()
+        with pytest.raises((LLMClientError, RetryBudgetExceeded)):
+            repair()
+    # The repair runs despite the slow answer; its retries stop once 4s have passed since it failed.
+    assert calls == ["answer", "repair", "repair"]
@@ -0,0 +1,74 @@
+from src.llm.router import ModelRouter, note_complexity
+
+
+class FakeClient:
+    def __init__(self, answer):
+        self.answer = answer
+        self.notes = []
+
+    def extract_structured(self, note_text, options=None):
+        self.notes.append(note_text)
+        return dict(self.answer)
+
+    def extract_section(self, note_text, section, options=None):
+        self.notes.append(note_text)
+        return {"vitals": self.answer.get("vitals")}
+
+
+LONG_NOTE = "\n".join(
+    ["Complaints: chest pain", "History: HTN, DM", "Vitals: BP 150/90", "Exam: S1 S2 normal", "Impression: angina"]
+    + [f"Tab drug{i} {i + 1}0 mg BD x 5 days" for i in range(5)]
+    + ["Plan: ECG, troponin", "Follow up: 1 week"]
+)
+
+
+def test_complexity_grows_with_length_meds_and_sections():
+    assert note_complexity("") == 0.0
+    assert note_complexity("cough for 2 days") < 0.1
+    assert note_complexity(LONG_NOTE) > 0.5
+
+
+def test_routes_by_complexity_and_escalates_invalid_small_answers():
+    small = FakeClient({"complaints": ["cough"]})
+    large = FakeClient({"complaints": ["chest pain"]})
+    router = ModelRouter(small, large, threshold=0.5)
+    assert router.extract_structured("cough for 2 days") == {"complaints": ["cough"]}
+    assert router.extract_structured(LONG_NOTE) == {"complaints": ["chest pain"]}
+    assert large.notes == [LONG_NOTE]
+
+    small.answer = {"vitals": {"hr": "fast"}}
+    assert router.extract_structured("fever") == {"complaints": ["chest pain"]}
+    assert router.extract_section("fever", "vitals") == {"vitals": None}
+    snap = router.snapshot()
+    assert snap["small"]["calls"] == 3 and snap["small"]["success_rate"] == 1 / 3
+    assert snap["large"]["calls"] == 3
+
+
+def test_threshold_falls_on_escalations_and_rises_on_success():
+    small = FakeClient({"vitals": {"hr": "fast"}})
+    router = ModelRouter(small, FakeClient({}), threshold=0.5, step=0.1, target_success=0.5)
+    router.extract_structured("fever")
+    assert router.threshold == 0.45
+    small.answer = {"complaints": ["fever"]}
+    router.stats["large"].latencies.clear()
+    router.extract_structured("fever")
+    assert round(router.threshold, 4) == 0.5
+
+
+def test_followups_go_to_the_client_that_extracted_the_note():
+    small = FakeClient({"vitals": {"hr": "fast"}})
+    large = FakeClient({"complaints": ["fever"]})
+    for client in (small, large):
+        client.remembered = []
+        client.remember_extraction = lambda note, result, options=None, c=client: c.remembered.append(note)
+        client.generate_followup_questions = lambda note, structured, *a, c=client, **k: {"questions": [c is large]}
+    router = ModelRouter(small, large, threshold=0.5)
+    router.extract_structured("fever")  # escalated: the small answer does not validate
+    small.answer = {"complaints": ["cough"]}
+    router.extract_structured("cough")
+    # The threshold has moved since: choose() would now send "cough" to the large tier.
+    router.threshold = 0.0
+    router.remember_extraction("cough", {"complaints": ["cough"]})
+    assert small.remembered == ["cough"] and large.remembered == []
+    assert router.generate_followup_questions("cough", {}) == {"questions": [False]}
+    assert router.generate_followup_questions("fever", {}) == {"questions": [True]}
@@ -0,0 +1,49 @@
+from src.core.pipeline import run_pipeline
+from src.extract.rules import pre_extract
+
+
+def test_vitals_and_simple_rx_are_covered():
+    pre = pre_extract("BP 130/85, HR 92, SpO2 97%, Temp 99.1F. Rx: Tab Paracetamol 500 mg TID x 3 days.")
+    assert pre.fields["vitals"] == {"bp_systolic": 130, "bp_diastolic": 85, "hr": 92, "spo2": 97.0, "temp": "99.1 F"}
+    assert pre.fields["medications"] == [
+        {"name": "Paracetamol", "dose": "500 mg", "route": None, "frequency": "TID", "duration": "3 days", "prn": None}
+    ]
+    assert pre.complete
+
+
+def test_partial_med_instructions_are_left_to_the_llm():
+    pre = pre_extract("Epigastric burning. BP 118/74. Rx: Pantoprazole 40 mg OD before breakfast x 14 days.")
+    assert pre.covered == {"vitals"}
+    assert not pre.complete
+
+
+def test_duration_text_before_drug_is_not_part_of_its_name():
+    pre = pre_extract("Fever since 2 days paracetamol 500 mg TID")
+    assert [m["name"] for m in pre.fields["medications"]] == ["paracetamol"]
+    pre = pre_extract("Cough for 1 week x amoxicillin 250 mg BD")
+    assert [m["name"] for m in pre.fields["medications"]] == ["amoxicillin"]
+
+
+class RecordingLLM:
+    def __init__(self):
+        self.calls = []
+
+    def extract_structured(self, note_text, options=None):
+        self.calls.append(options or {})
+        return {"complaints": ["cough"], "vitals": {"hr": 1}}
+
+    def repair_json(self, note_text, bad_json, options=None):
+        raise AssertionError("repair not expected")
+
+
+def test_pipeline_prefills_covered_fields_and_skips_llm_when_complete():
+    llm = RecordingLLM()
+    res = run_pipeline("Cough 2 days. BP 130/85, HR 92.", llm_client=llm)
+    assert llm.calls[0]["prefilled_fields"] == ["vitals"]
+    assert res["structured"].vitals.hr == 92
+    assert res["structured"].complaints == ["cough"]
+
+    llm = RecordingLLM()
+    res = run_pipeline("Vitals: BP 130/85, HR 92, SpO2 97%.", llm_client=llm)
+    assert llm.calls == []
+    assert res["structured"].vitals.spo2 == 97.0
@@ -0,0 +1,55 @@
+from src.core.pipeline import run_pipeline
+from src.core.schemas import StructuredNote
+from src.validate.salvage import salvage_structured
+
+
+def test_salvage_coerces_units_and_drops_garbage():
+    raw = {
+        "complaints": "cough",
+        "vitals": {"hr": "92 bpm", "spo2": "98%", "bp_diastolic": "high"},
+        "medications": [{"name": "Paracetamol", "prn": "SOS"}, {"dose": "500 mg"}],
+        "findings": ["crepts", "wheeze"],
+    }
+    note, flags = salvage_structured(raw)
+    assert isinstance(note, StructuredNote)
+    assert note.complaints == ["cough"]
+    # spo2 accepts strings; the normalizer handles "98%" later.
+    assert note.vitals.hr == 92 and note.vitals.spo2 == "98%"
+    assert note.vitals.bp_diastolic is None
+    assert note.findings == "crepts; wheeze"
+    assert [m.name for m in note.medications] == ["Paracetamol"]
+    assert note.medications[0].prn is True
+    assert "SALVAGE: Dropped unparseable value for vitals.bp_diastolic" in flags
+    assert "SALVAGE: Dropped medications[1]: missing name" in flags
+
+
+def test_salvage_gives_up_when_nothing_survives():
+    note, _ = salvage_structured({"vitals": "n/a", "medications": "lots"})
+    assert note is None
+
+
+class SloppyLLM:
+    def __init__(self):
+        self.repairs = 0
+
+    def extract_structured(self, note_text, options=None):
+        return {"complaints": ["fever"], "vitals": {"hr": "110 /min", "temp": "38.5 C"}, "diagnosis": {"x": 1}}
+
+    def repair_json(self, note_text, bad_json, options=None):
+        self.repairs += 1
+        raise AssertionError("repair should not be needed")
+
+
+def test_pipeline_salvages_without_llm_repair():
+    llm = SloppyLLM()
+    result = run_pipeline("fever, pulse 110", options={"pre_extract": False}, llm_client=llm)
+    assert llm.repairs == 0
+    assert result["structured"].vitals.hr == 110
+    assert result["structured"].diagnosis is None
+    assert "SALVAGE: Dropped unparseable value for diagnosis" in result["flags"]
+
+
+def test_salvage_reads_prn_as_whole_words_and_honours_negation():
+    meds = [{"name": f"Drug{i}", "prn": value} for i, value in enumerate(["not prn", "no sos", "nyes", "as needed"])]
+    note, _ = salvage_structured({"medications": meds})
+    assert [m.prn for m in note.medications] == [False, False, None, True]
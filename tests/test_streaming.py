@@ -0,0 +1,63 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.llm.client import LLMClient
+from src.llm.streaming import StreamingJSONParser
+
+
+def test_parser_reports_fields_and_stops_at_root_close():
+    seen = []
+    parser = StreamingJSONParser(on_field=lambda k, v: seen.append((k, v)))
+    pieces = ['```json\n{"vitals": {"hr": 8', '8, "note": "a, {b}"}, "compl', 'aints": ["cough"]', '}\nHope this helps', "!"]
+    done = [parser.feed(p) for p in pieces]
+    assert done == [False, False, False, True, True]
+    assert json.loads(parser.text()) == {"vitals": {"hr": 88, "note": "a, {b}"}, "complaints": ["cough"]}
+    assert seen == [("vitals", {"hr": 88, "note": "a, {b}"}), ("complaints", ["cough"])]
+
+
+class _RamblingOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for piece in ['{"complaints": ["cough"],', ' "duration": "2 days"}']:
+                self._chunk({"message": {"content": piece}, "done": False})
+            # A model that keeps talking after the object closed.
+            time.sleep(2)
+            self._chunk({"message": {"content": " extra"}, "done": True})
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            pass
+
+    def _chunk(self, event):
+        line = (json.dumps(event) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_stream_extraction_closes_early_and_surfaces_partials():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RamblingOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    client = LLMClient(provider="ollama", ollama_model="stub", ollama_base_url=url, use_cache=False)
+    seen = []
+    try:
+        start = time.perf_counter()
+        result = client.extract_structured("cough", options={"on_partial": lambda k, v: seen.append(k)})
+        elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+        server.shutdown()
+    assert result == {"complaints": ["cough"], "duration": "2 days"}
+    assert seen == ["complaints", "duration"]
+    assert elapsed < 1.5
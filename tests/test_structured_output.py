@@ -0,0 +1,305 @@
+import json
+
+import pytest
+
+from src.core.pipeline import run_pipeline
+from src.core.schemas import section_json_schema, structured_note_json_schema
+from src.llm.client import LLMClient, LLMClientError
+
+
+def _client():
+    return LLMClient(provider="ollama", ollama_model="stub", use_cache=False)
+
+
+def test_schema_is_built_once_from_structured_note():
+    schema = structured_note_json_schema()
+    assert schema is structured_note_json_schema()
+    assert {"complaints", "vitals", "medications"} <= set(schema["properties"])
+
+
+def test_ollama_gets_schema_format_for_extraction(monkeypatch):
+    client = _client()
+    sent = []
+
+    def fake_call(endpoint, payload):
+        sent.append(payload["format"])
+        return {"message": {"content": '{"complaints": ["cough"]}'}}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    assert client.extract_structured("cough") == {"complaints": ["cough"]}
+    assert sent == [structured_note_json_schema()]
+
+
+def test_schema_rejection_falls_back_to_json_and_is_remembered(monkeypatch):
+    client = _client()
+    sent = []
+
+    def fake_call(endpoint, payload):
+        sent.append(payload["format"])
+        if payload["format"] != "json":
+            raise LLMClientError("invalid format", status_code=400)
+        return {"message": {"content": '{"complaints": ["cough"]}'}}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    client.extract_structured("cough")
+    client.extract_structured("fever")
+    assert sent == [structured_note_json_schema(), "json", "json"]
+    assert client.structured_output is False
+
+
+def test_unrelated_400_keeps_schema_output_on(monkeypatch):
+    client = _client()
+
+    def fake_call(endpoint, payload):
+        raise LLMClientError("Ollama error 400: prompt exceeds context length", status_code=400)
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    with pytest.raises(LLMClientError):
+        client.extract_structured("cough")
+    assert client.structured_output is True
+
+
+def test_packed_extraction_splits_by_id_and_drops_missing(monkeypatch):
+    client = _client()
+
+    def fake_call(endpoint, payload):
+        assert "NOTE id=a" in payload["messages"][1]["content"]
+        assert payload["format"]["properties"]["notes"]["items"]["required"][0] == "id"
+        notes = [{"id": "a", "complaints": ["cough"]}, {"id": "zz", "complaints": ["x"]}]
+        return {"message": {"content": json.dumps({"notes": notes})}}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    assert client.extract_structured_packed({"a": "cough", "b": "fever"}) == {"a": {"complaints": ["cough"]}}
+
+
+def test_section_extraction_asks_for_and_keeps_only_its_keys(monkeypatch):
+    client = _client()
+    sent = []
+
+    def fake_call(endpoint, payload):
+        sent.append(payload)
+        return {"message": {"content": '{"tests": ["CBC"], "advice": null, "complaints": ["cough"]}'}}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    assert client.extract_section("cough, CBC", "plan") == {"tests": ["CBC"], "advice": None}
+    assert "KEYS: tests, advice, follow_up" in sent[0]["messages"][1]["content"]
+    assert sent[0]["format"] == section_json_schema("plan")
+    assert set(section_json_schema("plan", with_questions=True)["required"]) >= {"questions"}
+
+
+def test_section_repair_keeps_section_schema(monkeypatch):
+    client = _client()
+    sent = []
+
+    def fake_call(endpoint, payload):
+        sent.append(payload["format"])
+        if len(sent) == 1:
+            return {"message": {"content": "tests: CBC, questions: [Any fever?"}}
+        return {"message": {"content": '{"tests": ["CBC"], "questions": ["Any fever?"]}'}}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    out = client.extract_section("cough", "plan", options={"with_questions": True})
+    assert out == {"tests": ["CBC"], "questions": ["Any fever?"]}
+    assert sent == [section_json_schema("plan", with_questions=True)] * 2
+
+
+def test_sections_share_the_note_retry_budget(monkeypatch):
+    import src.llm.retry as retry_mod
+
+    client = _client()
+    calls = []
+
+    def fake_call(endpoint, payload):
+        calls.append(1)
+        raise LLMClientError("overloaded", status_code=503)
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    monkeypatch.setattr(retry_mod.time, "sleep", lambda s: None)
+    with pytest.raises(Exception):
+        run_pipeline("cough", options={"sectioned": True, "llm_budget_attempts": 5}, llm_client=client)
+    # 4 first attempts plus the 4 retries the note's budget allows, not 3 per section.
+    assert len(calls) <= 8
+
+
+
+def test_section_repairs_are_timed_from_worker_threads(monkeypatch):
+    client = _client()
+
+    def fake_call(endpoint, payload):
+        content = payload["messages"][-1]["content"]
+        if content.startswith("TASK repair"):
+            return {"message": {"content": '{"tests": ["CBC"]}'}}
+        if "KEYS: tests" in content:
+            return {"message": {"content": "tests: CBC"}}
+        return {"message": {"content": "{}"}}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    result = run_pipeline("cough, CBC advised", options={"sectioned": True, "pre_extract": False}, llm_client=client)
+    assert result["structured"].tests == ["CBC"]
+    assert "repair" in result["timings"]
+
+def test_extract_repair_and_questions_share_one_system_prefix(monkeypatch):
+    client = _client()
+    sent = []
+
+    def fake_call(endpoint, payload):
+        sent.append(payload["messages"])
+        return {"message": {"content": '{"complaints": ["cough"], "questions": []}'}}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    client.extract_structured("cough for 2 days")
+    client.repair_json("cough for 2 days", "{complaints: [cough]")
+    client.generate_followup_questions("cough for 2 days", {"complaints": ["cough"]}, ["Dose missing"])
+    systems = {m[0]["content"] for m in sent}
+    assert len(systems) == 1 and "cough" not in systems.pop()
+    assert [m[1]["content"].split("\n")[0] for m in sent] == ["TASK extract", "TASK repair", "TASK questions"]
+
+
+def test_followup_questions_continue_extraction_conversation(monkeypatch):
+    client = _client()
+    client.reuse_context = True
+    sent = []
+
+    def fake_call(endpoint, payload):
+        sent.append(payload["messages"])
+        return {"message": {"content": '{"complaints": ["cough"], "questions": ["Dose?"]}'}}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    client.extract_structured("cough for 2 days")
+    out = client.generate_followup_questions("cough for 2 days", {"complaints": ["cough"]}, ["Dose missing"])
+    assert out == {"questions": ["Dose?"]}
+    extraction, followup = sent
+    # The follow-up replays the extraction turn verbatim and adds only the flags.
+    assert followup[: len(extraction)] == extraction
+    assert followup[len(extraction)]["role"] == "assistant"
+    assert "Dose missing" in followup[-1]["content"] and "cough for 2 days" not in followup[-1]["content"]
+
+    client.generate_followup_questions("another note", {}, [])
+    assert "another note" in sent[-1][-1]["content"]
+
+
+
+def test_followup_sends_final_record_when_it_differs_from_the_extraction(monkeypatch):
+    client = _client()
+    client.reuse_context = True
+    sent = []
+
+    def fake_call(endpoint, payload):
+        sent.append(payload["messages"])
+        return {"message": {"content": '{"complaints": ["cough"], "medications": []}'}}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    client.extract_structured("cough, paracetamol")
+    same = {"complaints": ["cough"], "diagnosis": None, "medications": [], "flags": ["x"]}
+    client.generate_followup_questions("cough, paracetamol", same, [])
+    assert "final record" not in sent[-1][-1]["content"]
+    edited = dict(same, medications=[{"name": "Paracetamol", "dose": "500 mg"}])
+    client.generate_followup_questions("cough, paracetamol", edited, [])
+    assert len(sent[-1]) == len(sent[0]) + 2
+    assert "final record" in sent[-1][-1]["content"] and "500 mg" in sent[-1][-1]["content"]
+
+def test_followup_after_run_pipeline_finds_conversation_for_compacted_note(monkeypatch):
+    client = _client()
+    client.reuse_context = True
+    sent = []
+
+    def fake_call(endpoint, payload):
+        sent.append(payload["messages"])
+        return {"message": {"content": '{"complaints": ["cough"], "questions": ["Dose?"]}'}}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    result = run_pipeline("Complaints:  cough for 2 days\n", options={}, llm_client=client)
+    assert result["llm_note"] == "Complaints: cough for 2 days"
+    client.generate_followup_questions(result["llm_note"], {"complaints": ["cough"]}, [])
+    assert len(sent[-1]) == len(sent[0]) + 2
+
+
+def test_cache_hits_and_sectioned_runs_keep_the_conversation(monkeypatch):
+    from src.llm.cache import ExtractionCache
+
+    client = LLMClient(provider="ollama", ollama_model="stub", cache=ExtractionCache())
+    client.reuse_context = True
+    sent = []
+
+    def fake_call(endpoint, payload):
+        sent.append(payload["messages"])
+        return {"message": {"content": '{"complaints": ["cough"], "questions": []}'}}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    client.extract_structured("cough")
+    client._conversations.clear()
+    client.extract_structured("cough")  # served from cache
+    client.generate_followup_questions("cough", {"complaints": ["cough"]}, [])
+    assert sent[-1][-2] == {"role": "assistant", "content": '{"complaints": ["cough"], "questions": []}'}
+
+    run_pipeline("fever for 3 days", options={"sectioned": True, "cache": False}, llm_client=client)
+    client.generate_followup_questions("fever for 3 days", {}, ["Dose missing"])
+    assert sent[-1][-2]["role"] == "assistant" and "fever for 3 days" not in sent[-1][-1]["content"]
+
+
+def test_combined_mode_asks_for_questions_in_extraction_call(monkeypatch):
+    client = _client()
+    sent = []
+
+    def fake_call(endpoint, payload):
+        sent.append(payload)
+        return {"message": {"content": '{"complaints": ["cough"], "questions": ["Since when?"]}'}}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    out = client.extract_structured("cough", options={"with_questions": True})
+    assert out["questions"] == ["Since when?"]
+    assert sent[0]["messages"][-1]["content"].startswith("TASK extract_with_questions")
+    assert "questions" in sent[0]["format"]["required"]
+
+
+
+def test_combined_mode_repair_keeps_questions_schema(monkeypatch):
+    client = _client()
+    sent = []
+
+    def fake_call(endpoint, payload):
+        sent.append(payload["format"])
+        if len(sent) == 1:
+            return {"message": {"content": "complaints: cough; questions: Since when?"}}
+        return {"message": {"content": '{"complaints": ["cough"], "questions": ["Since when?"]}'}}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    out = client.extract_structured("cough", options={"with_questions": True})
+    assert out["questions"] == ["Since when?"]
+    assert len(sent) == 2 and "questions" in sent[1]["required"]
+
+def test_ollama_endpoint_memo_skips_empty_chat_after_first_note(monkeypatch):
+    client = LLMClient(provider="ollama", ollama_model="generate-only", use_cache=False)
+    client.keep_alive = "30m"
+    sent = []
+
+    def fake_call(endpoint, payload):
+        sent.append(endpoint)
+        assert payload["keep_alive"] == "30m"
+        if endpoint == "api/chat":
+            return {"message": {"content": ""}}
+        return {"response": '{"complaints": ["cough"]}'}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    client.extract_structured("cough")
+    client.extract_structured("fever")
+    assert sent == ["api/chat", "api/generate", "api/generate"]
+
+
+def test_warmup_loads_model_and_never_raises(monkeypatch):
+    client = _client()
+    sent = []
+
+    def fake_call(endpoint, payload):
+        sent.append((endpoint, payload["prompt"]))
+        return {"done": True}
+
+    monkeypatch.setattr(client, "_ollama_call", fake_call)
+    assert client.warmup() is not None
+    assert sent == [("api/generate", "")]
+
+    def down(endpoint, payload):
+        raise LLMClientError("connection refused")
+
+    monkeypatch.setattr(client, "_ollama_call", down)
+    assert client.warmup() is None
@@ -0,0 +1,21 @@
+import time
+
+from src.utils.timers import collect_stages, percentile, stage
+
+
+def test_nested_stages_are_exclusive():
+    with collect_stages() as timings:
+        with stage("llm_extract"):
+            time.sleep(0.01)
+            with stage("repair"):
+                time.sleep(0.02)
+    t = timings.as_dict()
+    assert 0.005 < t["llm_extract"] < 0.02
+    assert t["repair"] >= 0.02
+
+
+def test_stage_without_collector_is_noop_and_percentile():
+    with stage("pii_mask"):
+        pass
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert percentile([], 99) == 0.0